@@ -2,12 +2,12 @@ with src as (
   select * from {{ source('raw','referrals') }}
 )
 select
-  cast(referral_id as integer) as referral_id,
-  cast(referrer_user_id as integer) as referrer_user_id,
-  lower(cast(referred_email as varchar)) as referred_email,
-  cast(referred_user_id as integer) as referred_user_id,
-  cast(referral_code as varchar) as referral_code,
-  cast(sent_at as timestamp) as sent_at,
-  cast(converted_at as timestamp) as converted_at,
-  cast(status as varchar) as status
+  referral_id,
+  referrer_user_id,
+  lower(referred_email) as referred_email,
+  referred_user_id,
+  referral_code,
+  sent_at,
+  converted_at,
+  status
 from src
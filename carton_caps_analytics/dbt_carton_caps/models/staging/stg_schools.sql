@@ -2,11 +2,11 @@ with src as (
   select * from {{ source('raw','schools') }}
 )
 select
-  cast(school_id as integer) as school_id,
-  cast(name as varchar) as name,
-  cast(address as varchar) as address,
-  cast(city as varchar) as city,
-  cast(state as varchar) as state,
-  cast(zip_code as varchar) as zip_code,
-  cast(created_at as timestamp) as created_at
+  school_id,
+  name,
+  address,
+  city,
+  state,
+  zip_code,
+  created_at
 from src
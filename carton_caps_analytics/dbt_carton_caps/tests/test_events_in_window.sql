@@ -6,8 +6,8 @@
 
 with bounds as (
   select
-    timestamp '2024-01-01 00:00:00' as start_dt,
-    timestamp '2024-06-30 23:59:59' as end_dt
+    timestamp '{{ var("window_start") }}' as start_dt,
+    timestamp '{{ var("window_end") }}' as end_dt
 ),
 scoped as (
   select *
@@ -1,55 +1,1121 @@
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
 import os
+import shutil
+import sqlite3
 import duckdb
 from pathlib import Path
 import sys
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
 
 ROOT = Path(__file__).resolve().parents[1]
 DUCK_DIR = ROOT / "duckdb"
 DUCK_DIR.mkdir(exist_ok=True)
 
 DATA = ROOT / "data"
+GENERATOR_DIR = ROOT / "generator"
 LATEST_PTR = DUCK_DIR / "LATEST_DB.txt"
+LOG_DIR = ROOT / "logs"
+RAW_SCHEMAS_PATH = ROOT / "contracts" / "raw_schemas.json"
+# Shared, content-addressed raw table snapshots: store/<table>/<fingerprint>.parquet,
+# or store/<table>/<fingerprint>.parts/<col>=<value>/.../*.parquet when hive-partitioned
+STORE_DIR = DUCK_DIR / "store"
 
-def main():
+TABLES = ["schools", "users", "products", "referrals", "purchases", "events"]
+# Generated CSVs, plain or compressed (generator --csv-compression); DuckDB decompresses while it parses
+CSV_SUFFIXES = (".csv", ".csv.gz", ".csv.zst")
+CSV_CODECS = {".gz": "gzip", ".zst": "zstd"}
+ZSTD_MAGIC = 0xFD2FB528
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50  # low 4 bits vary
+SOURCES = ("files", "generator", "sqlite")
+# The generator's SQLite copy, standing in for the OLTP source system (--source sqlite)
+SQLITE_DB = DATA / "carton_caps_generated.db"
+# scanner: DuckDB's sqlite extension; python: the stdlib sqlite3 module, in chunks
+# auto: the scanner when the extension can be loaded, else python
+SQLITE_READERS = ("auto", "scanner", "python")
+SQLITE_ALIAS = "_sqlite_src"
+DEFAULT_CHUNK_SIZE = 50_000
+# tables: every run materializes raw.* in its own DuckDB file
+# snapshot: raw.* are views over shared Parquet snapshots; unchanged tables are reused
+LAYOUTS = ("tables", "snapshot")
+
+# Share of physical RAM given to DuckDB when --memory-limit is not set
+MEMORY_FRACTION = 0.75
+
+# Per-table load state of --incremental (high-water marks, last source file)
+WATERMARKS_DDL = """
+CREATE TABLE IF NOT EXISTS raw._watermarks (
+    table_name VARCHAR,
+    watermark_column VARCHAR,
+    high_water_mark TIMESTAMP,
+    high_water_id BIGINT,
+    last_ingested_at TIMESTAMP WITH TIME ZONE,
+    source_path VARCHAR,
+    source_mtime DOUBLE,
+    run_id VARCHAR
+)
+"""
+
+
+def default_threads() -> int:
+    return os.cpu_count() or 1
+
+
+def default_memory_limit() -> Optional[str]:
+    """MEMORY_FRACTION of physical RAM, or None (DuckDB's own default) where it cannot be read."""
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+    return f"{int(total * MEMORY_FRACTION) // 2**20}MiB"
+
+
+def configure(con, threads: int, memory_limit: Optional[str]) -> None:
+    con.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+
+
+def load_raw_schemas(path: Path = RAW_SCHEMAS_PATH) -> Dict[str, Dict]:
+    """Declared raw schemas: table -> {"primary_key", "columns": [{"name", "type", "nullable"}, ...]}."""
+    return json.loads(path.read_text(encoding="utf-8"))["tables"]
+
+
+RAW_SCHEMAS = load_raw_schemas()
+
+
+def column_names(table: str) -> List[str]:
+    return [c["name"] for c in RAW_SCHEMAS[table]["columns"]]
+
+
+def derived_columns(table: str) -> List[Dict]:
+    """Columns computed at load time from the declared ones: [{"name", "type", "expression"}, ...]."""
+    return RAW_SCHEMAS[table].get("derived_columns", [])
+
+
+def data_columns(table: str) -> List[str]:
+    """Declared plus derived columns, in raw.<table> order (everything but _ingested_at)."""
+    return column_names(table) + [c["name"] for c in derived_columns(table)]
+
+
+def column_type(table: str, name: str) -> str:
+    for c in RAW_SCHEMAS[table]["columns"] + derived_columns(table):
+        if c["name"] == name:
+            return c["type"]
+    raise ValueError(f"raw.{table} has no column {name!r}")
+
+
+def partition_columns(table: str) -> List[str]:
+    return RAW_SCHEMAS[table].get("partition_by", [])
+
+
+# Tables whose snapshot can be written hive-partitioned (--partition)
+PARTITIONABLE = tuple(t for t in TABLES if partition_columns(t))
+
+
+def load_select(table: str) -> str:
+    """Select list turning a source's declared columns into raw.<table> columns (without _ingested_at)."""
+    return ", ".join(column_names(table) + [f"{c['expression']} AS {c['name']}" for c in derived_columns(table)])
+
+
+def raw_table_ddl(table: str) -> str:
+    """CREATE TABLE raw.<table> with the declared types (NOT NULL unless nullable), derived columns and _ingested_at."""
+    columns = [
+        f"{c['name']} {c['type']}" + ("" if c["nullable"] else " NOT NULL")
+        for c in RAW_SCHEMAS[table]["columns"]
+    ]
+    columns += [f"{c['name']} {c['type']}" for c in derived_columns(table)]
+    columns.append("_ingested_at TIMESTAMP WITH TIME ZONE")
+    return f"CREATE TABLE raw.{table} ({', '.join(columns)})"
+
+
+def source_path(table: str, data_dir: Path = DATA) -> Path:
+    """The typed Parquet output if present (no text parsing), else the (possibly compressed) CSV."""
+    parquet = data_dir / f"{table}.parquet"
+    if parquet.exists():
+        return parquet
+    for suffix in CSV_SUFFIXES:
+        path = data_dir / f"{table}{suffix}"
+        if path.exists():
+            return path
+    return data_dir / f"{table}.csv"
+
+
+def _open_binary(path: Path):
+    """Binary stream of a source file, decompressed on the fly (.gz: gzip, .zst: zstd through pyarrow)."""
+    codec = CSV_CODECS.get(path.suffix)
+    if codec == "gzip":
+        return gzip.open(path, "rb")
+    if codec == "zstd":
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("Reading .csv.zst outside DuckDB requires pyarrow (pip install pyarrow)") from e
+        return pa.input_stream(str(path), compression="zstd")
+    return open(path, "rb")
+
+
+def _gzip_size(path: Path) -> Optional[int]:
+    """Uncompressed size from the gzip ISIZE trailer (the last member's size modulo 4 GiB)."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < 18:  # shorter than a gzip header plus trailer
+            return None
+        f.seek(-4, os.SEEK_END)
+        return int.from_bytes(f.read(4), "little")
+
+
+def _zstd_size(path: Path) -> Optional[int]:
+    """
+    Uncompressed size as the sum of the content sizes declared in the zstd
+    frame headers. Blocks are skipped by their headers, nothing is
+    decompressed. None if a frame does not declare its size.
+    """
+    total = 0
+    with open(path, "rb") as f:
+        while True:
+            magic = f.read(4)
+            if not magic:
+                return total
+            if len(magic) < 4:
+                return None
+            magic = int.from_bytes(magic, "little")
+            if magic & 0xFFFFFFF0 == ZSTD_SKIPPABLE_MAGIC:
+                f.seek(int.from_bytes(f.read(4), "little"), os.SEEK_CUR)
+                continue
+            if magic != ZSTD_MAGIC:
+                return None
+            descriptor = f.read(1)[0]
+            size_flag, single_segment = descriptor >> 6, descriptor >> 5 & 1
+            has_checksum, dictionary_flag = descriptor >> 2 & 1, descriptor & 3
+            # Window descriptor (absent in single-segment frames) and dictionary id
+            f.seek((0 if single_segment else 1) + (0, 1, 2, 4)[dictionary_flag], os.SEEK_CUR)
+            size_bytes = (single_segment, 2, 4, 8)[size_flag]
+            if not size_bytes:
+                return None
+            total += int.from_bytes(f.read(size_bytes), "little") + (256 if size_bytes == 2 else 0)
+            last = 0
+            while not last:
+                header = f.read(3)
+                if len(header) < 3:
+                    return None
+                header = int.from_bytes(header, "little")
+                last, block_type, block_size = header & 1, header >> 1 & 3, header >> 3
+                # An RLE block stores its one repeated byte
+                f.seek(1 if block_type == 1 else block_size, os.SEEK_CUR)
+            if has_checksum:
+                f.seek(4, os.SEEK_CUR)
+
+
+def compression_stats(path: Path, seconds: float) -> Dict:
+    """
+    Compression ratio of a compressed source, and the load's throughput in
+    MB/s of uncompressed CSV as timed around the DuckDB read that decoded
+    it. The uncompressed size is read from the file's own metadata (gzip
+    trailer, zstd frame headers), not by decompressing it again; it is None
+    when the file does not record it. Empty for uncompressed files.
+    """
+    codec = CSV_CODECS.get(path.suffix)
+    if codec is None:
+        return {}
+    compressed = path.stat().st_size
+    uncompressed = _gzip_size(path) if codec == "gzip" else _zstd_size(path)
+    known = uncompressed is not None
+    return {
+        "compression": codec,
+        "compressed_bytes": compressed,
+        "uncompressed_bytes": uncompressed,
+        "compression_ratio": round(uncompressed / compressed, 2) if known and compressed else None,
+        "uncompressed_mb_per_sec": round(uncompressed / 1e6 / seconds, 1) if known and seconds > 0 else None,
+    }
+
+
+def check_csv_header(path: Path, table: str) -> None:
+    with io.TextIOWrapper(_open_binary(path), encoding="utf-8", newline="") as f:
+        header = next(csv.reader(f), [])
+    if header != column_names(table):
+        raise ValueError(
+            f"{path}: header {header} does not match the declared raw.{table} columns "
+            f"{column_names(table)} in {RAW_SCHEMAS_PATH.name}"
+        )
+
+
+def check_parquet_schema(cur, path: Path, table: str) -> None:
+    found = [(name, col_type) for name, col_type, *_ in cur.execute(
+        f"DESCRIBE SELECT * FROM read_parquet('{path.as_posix()}')"
+    ).fetchall()]
+    declared = [(c["name"], c["type"]) for c in RAW_SCHEMAS[table]["columns"]]
+    if found != declared:
+        raise ValueError(f"{path}: schema {found} does not match the declared raw.{table} schema {declared}")
+
+
+def source_sql(table: str, path: Path) -> str:
+    """
+    Table function reading one generated file with its declared schema.
+    CSVs are parsed with explicit column types (no sniffing pass); a value
+    that does not parse as its declared type fails the load. Compressed
+    CSVs are decompressed by DuckDB as a stream while they are parsed.
+    """
+    if path.suffix == ".parquet":
+        return f"read_parquet('{path.as_posix()}')"
+    types = ", ".join(f"'{c['name']}': '{c['type']}'" for c in RAW_SCHEMAS[table]["columns"])
+    compression = CSV_CODECS.get(path.suffix, "none")
+    return (
+        f"read_csv('{path.as_posix()}', header=true, auto_detect=false, columns={{{types}}}, "
+        f"compression='{compression}')"
+    )
+
+
+def _source_bytes(table: str, data_dir: Path = DATA) -> int:
+    path = source_path(table, data_dir)
+    return path.stat().st_size if path.exists() else 0
+
+
+def _rate(rows: int, seconds: float) -> Optional[float]:
+    return round(rows / seconds, 1) if seconds > 0 else None
+
+
+def relation_type(cur, table: str) -> Optional[str]:
+    """'BASE TABLE', 'VIEW' or None for raw.<table>."""
+    row = cur.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_schema = 'raw' AND table_name = ?", [table]
+    ).fetchone()
+    return row[0] if row else None
+
+
+def drop_relation(cur, table: str) -> None:
+    kind = relation_type(cur, table)
+    if kind is not None:
+        cur.execute(f"DROP {'VIEW' if kind == 'VIEW' else 'TABLE'} raw.{table}")
+
+
+def check_source(cur, path: Path, table: str) -> None:
+    if path.suffix == ".parquet":
+        check_parquet_schema(cur, path, table)
+    else:
+        check_csv_header(path, table)
+
+
+def load_table(con, table: str, data_dir: Path = DATA) -> Dict:
+    """
+    Create raw.<table> from its data file on a cursor of its own and return
+    its timing. The file must match the declared schema exactly (column
+    names, order and types; NULLs only in nullable columns).
+    """
+    path = source_path(table, data_dir)
+    cur = con.cursor()
+    try:
+        t0 = time.perf_counter()
+        check_source(cur, path, table)
+        cur.execute(raw_table_ddl(table))
+        cur.execute(
+            f"INSERT INTO raw.{table} SELECT {load_select(table)}, current_timestamp AS _ingested_at "
+            f"FROM {source_sql(table, path)}"
+        )
+        rows = cur.execute(f"SELECT COUNT(*) FROM raw.{table}").fetchone()[0]
+        seconds = time.perf_counter() - t0
+        return {
+            "source": path.as_posix(),
+            "source_mtime": path.stat().st_mtime,
+            "rows": rows,
+            "inserted": rows,
+            "updated": 0,
+            "skipped": 0,
+            "seconds": round(seconds, 3),
+            **compression_stats(path, seconds),
+        }
+    finally:
+        cur.close()
+
+
+def table_fingerprint(table: str, path: Path) -> str:
+    """Content hash of a source file plus the table's declared schema (a schema change is a new snapshot)."""
+    digest = hashlib.sha256(json.dumps(RAW_SCHEMAS[table], sort_keys=True).encode("utf-8"))
+    digest.update(path.suffix.encode("ascii"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:20]
+
+
+def snapshot_scan(table: str, snapshot: Path) -> str:
+    """read_parquet over a snapshot file, or over a hive-partitioned snapshot directory."""
+    if not snapshot.is_dir():
+        return f"read_parquet('{snapshot.resolve().as_posix()}')"
+    hive_types = ", ".join(f"'{c}': {column_type(table, c)}" for c in partition_columns(table))
+    return (
+        f"read_parquet('{snapshot.resolve().as_posix()}/**/*.parquet', "
+        f"hive_partitioning = true, hive_types = {{{hive_types}}})"
+    )
+
+
+def _check_not_null(cur, table: str, scan: str, path: Path) -> None:
+    not_null = [c["name"] for c in RAW_SCHEMAS[table]["columns"] if not c["nullable"]]
+    if not not_null:
+        return
+    nulls = cur.execute(
+        "SELECT " + ", ".join(f"count(*) FILTER (WHERE {c} IS NULL)" for c in not_null) + f" FROM {scan}"
+    ).fetchone()
+    bad = [c for c, n in zip(not_null, nulls) if n]
+    if bad:
+        raise ValueError(f"{path}: NULLs in non-nullable raw.{table} columns {bad}")
+
+
+def _write_snapshot(cur, table: str, path: Path, snapshot: Path) -> bool:
+    """
+    Write and validate a new snapshot next to its final path, then publish it
+    with an atomic rename. Returns False (nothing written) when a partitioned
+    snapshot would have no partitions, i.e. the source has no rows.
+    """
+    partitioned = snapshot.suffix != ".parquet"
+    tmp = snapshot.with_name(f"{snapshot.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    options = "FORMAT PARQUET, COMPRESSION ZSTD"
+    if partitioned:
+        options += f", PARTITION_BY ({', '.join(partition_columns(table))})"
+    try:
+        cur.execute(
+            f"COPY (SELECT {load_select(table)}, current_timestamp AS _ingested_at "
+            f"FROM {source_sql(table, path)}) TO '{tmp.as_posix()}' ({options})"
+        )
+        if partitioned and not any(tmp.rglob("*.parquet")):
+            return False
+        _check_not_null(cur, table, snapshot_scan(table, tmp), path)
+        try:
+            os.replace(tmp, snapshot)
+        except OSError:
+            # A concurrent run published the same content first
+            if not snapshot.exists():
+                raise
+        return True
+    finally:
+        if tmp.is_dir():
+            shutil.rmtree(tmp, ignore_errors=True)
+        elif tmp.exists():
+            tmp.unlink()
+
+
+def snapshot_table(con, table: str, data_dir: Path = DATA, partitioned: bool = False) -> Dict:
+    """
+    Point raw.<table> at the shared snapshot of its source file, writing the
+    snapshot first if this content has not been loaded before.
+
+    The run's DuckDB file only holds a view; runs whose source files are
+    unchanged share one Parquet file per table instead of each copying it.
+    A new snapshot is validated like a full load (declared types, NOT NULL
+    columns) before it is published with an atomic rename.
+
+    partitioned writes the snapshot as hive-partitioned Parquet by the
+    table's partition_by columns, so filters on them (e.g. a date range on
+    event_date) only read the matching partitions.
+    """
+    if partitioned and not partition_columns(table):
+        raise ValueError(f"raw.{table} declares no partition_by columns in {RAW_SCHEMAS_PATH.name}")
+    path = source_path(table, data_dir)
+    cur = con.cursor()
+    try:
+        t0 = time.perf_counter()
+        check_source(cur, path, table)
+        fingerprint = table_fingerprint(table, path)
+        snapshot = STORE_DIR / table / f"{fingerprint}.{'parts' if partitioned else 'parquet'}"
+        reused = snapshot.exists()
+        if not reused:
+            snapshot.parent.mkdir(parents=True, exist_ok=True)
+            if not _write_snapshot(cur, table, path, snapshot):
+                # No rows, so no partitions to scan: keep an (empty) single-file snapshot
+                snapshot = snapshot.with_suffix(".parquet")
+                reused = snapshot.exists()
+                if not reused:
+                    _write_snapshot(cur, table, path, snapshot)
+
+        drop_relation(cur, table)
+        # Stored column order; hive partition columns would otherwise come last
+        columns = ", ".join(data_columns(table) + ["_ingested_at"])
+        cur.execute(f"CREATE VIEW raw.{table} AS SELECT {columns} FROM {snapshot_scan(table, snapshot)}")
+        rows = cur.execute(f"SELECT COUNT(*) FROM raw.{table}").fetchone()[0]
+        result = {
+            "source": path.as_posix(),
+            "source_mtime": path.stat().st_mtime,
+            "snapshot": snapshot.as_posix(),
+            "reused": reused,
+            "rows": rows,
+            "inserted": 0 if reused else rows,
+            "updated": 0,
+            "skipped": rows if reused else 0,
+            "seconds": 0.0,
+        }
+        if snapshot.is_dir():
+            result["partition_by"] = partition_columns(table)
+            result["partition_files"] = sum(1 for _ in snapshot.rglob("*.parquet"))
+        seconds = time.perf_counter() - t0
+        result["seconds"] = round(seconds, 3)
+        if not reused:
+            result.update(compression_stats(path, seconds))
+        return result
+    finally:
+        cur.close()
+
+
+def merge_table(
+    con,
+    table: str,
+    data_dir: Path = DATA,
+    state: Optional[Dict] = None,
+    lookback_hours: Optional[float] = None,
+) -> Dict:
+    """
+    Append a source file's new rows to raw.<table> and upsert changed ones.
+
+    state is the table's previous raw._watermarks row. A source file
+    already ingested unchanged (same path and mtime) is not read at all.
+    For tables with an incremental watermark column, rows at or before
+    high_water_mark - lookback_hours are skipped. The remaining rows are
+    deduplicated on the primary key (the last occurrence wins). Rows with
+    new keys are inserted; rows whose key exists with different values
+    update it; identical rows are skipped.
+    """
+    schema = RAW_SCHEMAS[table]
+    path = source_path(table, data_dir)
+    result = {"source": path.as_posix(), "rows": 0, "inserted": 0, "updated": 0, "skipped": 0, "seconds": 0.0}
+    if not path.exists():
+        result["status"] = "no source file"
+        return result
+    result["source_mtime"] = path.stat().st_mtime
+    if state and state["source_path"] == result["source"] and state["source_mtime"] == result["source_mtime"]:
+        result["status"] = "unchanged since last load"
+        return result
+
+    watermark_column = (schema.get("incremental") or {}).get("watermark_column")
+    if lookback_hours is None:
+        lookback_hours = (schema.get("incremental") or {}).get("lookback_hours", 0)
+    cutoff = None
+    if watermark_column and state and state["high_water_mark"] is not None:
+        cutoff = state["high_water_mark"] - timedelta(hours=lookback_hours)
+
+    cur = con.cursor()
+    try:
+        t0 = time.perf_counter()
+        check_source(cur, path, table)
+        cur.execute("BEGIN TRANSACTION")
+        result.update(merge_rows(cur, table, source_sql(table, path), cutoff))
+        cur.execute("COMMIT")
+        seconds = time.perf_counter() - t0
+        result["seconds"] = round(seconds, 3)
+        result.update(compression_stats(path, seconds))
+        return result
+    finally:
+        cur.close()
+
+
+def merge_rows(cur, table: str, source: str, cutoff: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Merge the rows of source (a relation with the declared columns) into
+    raw.<table> within the caller's transaction: rows at or before cutoff
+    (on the watermark column) are dropped, the rest deduplicated on the
+    primary key (last occurrence wins), then inserted or updated.
+    Returns the rows, inserted, updated and skipped counts.
+    """
+    schema = RAW_SCHEMAS[table]
+    columns = data_columns(table)
+    pk = schema["primary_key"]
+    watermark_column = (schema.get("incremental") or {}).get("watermark_column")
+    delta = f"_delta_{table}"
+
+    if relation_type(cur, table) == "VIEW":
+        # Copy-on-write: a shared snapshot becomes a table of this run before it changes
+        cur.execute(f"CREATE TEMP TABLE _cow_{table} AS SELECT * FROM raw.{table}")
+        cur.execute(f"DROP VIEW raw.{table}")
+        cur.execute(raw_table_ddl(table))
+        # Derived columns are recomputed, so a snapshot from before they were declared works too
+        cur.execute(f"INSERT INTO raw.{table} SELECT {load_select(table)}, _ingested_at FROM _cow_{table}")
+        cur.execute(f"DROP TABLE _cow_{table}")
+    cur.execute(raw_table_ddl(table).replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+    cur.execute(
+        f"CREATE TEMP TABLE {delta} AS "
+        f"SELECT {load_select(table)}, row_number() OVER () AS _pos FROM {source}"
+    )
+    counts = {"rows": cur.execute(f"SELECT COUNT(*) FROM {delta}").fetchone()[0]}
+
+    if watermark_column and cutoff is not None:
+        cur.execute(f"DELETE FROM {delta} WHERE {watermark_column} <= ?", [cutoff])
+    cur.execute(f"DELETE FROM {delta} WHERE _pos NOT IN (SELECT max(_pos) FROM {delta} GROUP BY {pk})")
+
+    changed = " OR ".join(f"raw.{table}.{c} IS DISTINCT FROM d.{c}" for c in columns if c != pk)
+    assignments = ", ".join(f"{c} = d.{c}" for c in columns if c != pk)
+    counts["updated"] = cur.execute(
+        f"UPDATE raw.{table} SET {assignments}, _ingested_at = current_timestamp "
+        f"FROM {delta} d WHERE raw.{table}.{pk} = d.{pk} AND ({changed})"
+    ).fetchone()[0]
+    counts["inserted"] = cur.execute(
+        f"INSERT INTO raw.{table} SELECT {', '.join(columns)}, current_timestamp FROM {delta} d "
+        f"WHERE NOT EXISTS (SELECT 1 FROM raw.{table} r WHERE r.{pk} = d.{pk})"
+    ).fetchone()[0]
+    counts["skipped"] = counts["rows"] - counts["inserted"] - counts["updated"]
+    cur.execute(f"DROP TABLE {delta}")
+    return counts
+
+
+def ensure_watermarks(con) -> None:
+    con.execute(WATERMARKS_DDL)
+    # Base files from before id watermarks existed
+    con.execute("ALTER TABLE raw._watermarks ADD COLUMN IF NOT EXISTS high_water_id BIGINT")
+
+
+def attach_sqlite(con, db_path: Path, reader: str = "auto") -> str:
+    """
+    Resolve the SQLite reader and return it. For the scanner, db_path is
+    attached read-only as SQLITE_ALIAS (visible to every cursor of con).
+    """
+    if reader == "python":
+        return reader
+    if con.execute("SELECT 1 FROM duckdb_databases() WHERE database_name = ?", [SQLITE_ALIAS]).fetchone():
+        return "scanner"
+    try:
+        con.execute("INSTALL sqlite")
+        con.execute("LOAD sqlite")
+    except duckdb.Error as e:
+        if reader == "scanner":
+            raise
+        print(f"DuckDB sqlite extension unavailable ({str(e).splitlines()[0]}); using the python reader")
+        return "python"
+    con.execute(f"ATTACH '{db_path.as_posix()}' AS {SQLITE_ALIAS} (TYPE sqlite, READ_ONLY)")
+    return "scanner"
+
+
+def _sqlite_connect(db_path: Path) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{db_path.as_posix()}?mode=ro", uri=True)
+
+
+def sqlite_tables(db_path: Path) -> List[str]:
+    """Tables present in the SQLite database (the generator creates a table on its first row)."""
+    conn = _sqlite_connect(db_path)
+    try:
+        return [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    finally:
+        conn.close()
+
+
+def _sqlite_rows(table: str, db_path: Path) -> int:
+    """Cheap size estimate of a SQLite table (its largest rowid), for scheduling."""
+    conn = _sqlite_connect(db_path)
+    try:
+        return conn.execute(f"SELECT max(rowid) FROM {table}").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def sqlite_batches(db_path: Path, table: str, min_id: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    The declared columns of a SQLite table as Arrow tables of up to
+    chunk_size rows, only rows with primary key > min_id. The projection
+    and the id filter run inside SQLite (on its primary-key index), so
+    only the needed rows and columns cross into Python.
+    """
+    import pyarrow as pa
+
+    columns = column_names(table)
+    pk = RAW_SCHEMAS[table]["primary_key"]
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    params: List = []
+    if min_id is not None:
+        sql += f" WHERE {pk} > ?"
+        params.append(min_id)
+    conn = _sqlite_connect(db_path)
+    try:
+        cursor = conn.execute(sql + f" ORDER BY {pk}", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            arrays = []
+            for values in zip(*rows):
+                try:
+                    arrays.append(pa.array(values))
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    # SQLite typing is per value; a mixed column goes over as text and is cast by DuckDB
+                    arrays.append(pa.array([None if v is None else str(v) for v in values], pa.string()))
+            yield pa.Table.from_arrays(arrays, names=columns)
+    finally:
+        conn.close()
+
+
+def _extract_sqlite(
+    cur,
+    table: str,
+    db_path: Path,
+    reader: str,
+    staging: str,
+    min_id: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """
+    Copy a SQLite table's rows (primary key > min_id) into a new temp table
+    of the declared types and return the row count. A table missing from
+    the database (it never had a row) yields an empty staging table.
+    """
+    columns = RAW_SCHEMAS[table]["columns"]
+    pk = RAW_SCHEMAS[table]["primary_key"]
+    declared = ", ".join(f"{c['name']} {c['type']}" for c in columns)
+    cur.execute(f"CREATE TEMP TABLE {staging} ({declared})")
+    if table not in sqlite_tables(db_path):
+        return 0
+    casts = ", ".join(f"CAST({c['name']} AS {c['type']}) AS {c['name']}" for c in columns)
+    if reader == "scanner":
+        # The extension reads only the projected columns; the id predicate is pushed into the scan
+        where = f" WHERE {pk} > {int(min_id)}" if min_id is not None else ""
+        cur.execute(f"INSERT INTO {staging} SELECT {casts} FROM {SQLITE_ALIAS}.{table}{where}")
+    else:
+        for batch in sqlite_batches(db_path, table, min_id, chunk_size):
+            cur.register("_sqlite_batch", batch)
+            cur.execute(f"INSERT INTO {staging} SELECT {casts} FROM _sqlite_batch")
+            cur.unregister("_sqlite_batch")
+    return cur.execute(f"SELECT COUNT(*) FROM {staging}").fetchone()[0]
+
+
+def sqlite_table(
+    con,
+    table: str,
+    db_path: Path = SQLITE_DB,
+    reader: str = "python",
+    incremental: bool = False,
+    state: Optional[Dict] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict:
+    """
+    Load raw.<table> from the generator's SQLite database the way an
+    extract from the OLTP source would run.
+
+    A full load creates raw.<table> from all rows. An incremental load
+    pulls only rows whose primary key is above the table's last
+    high_water_id for append-only tables (those with an "incremental"
+    block: ids only grow), and re-pulls the other, small and mutable,
+    tables whole; both are merged on the primary key (see merge_rows).
+    extract_seconds is the time spent reading SQLite.
+    """
+    result = {
+        "source": db_path.as_posix(), "source_mtime": db_path.stat().st_mtime, "reader": reader,
+        "rows": 0, "inserted": 0, "updated": 0, "skipped": 0, "seconds": 0.0,
+    }
+    if incremental and state and state["source_path"] == result["source"] \
+            and state["source_mtime"] == result["source_mtime"]:
+        result["status"] = "unchanged since last load"
+        return result
+    min_id = None
+    if incremental and state and RAW_SCHEMAS[table].get("incremental"):
+        min_id = state["high_water_id"]
+    staging = f"_sqlite_{table}"
+
+    cur = con.cursor()
+    try:
+        t0 = time.perf_counter()
+        rows = _extract_sqlite(cur, table, db_path, reader, staging, min_id, chunk_size)
+        result["extract_seconds"] = round(time.perf_counter() - t0, 3)
+        result["extract_rows_per_sec"] = _rate(rows, result["extract_seconds"])
+        if min_id is not None:
+            result["min_id"] = min_id
+
+        if incremental:
+            cur.execute("BEGIN TRANSACTION")
+            result.update(merge_rows(cur, table, staging))
+            cur.execute("COMMIT")
+        else:
+            cur.execute(raw_table_ddl(table))
+            cur.execute(f"INSERT INTO raw.{table} SELECT {load_select(table)}, current_timestamp FROM {staging}")
+            result.update(rows=rows, inserted=rows)
+        cur.execute(f"DROP TABLE {staging}")
+        result["seconds"] = round(time.perf_counter() - t0, 3)
+        return result
+    finally:
+        cur.close()
+
+
+def read_watermarks(con) -> Dict[str, Dict]:
+    ensure_watermarks(con)
+    rows = con.execute(
+        "SELECT table_name, watermark_column, high_water_mark, high_water_id, source_path, source_mtime "
+        "FROM raw._watermarks"
+    ).fetchall()
+    return {
+        t: {"watermark_column": c, "high_water_mark": hwm, "high_water_id": hwid, "source_path": p, "source_mtime": m}
+        for t, c, hwm, hwid, p, m in rows
+    }
+
+
+def write_watermarks(con, results: Dict[str, Dict], run_id: str) -> None:
+    """Record each loaded table's high-water mark, highest id and source file (tables left unread keep their row)."""
+    ensure_watermarks(con)
+    for t, result in results.items():
+        if "source_mtime" not in result and result["source"] != "generator":
+            continue
+        watermark_column = (RAW_SCHEMAS[t].get("incremental") or {}).get("watermark_column")
+        hwm = None
+        if watermark_column:
+            hwm = con.execute(f"SELECT max({watermark_column}) FROM raw.{t}").fetchone()[0]
+            result["high_water_mark"] = hwm.isoformat(sep=" ") if hwm else None
+        hwid = con.execute(f"SELECT max({RAW_SCHEMAS[t]['primary_key']}) FROM raw.{t}").fetchone()[0]
+        result["high_water_id"] = hwid
+        con.execute("DELETE FROM raw._watermarks WHERE table_name = ?", [t])
+        con.execute(
+            "INSERT INTO raw._watermarks (table_name, watermark_column, high_water_mark, high_water_id, "
+            "last_ingested_at, source_path, source_mtime, run_id) VALUES (?, ?, ?, ?, current_timestamp, ?, ?, ?)",
+            [t, watermark_column, hwm, hwid, result["source"], result.get("source_mtime"), run_id],
+        )
+
+
+def run_concurrently(
+    load,
+    con,
+    workers: int,
+    data_dir: Path = DATA,
+    table_kwargs: Optional[Dict[str, Dict]] = None,
+    size=_source_bytes,
+) -> Dict[str, Dict]:
+    """
+    Run load(con, table, data_dir, **table_kwargs[table]) for every table
+    concurrently, one DuckDB cursor per table, largest source first
+    (size(table, data_dir)) so the biggest table starts (and finishes) as
+    early as possible. Wall-clock is then close to the slowest single table.
+    """
+    ordered = sorted(TABLES, key=lambda t: size(t, data_dir), reverse=True)
+    timings: Dict[str, Dict] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(load, con, t, data_dir, **(table_kwargs or {}).get(t, {})): t for t in ordered}
+        for future in as_completed(futures):
+            t = futures[future]
+            timings[t] = future.result()
+            print(f"Loaded raw.{t} from {timings[t]['source']} in {timings[t]['seconds']:.3f}s"
+                  + (f" ({timings[t]['status']})" if "status" in timings[t] else ""))
+    return {t: timings[t] for t in TABLES}
+
+
+def load_from_files(con, workers: int, data_dir: Path = DATA) -> Dict[str, Dict]:
+    """Full load: create every raw table from its file."""
+    return run_concurrently(load_table, con, workers, data_dir)
+
+
+def load_snapshots(con, workers: int, data_dir: Path = DATA, partition: Sequence[str] = ()) -> Dict[str, Dict]:
+    """Snapshot layout: point every raw table at the shared snapshot of its file (hive-partitioned for `partition`)."""
+    return run_concurrently(snapshot_table, con, workers, data_dir, {t: {"partitioned": t in partition} for t in TABLES})
+
+
+def load_incremental(
+    con,
+    workers: int,
+    data_dir: Path = DATA,
+    lookback_hours: Optional[float] = None,
+) -> Dict[str, Dict]:
+    """Incremental load: merge every table's file into the existing raw tables (see merge_table)."""
+    states = read_watermarks(con)
+    return run_concurrently(
+        merge_table, con, workers, data_dir,
+        {t: {"state": states.get(t), "lookback_hours": lookback_hours} for t in TABLES},
+    )
+
+
+def load_sqlite(
+    con,
+    workers: int,
+    db_path: Path = SQLITE_DB,
+    reader: str = "auto",
+    incremental: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, Dict]:
+    """Load (or, incrementally, pull the new ids of) every raw table from the SQLite database (see sqlite_table)."""
+    reader = attach_sqlite(con, db_path, reader)
+    states = read_watermarks(con) if incremental else {}
+    return run_concurrently(
+        sqlite_table, con, workers, db_path,
+        {t: {"reader": reader, "incremental": incremental, "state": states.get(t), "chunk_size": chunk_size}
+         for t in TABLES},
+        size=_sqlite_rows,
+    )
+
+
+def compare_sources(
+    con,
+    data_dir: Path = DATA,
+    db_path: Path = SQLITE_DB,
+    reader: str = "auto",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, Dict]:
+    """
+    Ingest throughput of every table from its data file and from SQLite,
+    read one after the other into scratch temp tables (raw.* is untouched).
+    Tables missing from either source are left out.
+    """
+    reader = attach_sqlite(con, db_path, reader)
+    present = set(sqlite_tables(db_path))
+    comparison: Dict[str, Dict] = {}
+    cur = con.cursor()
+    try:
+        for t in TABLES:
+            path = source_path(t, data_dir)
+            if t not in present or not path.exists():
+                continue
+            t0 = time.perf_counter()
+            cur.execute(f"CREATE TEMP TABLE _cmp_files AS SELECT * FROM {source_sql(t, path)}")
+            files_seconds = time.perf_counter() - t0
+            rows = cur.execute("SELECT COUNT(*) FROM _cmp_files").fetchone()[0]
+            cur.execute("DROP TABLE _cmp_files")
+
+            t0 = time.perf_counter()
+            sqlite_rows = _extract_sqlite(cur, t, db_path, reader, "_cmp_sqlite", chunk_size=chunk_size)
+            sqlite_seconds = time.perf_counter() - t0
+            cur.execute("DROP TABLE _cmp_sqlite")
+
+            comparison[t] = {
+                "files": {"source": path.as_posix(), "rows": rows, "seconds": round(files_seconds, 3),
+                          "rows_per_sec": _rate(rows, files_seconds), "bytes": path.stat().st_size},
+                "sqlite": {"source": db_path.as_posix(), "reader": reader, "rows": sqlite_rows,
+                           "seconds": round(sqlite_seconds, 3), "rows_per_sec": _rate(sqlite_rows, sqlite_seconds)},
+            }
+    finally:
+        cur.close()
+    return comparison
+
+
+def resolve_base_db(base_db: Optional[str]) -> Optional[Path]:
+    """--base-db, else the DuckDB file LATEST_DB.txt points at (None if there is none)."""
+    if base_db:
+        return Path(base_db)
+    if LATEST_PTR.exists():
+        name = LATEST_PTR.read_text(encoding="utf-8").strip()
+        if name:
+            return DUCK_DIR / name
+    return None
+
+
+def _import_generator():
+    """The generator's data_generator module (generator/ is not a package)."""
+    if str(GENERATOR_DIR) not in sys.path:
+        sys.path.insert(0, str(GENERATOR_DIR))
+    import data_generator
+
+    return data_generator
+
+
+def load_from_generator(
+    con,
+    seed: int = 42,
+    engine: str = "python",
+    chunk_size: int = 50_000,
+    scale_factor: float = 1,
+) -> Dict[str, Dict]:
+    """
+    Generate the data in-process and create raw.* straight from typed Arrow
+    batches (no CSV/SQLite round trip). All tables load in one transaction
+    through a single writer, since the batches arrive one at a time; each
+    table's seconds are the time spent ingesting its batches. scale_factor
+    sizes every table as the generator's --scale-factor does.
+    """
+    data_generator = _import_generator()
+    from writers import to_arrow
+
+    gen = data_generator.CartonCapsDataGenerator(seed=seed, output_dir=str(DATA))
+    counts = data_generator.scale_counts(scale_factor)
+    print(f"Loading raw.* from the generator (seed={seed}, engine={engine}, scale_factor={scale_factor}, "
+          f"chunk_size={chunk_size})")
+
+    timings = {t: {"source": "generator", "rows": 0, "inserted": 0, "updated": 0, "skipped": 0, "seconds": 0.0}
+               for t in TABLES}
+    con.execute("BEGIN TRANSACTION")
+    # Declared tables up front, so tables that produce no rows still exist (typed, empty)
+    for t in TABLES:
+        con.execute(raw_table_ddl(t))
+    for t, rows in gen.iter_tables(**counts, engine=engine, chunk_size=chunk_size):
+        t0 = time.perf_counter()
+        con.register("_batch", to_arrow(rows, t))
+        con.execute(f"INSERT INTO raw.{t} SELECT {load_select(t)}, current_timestamp FROM _batch")
+        con.unregister("_batch")
+        timings[t]["rows"] += len(rows)
+        timings[t]["inserted"] += len(rows)
+        timings[t]["seconds"] += time.perf_counter() - t0
+    con.execute("COMMIT")
+
+    for timing in timings.values():
+        timing["seconds"] = round(timing["seconds"], 3)
+    return {t: timings[t] for t in TABLES}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load generated data into raw.* of a run's DuckDB file.")
+    parser.add_argument("run_id", nargs="?", default=None)
+    parser.add_argument("--source", choices=SOURCES, default="files",
+                        help="files: read data/*.parquet|csv[.gz|.zst]; generator: ingest Arrow batches in-process; "
+                             "sqlite: extract from the generator's SQLite database")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed (--source generator)")
+    parser.add_argument("--engine", choices=("python", "numpy"), default="python",
+                        help="Generator engine (--source generator)")
+    parser.add_argument("--scale-factor", default="1",
+                        help="Multiply every generated table's size by this factor, e.g. 10 or SF10 "
+                             "(--source generator; default 1)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows per Arrow batch (--source generator) or per SQLite read (--source sqlite)")
+    parser.add_argument("--sqlite-db", default=str(SQLITE_DB), help="SQLite database to extract from (--source sqlite)")
+    parser.add_argument("--sqlite-reader", choices=SQLITE_READERS, default="auto",
+                        help="scanner: DuckDB's sqlite extension; python: stdlib sqlite3 in chunks; "
+                             "auto: the scanner if the extension loads (--source sqlite)")
+    parser.add_argument("--compare-sources", action="store_true",
+                        help="Also time ingesting every table from the data files and from SQLite and report "
+                             "both throughputs")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="DuckDB threads (default: number of CPU cores)")
+    parser.add_argument("--memory-limit", default=None,
+                        help=f"DuckDB memory_limit, e.g. 4GB (default: {MEMORY_FRACTION:.0%} of physical RAM)")
+    parser.add_argument("--workers", type=int, default=len(TABLES),
+                        help="Tables loaded concurrently (--source files|sqlite)")
+    parser.add_argument("--data-dir", default=str(DATA),
+                        help="Directory of the generated files (--source files), e.g. a data/slices/<date> delta")
+    parser.add_argument("--layout", choices=LAYOUTS, default="tables",
+                        help="tables: materialize raw.* in the run's file; snapshot: views over shared Parquet "
+                             "snapshots in duckdb/store, reused while a source file is unchanged (--source files)")
+    parser.add_argument("--partition", default="",
+                        help="Comma-separated tables whose snapshot is hive-partitioned Parquet, so date-range "
+                             f"filters read only the partitions they touch (--layout snapshot; one of {PARTITIONABLE})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Start from --base-db and merge only new/changed rows (watermarks + primary-key dedup)")
+    parser.add_argument("--base-db", default=None,
+                        help="DuckDB file an --incremental run starts from (default: the one LATEST_DB.txt points at)")
+    parser.add_argument("--lookback-hours", type=float, default=None,
+                        help="Re-check rows this far behind each high-water mark (default: per table, "
+                             f"from {RAW_SCHEMAS_PATH.name})")
+    args = parser.parse_args(argv)
+    if args.incremental and args.source == "generator":
+        parser.error("--incremental reads files or SQLite (--source files|sqlite)")
+    try:
+        args.scale_factor = _import_generator().parse_scale_factor(args.scale_factor)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.scale_factor != 1 and args.source != "generator":
+        parser.error("--scale-factor sizes generated data (--source generator); files are loaded as they are")
+    if args.layout == "snapshot" and (args.source != "files" or args.incremental):
+        parser.error("--layout snapshot is for full loads from files")
+    args.partition = [t.strip() for t in args.partition.split(",") if t.strip()]
+    unknown = [t for t in args.partition if t not in PARTITIONABLE]
+    if unknown:
+        parser.error(f"--partition: {unknown} not partitionable; expected some of {PARTITIONABLE}")
+    if args.partition and args.layout != "snapshot":
+        parser.error("--partition needs --layout snapshot")
+    if (args.source == "sqlite" or args.compare_sources) and not Path(args.sqlite_db).exists():
+        parser.error(f"SQLite database not found: {args.sqlite_db}")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be >= 1")
+    if args.threads is not None and args.threads < 1:
+        parser.error("--threads must be >= 1")
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
     # If run_id passed, use it; otherwise timestamp
-    run_id = sys.argv[1].strip() if len(sys.argv) > 1 else datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    run_id = args.run_id.strip() if args.run_id else datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
 
     db_path = DUCK_DIR / f"carton_caps_{run_id}.duckdb"
 
     print(f"Using Python interpreter: {sys.executable}")
     print(f"Writing DuckDB to: {db_path}")
 
+    threads = args.threads or default_threads()
+    memory_limit = args.memory_limit or default_memory_limit()
+
+    base_db = None
+    if args.incremental:
+        base_db = resolve_base_db(args.base_db)
+        if base_db is not None and base_db.exists() and base_db.resolve() != db_path.resolve():
+            # A new run file that starts as a byte copy of the base; only the delta is parsed
+            print(f"Incremental load on top of {base_db}")
+            shutil.copyfile(base_db, db_path)
+        elif base_db is None or not base_db.exists():
+            print("Incremental load without a base DuckDB file: loading everything as new rows")
+
     con = duckdb.connect(str(db_path))
-    con.execute("PRAGMA threads=4;")
+    configure(con, threads, memory_limit)
+    print(f"DuckDB threads={threads}, memory_limit={memory_limit or 'duckdb default'}")
 
     con.execute("CREATE SCHEMA IF NOT EXISTS raw;")
 
-    for t in ["schools","users","products","referrals","purchases","events"]:
-        con.execute(f"DROP TABLE IF EXISTS raw.{t}")
-
-    con.execute(f"CREATE TABLE raw.schools   AS SELECT *, current_timestamp AS _ingested_at FROM read_csv_auto('{DATA / 'schools.csv'}', header=true)")
-    con.execute(f"CREATE TABLE raw.users     AS SELECT *, current_timestamp AS _ingested_at FROM read_csv_auto('{DATA / 'users.csv'}', header=true)")
-    con.execute(f"CREATE TABLE raw.products  AS SELECT *, current_timestamp AS _ingested_at FROM read_csv_auto('{DATA / 'products.csv'}', header=true)")
-    con.execute(f"CREATE TABLE raw.referrals AS SELECT *, current_timestamp AS _ingested_at FROM read_csv_auto('{DATA / 'referrals.csv'}', header=true)")
-    con.execute(f"CREATE TABLE raw.purchases AS SELECT *, current_timestamp AS _ingested_at FROM read_csv_auto('{DATA / 'purchases.csv'}', header=true)")
-    con.execute(f"CREATE TABLE raw.events    AS SELECT *, current_timestamp AS _ingested_at FROM read_csv_auto('{DATA / 'events.csv'}', header=true)")
-
-    counts = con.execute("""
-    SELECT 'schools' AS table_name, COUNT(*) cnt FROM raw.schools
-    UNION ALL SELECT 'users', COUNT(*) FROM raw.users
-    UNION ALL SELECT 'products', COUNT(*) FROM raw.products
-    UNION ALL SELECT 'referrals', COUNT(*) FROM raw.referrals
-    UNION ALL SELECT 'purchases', COUNT(*) FROM raw.purchases
-    UNION ALL SELECT 'events', COUNT(*) FROM raw.events
-    ORDER BY table_name;
-    """).fetchall()
-
-    for name, cnt in counts:
-        print(f"{name:10s} {cnt}")
+    if not args.incremental:
+        for t in TABLES:
+            drop_relation(con, t)
+        con.execute("DROP TABLE IF EXISTS raw._watermarks")
+
+    data_dir = Path(args.data_dir)
+    sqlite_db = Path(args.sqlite_db)
+    t0 = time.perf_counter()
+    if args.source == "sqlite":
+        timings = load_sqlite(con, workers=args.workers, db_path=sqlite_db, reader=args.sqlite_reader,
+                              incremental=args.incremental, chunk_size=args.chunk_size)
+    elif args.source == "generator":
+        timings = load_from_generator(con, seed=args.seed, engine=args.engine, chunk_size=args.chunk_size,
+                                      scale_factor=args.scale_factor)
+    elif args.layout == "snapshot":
+        timings = load_snapshots(con, workers=args.workers, data_dir=data_dir, partition=args.partition)
+    elif args.incremental:
+        timings = load_incremental(con, workers=args.workers, data_dir=data_dir, lookback_hours=args.lookback_hours)
+    else:
+        timings = load_from_files(con, workers=args.workers, data_dir=data_dir)
+    write_watermarks(con, timings, run_id)
+    wall_seconds = round(time.perf_counter() - t0, 3)
+
+    comparison = None
+    if args.compare_sources:
+        comparison = compare_sources(con, data_dir, sqlite_db, args.sqlite_reader, args.chunk_size)
 
     con.close()
 
+    for name in sorted(timings):
+        t = timings[name]
+        t["rows_per_sec"] = _rate(t["rows"], t["seconds"])
+        rate = f"{t['rows_per_sec']:>12,.0f} rows/s" if t["rows_per_sec"] else ""
+        if "compression" in t:
+            rate += (f"  {t['compression']} ratio {t['compression_ratio'] or '?'}x, "
+                     f"{t['uncompressed_mb_per_sec'] or 0:,.1f} MB/s uncompressed")
+        print(f"{name:10s} {t['rows']:>10} rows  +{t['inserted']} ~{t['updated']} ={t['skipped']}  "
+              f"{t['seconds']:>8.3f}s {rate}")
+    print(f"Loaded raw.* in {wall_seconds:.3f}s (sum of tables {sum(v['seconds'] for v in timings.values()):.3f}s)")
+
+    if comparison:
+        print("Ingest throughput by source (rows/s):")
+        for name, c in comparison.items():
+            files, sqlite = c["files"], c["sqlite"]
+            print(f"{name:10s} {files['rows']:>10} rows  files {files['rows_per_sec'] or 0:>12,.0f}  "
+                  f"sqlite ({sqlite['reader']}) {sqlite['rows_per_sec'] or 0:>12,.0f}")
+
+    # Per-table timings for the pipeline manifest
+    LOG_DIR.mkdir(exist_ok=True)
+    report_path = LOG_DIR / f"load_raw_{run_id}.json"
+    report = {
+        "run_id": run_id,
+        "source": args.source,
+        "mode": "incremental" if args.incremental else "full",
+        "layout": args.layout,
+        "partitioned": args.partition,
+        "base_db": str(base_db) if base_db else None,
+        "data_dir": str(data_dir) if args.source == "files" else None,
+        "sqlite_db": str(sqlite_db) if args.source == "sqlite" else None,
+        "scale_factor": args.scale_factor if args.source == "generator" else None,
+        "threads": threads,
+        "memory_limit": memory_limit,
+        "workers": args.workers if args.source != "generator" else 1,
+        "wall_seconds": wall_seconds,
+        "tables": timings,
+    }
+    if comparison is not None:
+        report["source_comparison"] = comparison
+    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote load report: {report_path}")
+
     # Write pointer for Streamlit / dbt
 
 if __name__ == "__main__":
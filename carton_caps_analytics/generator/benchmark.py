@@ -0,0 +1,266 @@
+"""
+Generator throughput benchmark.
+
+Runs every generator stage at one or more scale factors and reports, per
+table, rows generated, rows/sec, seconds spent writing, bytes written and
+the process's peak memory, as JSON:
+
+- generate: draw the table (facts through the selected engine)
+- write: save it in the selected output format(s)
+- sqlite (optional): build the SQLite copy of all tables
+
+Each scale factor runs in its own worker process so its peak memory is not
+inflated by an earlier, larger run. Peak memory is the peak resident set
+size (ru_maxrss) of that process after each stage; it is null on platforms
+without the resource module.
+
+Usage:
+    python generator/benchmark.py
+    python generator/benchmark.py --scale-factors 1,10,100 --engine numpy --format parquet
+    python generator/benchmark.py --csv-compression zstd
+    python generator/benchmark.py --output logs/generator_benchmark.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+GENERATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+if GENERATOR_DIR not in sys.path:
+    sys.path.insert(0, GENERATOR_DIR)
+
+from data_generator import (
+    BASE_COUNTS,
+    ENGINES,
+    SQLITE_FILENAME,
+    CartonCapsDataGenerator,
+    parse_scale_factor,
+    scale_counts,
+)
+from writers import CSV_COMPRESSIONS, DEFAULT_ROW_GROUP_SIZE, OUTPUT_FORMATS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(GENERATOR_DIR)
+LOG_DIR = os.path.join(ROOT, "logs")
+
+DEFAULT_SCALE_FACTORS = "1,10"
+
+# Stages in generate_all order (users are written before referrals add referred users)
+TABLES = tuple(BASE_COUNTS)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _table_files(output_dir: str, table_name: str) -> List[str]:
+    paths = [os.path.join(output_dir, table_name + suffix) for suffix in (*CSV_COMPRESSIONS.values(), ".parquet")]
+    return [p for p in paths if os.path.exists(p)]
+
+
+def _rate(rows: int, seconds: float) -> Optional[float]:
+    return round(rows / seconds, 1) if seconds > 0 else None
+
+
+def run_scale_factor(
+    scale_factor: float,
+    engine: str = "python",
+    output_format: str = "csv",
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    columnar: bool = False,
+    sqlite: bool = False,
+    seed: int = 42,
+    csv_compression: str = "none",
+) -> Dict:
+    """Generate and write every table at scale_factor in a scratch directory, timing each stage."""
+    counts = scale_counts(scale_factor)
+    output_dir = tempfile.mkdtemp(prefix=f"carton_caps_bench_sf{scale_factor}_")
+    stages: List[Dict] = []
+    started = time.perf_counter()
+    try:
+        gen = CartonCapsDataGenerator(
+            seed=seed, output_dir=output_dir, columnar=columnar, csv_compression=csv_compression
+        )
+        facts = gen._fact_engine(engine)
+        generate = {
+            "schools": gen.generate_schools,
+            "users": gen.generate_users,
+            "products": gen.generate_products,
+            "referrals": facts.generate_referrals,
+            "purchases": facts.generate_purchases,
+        }
+
+        # Generator output is chatty; keep stdout for the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            for table_name in TABLES + ("events",):
+                t0 = time.perf_counter()
+                if table_name == "events":
+                    facts.generate_events()
+                else:
+                    generate[table_name](counts[f"n_{table_name}"])
+                generate_seconds = time.perf_counter() - t0
+                rows = getattr(gen, table_name)
+
+                t0 = time.perf_counter()
+                gen.save_table(rows, table_name, output_format, row_group_size)
+                write_seconds = time.perf_counter() - t0
+
+                stages.append({
+                    "stage": table_name,
+                    "rows": len(rows),
+                    "generate_seconds": round(generate_seconds, 4),
+                    "rows_per_sec": _rate(len(rows), generate_seconds),
+                    "write_seconds": round(write_seconds, 4),
+                    "write_rows_per_sec": _rate(len(rows), write_seconds),
+                    "bytes_written": sum(os.path.getsize(p) for p in _table_files(output_dir, table_name)),
+                    "peak_rss_bytes": peak_rss_bytes(),
+                })
+
+            if sqlite:
+                rows = sum(len(getattr(gen, t)) for t in TABLES + ("events",))
+                t0 = time.perf_counter()
+                gen.save_to_sqlite()
+                write_seconds = time.perf_counter() - t0
+                stages.append({
+                    "stage": "sqlite",
+                    "rows": rows,
+                    "write_seconds": round(write_seconds, 4),
+                    "write_rows_per_sec": _rate(rows, write_seconds),
+                    "bytes_written": os.path.getsize(os.path.join(output_dir, SQLITE_FILENAME)),
+                    "peak_rss_bytes": peak_rss_bytes(),
+                })
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        "scale_factor": scale_factor,
+        "counts": {t: counts[f"n_{t}"] for t in TABLES},
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "bytes_written": sum(s["bytes_written"] for s in stages),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "stages": stages,
+    }
+
+
+def _run_task(kwargs: Dict) -> Dict:
+    return run_scale_factor(**kwargs)
+
+
+def run_benchmark(
+    scale_factors: List[float],
+    engine: str = "python",
+    output_format: str = "csv",
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    columnar: bool = False,
+    sqlite: bool = False,
+    seed: int = 42,
+    csv_compression: str = "none",
+) -> Dict:
+    """Benchmark each scale factor in a fresh worker process and collect the results."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {ENGINES}")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output_format {output_format!r}; expected one of {OUTPUT_FORMATS}")
+
+    report = {
+        "benchmark": "generator",
+        "started_at_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "engine": engine,
+        "output_format": output_format,
+        "csv_compression": csv_compression,
+        "row_group_size": row_group_size,
+        "columnar": columnar,
+        "seed": seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": [],
+    }
+    for scale_factor in scale_factors:
+        task = dict(
+            scale_factor=scale_factor, engine=engine, output_format=output_format,
+            row_group_size=row_group_size, columnar=columnar, sqlite=sqlite, seed=seed,
+            csv_compression=csv_compression,
+        )
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            run = pool.submit(_run_task, task).result()
+        report["runs"].append(run)
+        _print_run(run)
+    return report
+
+
+def _print_run(run: Dict) -> None:
+    print(f"SF{run['scale_factor']}: {run['total_seconds']:.2f}s, "
+          f"{run['bytes_written'] / 1e6:.1f} MB written, peak RSS "
+          + (f"{run['peak_rss_bytes'] / 1e6:.0f} MB" if run["peak_rss_bytes"] is not None else "n/a"))
+    for s in run["stages"]:
+        rate = s.get("rows_per_sec")
+        print(f"  {s['stage']:<10} {s['rows']:>12,} rows  "
+              + (f"{rate:>12,.0f} rows/s  " if rate else " " * 20)
+              + f"write {s['write_seconds']:>8.3f}s  {s['bytes_written'] / 1e6:>9.2f} MB")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the Carton Caps data generator at several scale factors.")
+    parser.add_argument("--scale-factors", default=DEFAULT_SCALE_FACTORS,
+                        help=f"Comma-separated scale factors, e.g. 1,10,100 or SF1,SF10 (default {DEFAULT_SCALE_FACTORS})")
+    parser.add_argument("--engine", choices=ENGINES, default="python")
+    parser.add_argument("--format", dest="output_format", choices=OUTPUT_FORMATS, default="csv")
+    parser.add_argument("--csv-compression", choices=tuple(CSV_COMPRESSIONS), default="none")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--columnar", action="store_true", help="Hold tables in typed column stores")
+    parser.add_argument("--sqlite", action="store_true", help="Also time the SQLite copy")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None,
+                        help="JSON report path (default logs/generator_benchmark_<UTC timestamp>.json)")
+    args = parser.parse_args(argv)
+    try:
+        args.scale_factors = [parse_scale_factor(v) for v in args.scale_factors.split(",") if v.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.scale_factors:
+        parser.error("--scale-factors must list at least one scale factor")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run_benchmark(
+        args.scale_factors,
+        engine=args.engine,
+        output_format=args.output_format,
+        row_group_size=args.row_group_size,
+        columnar=args.columnar,
+        sqlite=args.sqlite,
+        seed=args.seed,
+        csv_compression=args.csv_compression,
+    )
+
+    output = args.output
+    if output is None:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        output = os.path.join(LOG_DIR, f"generator_benchmark_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote benchmark report to {output}")
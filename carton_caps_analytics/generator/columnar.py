@@ -0,0 +1,402 @@
+"""
+Compact column store for generated tables.
+
+A list of row dicts costs several hundred bytes per row (the dict itself plus
+a boxed int/float/datetime/str per field). ColumnStore keeps one typed array
+per column instead, typed from writers.COLUMN_TYPES:
+
+- INTEGER / BIGINT / DOUBLE: array('i') / array('q') / array('d')
+- TIMESTAMP: array('q') of microseconds since the Unix epoch
+- low-cardinality VARCHAR (DICTIONARY_COLUMNS): int32 codes into a
+  per-column dictionary of distinct values
+- other VARCHAR: one UTF-8 buffer plus int64 offsets (Arrow's layout)
+
+NULLs are tracked in a per-column byte mask, allocated only once a column
+sees its first None.
+
+The store keeps the list-of-dicts API the generator relies on (append,
+extend, len, iteration and indexing return row dicts), so the generator
+methods fill it unchanged. It exports to CSV, Parquet and Arrow; the Arrow
+and Parquet exports are built from the column buffers without decoding rows.
+
+Usage:
+    gen = CartonCapsDataGenerator(seed=42, columnar=True)
+    gen.generate_all(n_purchases=5_000_000)
+    gen.events.to_arrow()
+"""
+
+from __future__ import annotations
+
+import abc
+import csv
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from writers import COLUMN_TYPES, DEFAULT_ROW_GROUP_SIZE, arrow_schema, open_csv
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# VARCHAR columns with a handful of distinct values, stored as dictionary codes
+DICTIONARY_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "schools": ("city", "state"),
+    "users": ("first_name", "last_name", "user_type", "marketing_channel"),
+    "products": ("category",),
+    "referrals": ("status",),
+    "purchases": ("day_of_week",),
+    "events": ("event_type", "metadata_json"),
+}
+
+_TYPECODES = {"INTEGER": "i", "BIGINT": "q", "DOUBLE": "d"}
+
+
+class _Column(abc.ABC):
+    """One column: typed storage plus an optional NULL mask."""
+
+    __slots__ = ("nulls", "size")
+
+    def __init__(self):
+        self.nulls: Optional[bytearray] = None
+        self.size = 0
+
+    def append(self, value) -> None:
+        if value is None:
+            if self.nulls is None:
+                self.nulls = bytearray(self.size)
+            self.nulls.append(1)
+            self._append_null()
+        else:
+            if self.nulls is not None:
+                self.nulls.append(0)
+            self._append(value)
+        self.size += 1
+
+    def get(self, i: int):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return self._get(i)
+
+    def values(self) -> Iterator:
+        if self.nulls is None:
+            return self._values()
+        return (None if null else value for null, value in zip(self.nulls, self._values()))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.nulls) if self.nulls is not None else 0
+
+    @abc.abstractmethod
+    def to_arrow(self, arrow_type):
+        """The column as a pyarrow array of arrow_type."""
+
+    @abc.abstractmethod
+    def _append(self, value) -> None:
+        """Store a non-NULL value."""
+
+    @abc.abstractmethod
+    def _append_null(self) -> None:
+        """Store a placeholder for a NULL (masked by nulls)."""
+
+    @abc.abstractmethod
+    def _get(self, i: int):
+        """Decoded value at i, ignoring the NULL mask."""
+
+    @abc.abstractmethod
+    def _values(self) -> Iterator:
+        """Decoded values in order, ignoring the NULL mask."""
+
+    def _mask(self):
+        import numpy as np
+
+        return np.frombuffer(bytes(self.nulls), dtype=np.bool_) if self.nulls is not None else None
+
+    def _validity_buffer(self):
+        import numpy as np
+        import pyarrow as pa
+
+        if self.nulls is None:
+            return None
+        valid = np.frombuffer(bytes(self.nulls), dtype=np.uint8) == 0
+        return pa.py_buffer(np.packbits(valid, bitorder="little").tobytes())
+
+
+class _ArrayColumn(_Column):
+    __slots__ = ("data",)
+
+    def __init__(self, typecode: str):
+        super().__init__()
+        self.data = array(typecode)
+
+    def _append(self, value) -> None:
+        self.data.append(value)
+
+    def _append_null(self) -> None:
+        self.data.append(0)
+
+    def _get(self, i: int):
+        return self.data[i]
+
+    def _values(self) -> Iterator:
+        return iter(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + self.data.itemsize * len(self.data)
+
+    def _numpy(self):
+        import numpy as np
+
+        # Copy so the array stays appendable (an exported buffer would pin it)
+        return np.frombuffer(self.data, dtype=self.data.typecode).copy()
+
+    def to_arrow(self, arrow_type):
+        import pyarrow as pa
+
+        return pa.array(self._numpy(), type=arrow_type, mask=self._mask())
+
+
+class _TimestampColumn(_ArrayColumn):
+    """Naive datetimes as int64 microseconds since the epoch."""
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__("q")
+
+    def _append(self, value: datetime) -> None:
+        self.data.append((value - EPOCH) // ONE_MICROSECOND)
+
+    def _get(self, i: int) -> datetime:
+        return EPOCH + timedelta(microseconds=self.data[i])
+
+    def _values(self) -> Iterator[datetime]:
+        return (EPOCH + timedelta(microseconds=v) for v in self.data)
+
+
+class _DictionaryColumn(_Column):
+    """Strings as int32 codes into a list of distinct values."""
+
+    __slots__ = ("codes", "dictionary", "_index")
+
+    def __init__(self):
+        super().__init__()
+        self.codes = array("i")
+        self.dictionary: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def _append(self, value: str) -> None:
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self.codes.append(code)
+
+    def _append_null(self) -> None:
+        self.codes.append(0)
+
+    def _get(self, i: int) -> str:
+        return self.dictionary[self.codes[i]]
+
+    def _values(self) -> Iterator[str]:
+        dictionary = self.dictionary
+        return (dictionary[c] for c in self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + 4 * len(self.codes)
+
+    def to_arrow(self, arrow_type):
+        import numpy as np
+        import pyarrow as pa
+
+        codes = np.frombuffer(self.codes, dtype=np.int32).copy()
+        indices = pa.array(codes, type=pa.int32(), mask=self._mask())
+        return pa.DictionaryArray.from_arrays(indices, pa.array(self.dictionary, type=pa.string())).cast(arrow_type)
+
+
+class _StringColumn(_Column):
+    """Strings as one UTF-8 buffer plus int64 end offsets."""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self):
+        super().__init__()
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+
+    def _append(self, value: str) -> None:
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def _append_null(self) -> None:
+        self.offsets.append(len(self.data))
+
+    def _get(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def _values(self) -> Iterator[str]:
+        data, offsets = self.data, self.offsets
+        return (data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1))
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + len(self.data) + 8 * len(self.offsets)
+
+    def to_arrow(self, arrow_type):
+        import pyarrow as pa
+
+        buffers = [self._validity_buffer(), pa.py_buffer(self.offsets.tobytes()), pa.py_buffer(bytes(self.data))]
+        return pa.Array.from_buffers(pa.large_string(), self.size, buffers).cast(arrow_type)
+
+
+def _make_column(table_name: str, column: str, col_type: str) -> _Column:
+    if col_type == "TIMESTAMP":
+        return _TimestampColumn()
+    if col_type == "VARCHAR":
+        if column in DICTIONARY_COLUMNS.get(table_name, ()):
+            return _DictionaryColumn()
+        return _StringColumn()
+    return _ArrayColumn(_TYPECODES[col_type])
+
+
+class ColumnStore:
+    """
+    Append-only typed column store for one generated table.
+
+    Behaves like the generator's list of row dicts for appending, iterating
+    and indexing; rows are decoded into new dicts on access, so mutating a
+    returned row does not change the store.
+    """
+
+    def __init__(self, table_name: str):
+        if table_name not in COLUMN_TYPES:
+            raise ValueError(f"Unknown table {table_name!r}; expected one of {tuple(COLUMN_TYPES)}")
+        self.table_name = table_name
+        self.columns: List[str] = list(COLUMN_TYPES[table_name])
+        self._data: Dict[str, _Column] = {
+            column: _make_column(table_name, column, col_type)
+            for column, col_type in COLUMN_TYPES[table_name].items()
+        }
+        self._size = 0
+
+    @classmethod
+    def from_rows(cls, table_name: str, rows: Iterable[Dict]) -> "ColumnStore":
+        store = cls(table_name)
+        store.extend(rows)
+        return store
+
+    @classmethod
+    def from_columns(cls, table_name: str, columns: Dict[str, Iterable]) -> "ColumnStore":
+        """Build from equal-length column sequences (no per-row dicts)."""
+        store = cls(table_name)
+        sizes = set()
+        for column in store.columns:
+            data = store._data[column]
+            for value in columns[column]:
+                data.append(value)
+            sizes.add(data.size)
+        if len(sizes) > 1:
+            raise ValueError(f"Columns of {table_name} have different lengths: {sorted(sizes)}")
+        store._size = sizes.pop() if sizes else 0
+        return store
+
+    # -------------------------
+    # List-of-dicts API
+    # -------------------------
+
+    def append(self, row: Dict) -> None:
+        for column in self.columns:
+            self._data[column].append(row.get(column))
+        self._size += 1
+
+    def extend(self, rows: Iterable[Dict]) -> None:
+        append = self.append
+        for row in rows:
+            append(row)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict]:
+        columns = self.columns
+        for values in self.iter_tuples():
+            yield dict(zip(columns, values))
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ColumnStore index out of range")
+        return {column: self._data[column].get(index) for column in self.columns}
+
+    def __repr__(self) -> str:
+        return f"ColumnStore({self.table_name!r}, rows={self._size}, nbytes={self.nbytes})"
+
+    # -------------------------
+    # Column access / export
+    # -------------------------
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column buffers (excluding dictionaries)."""
+        return sum(data.nbytes for data in self._data.values())
+
+    def column(self, name: str) -> List:
+        """Decoded values of one column."""
+        return list(self._data[name].values())
+
+    def order_by(self, name: str) -> List[int]:
+        """Row indexes in (stable) order of one column, compared on its stored values."""
+        data = self._data[name]
+        if isinstance(data, _ArrayColumn) and data.nulls is None:
+            # Timestamps compare the same as their epoch microseconds
+            return sorted(range(self._size), key=data.data.__getitem__)
+        return sorted(range(self._size), key=self.column(name).__getitem__)
+
+    def iter_tuples(self) -> Iterator[Tuple]:
+        """Rows as tuples in column order."""
+        return zip(*(self._data[column].values() for column in self.columns))
+
+    def to_arrow(self):
+        """Typed pyarrow Table with the table's declared schema."""
+        import pyarrow as pa
+
+        schema = arrow_schema(self.table_name)
+        arrays = [self._data[field.name].to_arrow(field.type) for field in schema]
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def to_parquet(self, path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE, compression: str = "zstd") -> None:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)") from e
+
+        pq.write_table(self.to_arrow(), path, row_group_size=row_group_size, compression=compression)
+
+    def to_csv(self, path: str) -> None:
+        """Same CSV layout as save_to_csv writes for a list of row dicts."""
+        with open_csv(path) as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(self.iter_tuples())
+
+
+def table_column(table, name: str, default=None) -> List:
+    """
+    One column of a generated table, a list of row dicts or a ColumnStore
+    (read from its column, without decoding rows). default fills rows of a
+    list that lack the field.
+    """
+    if isinstance(table, ColumnStore):
+        return table.column(name)
+    return [row.get(name, default) for row in table]
+
+
+def table_order(table, name: str) -> List[int]:
+    """Row indexes of a generated table in (stable) order of one column."""
+    if isinstance(table, ColumnStore):
+        return table.order_by(name)
+    return sorted(range(len(table)), key=table_column(table, name).__getitem__)
@@ -12,28 +12,179 @@ Outputs:
 - events.csv
 - carton_caps_generated.db (SQLite copy of all generated tables)
 
+With --format parquet (or both) each table is also/instead written as a
+typed <table>.parquet (explicit column types, fixed row-group size).
+With --csv-compression gzip or zstd the CSVs are written compressed as
+<table>.csv.gz or <table>.csv.zst.
+
 Usage:
     python data_generator.py
+    python data_generator.py --format parquet --engine numpy
+    python data_generator.py --scale-factor 10 --streaming
+
+Scale factors:
+    Entity counts come from BASE_COUNTS (scale factor 1) multiplied by
+    --scale-factor, TPC-style (SF1, SF10, SF100, ...), so every table grows
+    together and keeps its ratio to the others. See benchmark.py for
+    throughput numbers per scale factor.
+
+Engines:
+    generate_all(engine="python") draws rows one at a time with the stdlib
+    ``random`` module (reference implementation, no extra dependencies).
+    generate_all(engine="numpy") draws referrals/purchases/events in batched
+    array operations (see numpy_engine.py); use it for large volumes.
 """
 
 from __future__ import annotations
 
+import argparse
+import contextlib
 import csv
+import heapq
+import itertools
+import math
 import os
 import random
-import sqlite3
 import string
+import sys
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Allow sibling modules (numpy_engine, ...) to be imported when this file is
+# run as a script or imported from elsewhere in the repo.
+GENERATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+if GENERATOR_DIR not in sys.path:
+    sys.path.insert(0, GENERATOR_DIR)
+
+from columnar import ColumnStore, table_column, table_order
+from identifiers import DevicePool, EmailFactory, NameSpace
+from samplers import WeekdayDatePool, WeightedSampler
+from sorted_runs import SortedRuns
+from writers import (
+    CSV_COMPRESSIONS,
+    DEFAULT_ROW_GROUP_SIZE,
+    OUTPUT_FORMATS,
+    ChunkedCsvWriter,
+    ChunkedParquetWriter,
+    SqliteBulkLoader,
+    csv_filename,
+    open_csv,
+)
+
+ENGINES = ("python", "numpy")
+
+# Rows per chunk in streaming mode (iter_purchases / iter_events)
+DEFAULT_CHUNK_SIZE = 50_000
+
+SQLITE_FILENAME = "carton_caps_generated.db"
+
+# Entity counts at scale factor 1; scale_counts() multiplies all of them
+BASE_COUNTS = {"schools": 50, "users": 1000, "products": 100, "referrals": 1000, "purchases": 10000}
+# Preset scale factors (SF1, SF10, ...), e.g. for benchmark.py
+SCALE_FACTORS = (1, 10, 100, 1000)
+
+# Extra name parts used only when more schools are requested than name x type combinations
+SCHOOL_QUALIFIERS = [
+    "North", "South", "East", "West", "Central", "Lake", "Park", "Mount",
+    "Port", "New", "Old", "Upper", "Lower", "Fort", "Glen", "Bay",
+]
+
+# User type mix of users created by converted referrals
+REFERRED_USER_TYPES = WeightedSampler(["parent", "teacher", "supporter"], [0.72, 0.18, 0.10])
+
+# How far an entity's earliest event can precede its sent_at / purchased_at
+# (onboarding_complete up to 11h before sent_at; incentive_viewed up to 60 min
+# before the purchase). Used as the activation bound of the event merge.
+REFERRAL_EVENT_LEAD = timedelta(hours=12)
+PURCHASE_EVENT_LEAD = timedelta(minutes=60)
+
+
+def _chunked(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Group an iterable of rows into lists of at most size rows."""
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def scale_counts(scale_factor: float = 1) -> Dict[str, int]:
+    """Entity counts at scale_factor, as generate_all's n_<table> keyword arguments."""
+    if scale_factor <= 0:
+        raise ValueError("scale_factor must be > 0")
+    return {f"n_{table}": max(1, round(n * scale_factor)) for table, n in BASE_COUNTS.items()}
+
+
+def _counts_or_base(*counts: Optional[int]) -> Tuple[int, ...]:
+    """(n_schools, n_users, n_products, n_referrals, n_purchases), each None replaced by its BASE_COUNTS value."""
+    return tuple(base if n is None else n for base, n in zip(BASE_COUNTS.values(), counts))
+
+
+def parse_scale_factor(value: str) -> float:
+    """Parse "10", "SF10" or "0.5" into a positive scale factor."""
+    text = value.strip()
+    if text[:2].upper() == "SF":
+        text = text[2:]
+    try:
+        scale_factor = float(text)
+    except ValueError:
+        raise ValueError(f"Invalid scale factor {value!r}; expected e.g. 10 or SF10") from None
+    if scale_factor <= 0:
+        raise ValueError(f"Invalid scale factor {value!r}; must be > 0")
+    return int(scale_factor) if scale_factor.is_integer() else scale_factor
+
+
+def _event_row(event_at, user_id, event_type, referral_id, metadata_json) -> Dict:
+    return {
+        "user_id": user_id,
+        "event_type": event_type,
+        "event_at": event_at,
+        "referral_id": referral_id,
+        "metadata_json": metadata_json,
+    }
 
 
+def _purchase_time_key(purchase: Dict) -> Tuple[datetime, int]:
+    return purchase["purchased_at"], purchase["purchase_id"]
+
+
+def _purchase_event_fields(purchase: Dict) -> Dict:
+    """The purchase fields events are drawn from."""
+    return {
+        "purchase_id": purchase["purchase_id"],
+        "user_id": purchase["user_id"],
+        "purchased_at": purchase["purchased_at"],
+    }
+
 class CartonCapsDataGenerator:
     """Generate synthetic data for Carton Caps analytics pipeline."""
 
-    def __init__(self, seed: int = 42, output_dir: str = "./data"):
-        random.seed(seed)
+    def __init__(
+        self,
+        seed: int = 42,
+        output_dir: str = "./data",
+        columnar: bool = False,
+        csv_compression: str = "none",
+    ):
+        # Per-instance RNG (not the global random module) so independent
+        # generators - e.g. one per shard - can run side by side.
+        self.rng = random.Random(seed)
+        self.seed = seed
         self.output_dir = output_dir
 
+        # Keep generated tables in compact typed ColumnStores instead of lists of dicts
+        self.columnar = columnar
+
+        # CSV codec ("none", "gzip" or "zstd"), applied to every CSV written
+        if csv_compression not in CSV_COMPRESSIONS:
+            raise ValueError(f"Unknown csv_compression {csv_compression!r}; expected one of {tuple(CSV_COMPRESSIONS)}")
+        self.csv_compression = csv_compression
+
+        # Collision-free user/referral emails (no used-email sets)
+        self.emails = EmailFactory(self.rng)
+
         # Analytics window (where referrals/purchases/events happen)
         self.start_date = datetime(2024, 1, 1, 0, 0, 0)
         self.end_date = datetime(2024, 6, 30, 23, 59, 59)
@@ -47,6 +198,9 @@ class CartonCapsDataGenerator:
         self.referrals: List[Dict] = []
         self.purchases: List[Dict] = []
         self.events: List[Dict] = []
+        # Lifecycle events drawn for this window's entities but due after end_date
+        # (without event_id); the next slice emits them (see incremental.py)
+        self.pending_events: Optional[List[Dict]] = None
 
     # -------------------------
     # Dimension generators
@@ -62,27 +216,31 @@ class CartonCapsDataGenerator:
             "Fairview", "Georgetown", "Riverside", "Madison",
         ]
 
-        schools: List[Dict] = []
-        used = set()
+        # Unique names from the smallest name space that fits n schools
+        parts = [school_names, school_types]
+        if n > len(school_names) * len(school_types):
+            parts.insert(0, SCHOOL_QUALIFIERS)
+        campuses = -(-n // math.prod(len(p) for p in parts))
+        if campuses > 1:
+            parts.append([f"Campus {k}" for k in range(1, campuses + 1)])
+        names = NameSpace(parts, self.rng)
+
+        schools = self._new_table("schools")
 
         for i in range(n):
-            while True:
-                name = random.choice(school_names)
-                school_type = random.choice(school_types)
-                key = f"{name} {school_type}"
-                if key not in used:
-                    used.add(key)
-                    break
-
-            created_at = self.start_date - timedelta(days=random.randint(365, 1825))
+            words = list(names.draw())
+            campus = f" ({words.pop()})" if campuses > 1 else ""
+            name = " ".join(words)
+
+            created_at = self.start_date - timedelta(days=self.rng.randint(365, 1825))
             schools.append(
                 {
                     "school_id": i + 1,
-                    "name": f"{name} {school_type} School",
-                    "address": f"{random.randint(100, 9999)} {random.choice(['Main', 'Oak', 'Elm', 'School'])} St",
-                    "city": random.choice(["Springfield", "Riverside", "Madison", "Georgetown", "Fairview"]),
-                    "state": random.choice(["CA", "TX", "NY", "FL", "IL"]),
-                    "zip_code": f"{random.randint(10000, 99999)}",
+                    "name": f"{name} School{campus}",
+                    "address": f"{self.rng.randint(100, 9999)} {self.rng.choice(['Main', 'Oak', 'Elm', 'School'])} St",
+                    "city": self.rng.choice(["Springfield", "Riverside", "Madison", "Georgetown", "Fairview"]),
+                    "state": self.rng.choice(["CA", "TX", "NY", "FL", "IL"]),
+                    "zip_code": f"{self.rng.randint(10000, 99999)}",
                     "created_at": created_at,
                 }
             )
@@ -103,6 +261,12 @@ class CartonCapsDataGenerator:
         if not self.schools:
             raise ValueError("Schools must be generated before users")
 
+        # Some users exist prior to analytics window; others join during it
+        self.users = self._user_rows(n, first_user_id=1, existing_fraction=0.65)
+        return self.users
+
+    def _user_rows(self, n: int, first_user_id: int, existing_fraction: float):
+        """n users with ids from first_user_id; existing_fraction of them signed up before the window."""
         first_names = [
             "James", "Mary", "John", "Patricia", "Robert", "Jennifer",
             "Michael", "Linda", "William", "Elizabeth", "David", "Barbara",
@@ -113,41 +277,40 @@ class CartonCapsDataGenerator:
             "Miller", "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez",
         ]
 
-        users: List[Dict] = []
+        users = self._new_table("users")
 
-        # Some users exist prior to analytics window; others join during it
-        existing_fraction = 0.65
+        user_type_sampler = WeightedSampler(["parent", "teacher", "supporter"], [0.7, 0.2, 0.1])
+        channel_sampler = WeightedSampler(
+            ["organic", "paid_social", "paid_search", "influencer", "partner", "school_campaign"],
+            [0.35, 0.18, 0.18, 0.06, 0.08, 0.15],
+        )
 
         for i in range(n):
-            first = random.choice(first_names)
-            last = random.choice(last_names)
+            first = self.rng.choice(first_names)
+            last = self.rng.choice(last_names)
 
-            if random.random() < existing_fraction:
-                created_at = self.start_date - timedelta(days=random.randint(1, 365))
+            if self.rng.random() < existing_fraction:
+                created_at = self.start_date - timedelta(days=self.rng.randint(1, 365))
             else:
                 created_at = self._random_datetime(self.start_date, self.end_date)
 
-            user_type = random.choices(["parent", "teacher", "supporter"], weights=[0.7, 0.2, 0.1])[0]
+            user_type = user_type_sampler.draw(self.rng)
 
             users.append(
                 {
-                    "user_id": i + 1,
+                    "user_id": first_user_id + i,
                     "first_name": first,
                     "last_name": last,
-                    "email": f"{first.lower()}.{last.lower()}{random.randint(1, 999)}@email.com",
-                    "school_id": random.choice(self.schools)["school_id"],
+                    "email": self.emails.user_email(first, last),
+                    "school_id": self.rng.choice(self.schools)["school_id"],
                     "created_at": created_at,
                     "user_type": user_type,
-                    "is_verified": 1 if random.random() < 0.94 else 0,
+                    "is_verified": 1 if self.rng.random() < 0.94 else 0,
                     "device_id": self._random_device_id(),
-                    "marketing_channel": random.choices(
-                        ["organic", "paid_social", "paid_search", "influencer", "partner", "school_campaign"],
-                        weights=[0.35, 0.18, 0.18, 0.06, 0.08, 0.15],
-                    )[0],
+                    "marketing_channel": channel_sampler.draw(self.rng),
                 }
             )
 
-        self.users = users
         return users
 
     def generate_products(self, n: int = 100) -> List[Dict]:
@@ -174,20 +337,20 @@ class CartonCapsDataGenerator:
         for category, items in categories.items():
             for item in items:
                 for _ in range(target_per_item):
-                    base_price = round(random.uniform(1.99, 9.99), 2)
+                    base_price = round(self.rng.uniform(1.99, 9.99), 2)
                     products.append(
                         {
                             "product_id": product_id,
-                            "name": f"{random.choice(brands)} {item}",
+                            "name": f"{self.rng.choice(brands)} {item}",
                             "category": category,
                             "price": base_price,
-                            "points_per_dollar": random.choice([1, 2, 3, 5]),
-                            "created_at": self.start_date - timedelta(days=random.randint(30, 365)),
+                            "points_per_dollar": self.rng.choice([1, 2, 3, 5]),
+                            "created_at": self.start_date - timedelta(days=self.rng.randint(30, 365)),
                         }
                     )
                     product_id += 1
 
-        self.products = products[:n]
+        self.products = self._as_table("products", products[:n])
         return self.products
 
     # -------------------------
@@ -207,45 +370,54 @@ class CartonCapsDataGenerator:
         if not self.products:
             raise ValueError("Products must be generated before referrals")
 
-        existing_emails = {u["email"].lower() for u in self.users}
-        existing_device_ids = {u.get("device_id") for u in self.users if u.get("device_id")}
-        next_user_id = max(u["user_id"] for u in self.users) + 1
+        # Users are read column by column (a ColumnStore is not decoded into row dicts)
+        user_ids = table_column(self.users, "user_id")
+        device_pool = DevicePool(table_column(self.users, "device_id"))
+        next_user_id = max(user_ids) + 1
 
-        # Prefer verified users as referrers
-        referrer_population = [u["user_id"] for u in self.users]
+        # Prefer verified users as referrers (looked up by id: a shard holds a subset of users)
+        user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        user_emails = table_column(self.users, "email")
+        user_schools = table_column(self.users, "school_id")
         referrer_weights = []
-        for u in self.users:
-            if not u.get("is_verified", 1):
+        for is_verified, user_type, channel in zip(
+            table_column(self.users, "is_verified", 1),
+            table_column(self.users, "user_type"),
+            table_column(self.users, "marketing_channel"),
+        ):
+            if not is_verified:
                 referrer_weights.append(0.05)  # very low
                 continue
-            base = random.paretovariate(2.5)  # heavy tail super-referrers
-            type_mult = 1.15 if u.get("user_type") == "parent" else 1.0
-            channel_mult = 1.2 if u.get("marketing_channel") in ("school_campaign", "partner") else 1.0
+            base = self.rng.paretovariate(2.5)  # heavy tail super-referrers
+            type_mult = 1.15 if user_type == "parent" else 1.0
+            channel_mult = 1.2 if channel in ("school_campaign", "partner") else 1.0
             referrer_weights.append(base * type_mult * channel_mult)
 
-        total_w = sum(referrer_weights) or 1.0
-        referrer_probs = [w / total_w for w in referrer_weights]
+        referrer_sampler = WeightedSampler(user_ids, referrer_weights)
+        signup_delay_sampler = WeightedSampler(
+            [1, 2, 6, 12, 24, 36, 48, 72],
+            [0.10, 0.12, 0.18, 0.16, 0.18, 0.14, 0.10, 0.02],
+        )
 
         # Funnel parameters (tunable)
         click_rate = 0.55
         conversion_given_click = 0.32  # overall ~ 17-18%
 
-        referrals: List[Dict] = []
-        assigned_referred_emails: set[str] = set()
+        referrals = self._new_table("referrals")
 
         referral_id = 1
 
         for _ in range(n):
-            referrer_user_id = random.choices(referrer_population, weights=referrer_probs, k=1)[0]
-            referrer = self.users[referrer_user_id - 1]
+            referrer_user_id = referrer_sampler.draw(self.rng)
+            referrer = user_index[referrer_user_id]
 
             sent_at = self._random_datetime(self.start_date, self.end_date)
 
-            referred_email = self._random_new_email(existing_emails | assigned_referred_emails)
+            referred_email = self.emails.referral_email()
             referral_code = self._make_referral_code(referrer_user_id)
 
-            clicked = random.random() < click_rate
-            converted = clicked and (random.random() < conversion_given_click)
+            clicked = self.rng.random() < click_rate
+            converted = clicked and (self.rng.random() < conversion_given_click)
 
             status = "sent"
             converted_at: Optional[datetime] = None
@@ -256,17 +428,14 @@ class CartonCapsDataGenerator:
 
             if converted:
                 # Conversion time (proxy for reward-eligible time), mostly within 48h
-                signup_delay_hours = random.choices(
-                    [1, 2, 6, 12, 24, 36, 48, 72],
-                    weights=[0.10, 0.12, 0.18, 0.16, 0.18, 0.14, 0.10, 0.02],
-                )[0]
+                signup_delay_hours = signup_delay_sampler.draw(self.rng)
                 converted_at = sent_at + timedelta(hours=signup_delay_hours)
                 if converted_at > self.end_date:
                     converted = False
                     converted_at = None
 
             # Basic self-referral / abuse attempt injection (very small)
-            if converted and (referred_email.lower() == referrer["email"].lower() or random.random() < 0.01):
+            if converted and (referred_email.lower() == user_emails[referrer].lower() or self.rng.random() < 0.01):
                 converted = False
                 converted_at = None
                 status = "clicked"
@@ -276,38 +445,14 @@ class CartonCapsDataGenerator:
                 referred_user_id = next_user_id
                 next_user_id += 1
 
-                # Social locality: likely same school, some drift
-                school_id = referrer["school_id"] if random.random() < 0.75 else random.choice(self.schools)["school_id"]
-
-                # Device id; allow rare collisions to simulate suspicious behavior (but still create user)
-                device_id = self._random_device_id()
-                if random.random() < 0.01 and existing_device_ids:
-                    device_id = random.choice(list(existing_device_ids))
-                existing_device_ids.add(device_id)
-
-                first = random.choice(["Alex", "Jordan", "Taylor", "Casey", "Riley", "Morgan", "Avery", "Sam"])
-                last = random.choice(["Lee", "Nguyen", "Patel", "Kim", "Garcia", "Brown", "Davis", "Wilson"])
-
-                new_user = {
-                    "user_id": referred_user_id,
-                    "first_name": first,
-                    "last_name": last,
-                    "email": referred_email,
-                    "school_id": school_id,
-                    "created_at": converted_at,
-                    "user_type": random.choices(["parent", "teacher", "supporter"], weights=[0.72, 0.18, 0.10])[0],
-                    "is_verified": 1 if random.random() < 0.92 else 0,
-                    "device_id": device_id,
-                    "marketing_channel": "referral",
-                }
-
-                self.users.append(new_user)
-                existing_emails.add(referred_email.lower())
+                self.users.append(
+                    self._referred_user(
+                        referred_user_id, user_schools[referrer], referred_email, converted_at, device_pool
+                    )
+                )
 
                 status = "converted"
 
-            assigned_referred_emails.add(referred_email.lower())
-
             referrals.append(
                 {
                     "referral_id": referral_id,
@@ -325,6 +470,40 @@ class CartonCapsDataGenerator:
         self.referrals = referrals
         return referrals
 
+    def _referred_user(
+        self,
+        user_id: int,
+        referrer_school_id: int,
+        email: str,
+        converted_at: datetime,
+        device_pool: DevicePool,
+    ) -> Dict:
+        """User row created when a referral converts."""
+        # Social locality: likely same school, some drift
+        school_id = referrer_school_id if self.rng.random() < 0.75 else self.rng.choice(self.schools)["school_id"]
+
+        # Device id; allow rare collisions to simulate suspicious behavior (but still create user)
+        device_id = self._random_device_id()
+        if self.rng.random() < 0.01 and len(device_pool):
+            device_id = device_pool.draw(self.rng)
+        device_pool.add(device_id)
+
+        first = self.rng.choice(["Alex", "Jordan", "Taylor", "Casey", "Riley", "Morgan", "Avery", "Sam"])
+        last = self.rng.choice(["Lee", "Nguyen", "Patel", "Kim", "Garcia", "Brown", "Davis", "Wilson"])
+
+        return {
+            "user_id": user_id,
+            "first_name": first,
+            "last_name": last,
+            "email": email,
+            "school_id": school_id,
+            "created_at": converted_at,
+            "user_type": REFERRED_USER_TYPES.draw(self.rng),
+            "is_verified": 1 if self.rng.random() < 0.92 else 0,
+            "device_id": device_id,
+            "marketing_channel": "referral",
+        }
+
     def generate_purchases(self, n: int = 10000) -> List[Dict]:
         """
         Generate purchase records with realistic patterns.
@@ -343,35 +522,51 @@ class CartonCapsDataGenerator:
         if not self.users or not self.products:
             raise ValueError("Users and products must be generated before purchases")
 
+        self.purchases = self._as_table("purchases", self._purchase_rows(n))
+        return self.purchases
+
+    def iter_purchases(self, n: int = 10000, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+        """
+        Streaming variant of generate_purchases: yield purchases in chunks of
+        chunk_size without keeping them on self.purchases.
+        """
+        if not self.users or not self.products:
+            raise ValueError("Users and products must be generated before purchases")
+
+        return _chunked(self._purchase_rows(n), chunk_size)
+
+    def _purchase_rows(self, n: int) -> Iterator[Dict]:
         product_by_id = {p["product_id"]: p for p in self.products}
         products_by_category: Dict[str, List[int]] = {}
         for p in self.products:
             products_by_category.setdefault(p["category"], []).append(p["product_id"])
 
-        # Heavy-tailed user activity
-        user_ids = [u["user_id"] for u in self.users]
+        # Heavy-tailed user activity (users read column by column, as in generate_referrals)
+        user_ids = table_column(self.users, "user_id")
+        user_types = table_column(self.users, "user_type", "parent")
+        user_index = {user_id: i for i, user_id in enumerate(user_ids)}
         user_weights = []
-        for u in self.users:
-            base = random.paretovariate(2.0)
-            type_mult = 1.25 if u.get("user_type") in ("parent", "teacher") else 0.9
-            verified_mult = 1.15 if u.get("is_verified", 1) else 0.6
-            channel_mult = 1.15 if u.get("marketing_channel") == "school_campaign" else 1.0
+        for user_type, is_verified, channel in zip(
+            user_types,
+            table_column(self.users, "is_verified", 1),
+            table_column(self.users, "marketing_channel"),
+        ):
+            base = self.rng.paretovariate(2.0)
+            type_mult = 1.25 if user_type in ("parent", "teacher") else 0.9
+            verified_mult = 1.15 if is_verified else 0.6
+            channel_mult = 1.15 if channel == "school_campaign" else 1.0
             user_weights.append(base * type_mult * verified_mult * channel_mult)
 
-        total_w = sum(user_weights) or 1.0
-        user_probs = [w / total_w for w in user_weights]
+        user_sampler = WeightedSampler(user_ids, user_weights)
+
+        category_samplers = {
+            "parent": WeightedSampler(["Breakfast", "Dairy", "Pantry", "Snacks", "Beverages"], [0.28, 0.22, 0.20, 0.18, 0.12]),
+            "teacher": WeightedSampler(["Snacks", "Beverages", "Breakfast", "Pantry", "Dairy"], [0.26, 0.22, 0.18, 0.18, 0.16]),
+            "supporter": WeightedSampler(["Snacks", "Beverages", "Pantry", "Breakfast", "Dairy"], [0.30, 0.28, 0.18, 0.14, 0.10]),
+        }
 
         def pick_category(user_type: str) -> str:
-            if user_type == "parent":
-                cats = ["Breakfast", "Dairy", "Pantry", "Snacks", "Beverages"]
-                weights = [0.28, 0.22, 0.20, 0.18, 0.12]
-            elif user_type == "teacher":
-                cats = ["Snacks", "Beverages", "Breakfast", "Pantry", "Dairy"]
-                weights = [0.26, 0.22, 0.18, 0.18, 0.16]
-            else:
-                cats = ["Snacks", "Beverages", "Pantry", "Breakfast", "Dairy"]
-                weights = [0.30, 0.28, 0.18, 0.14, 0.10]
-            return random.choices(cats, weights=weights, k=1)[0]
+            return category_samplers.get(user_type, category_samplers["supporter"]).draw(self.rng)
 
         # Temporal weighting
         weekday_weights = [1.0, 0.95, 0.95, 1.0, 1.05, 1.25, 1.20]  # Mon..Sun
@@ -387,103 +582,88 @@ class CartonCapsDataGenerator:
                 hour_weights.append(0.9)
             else:
                 hour_weights.append(0.25)
-        hour_total = sum(hour_weights)
-        hour_probs = [w / hour_total for w in hour_weights]
+        hour_sampler = WeightedSampler(range(24), hour_weights)
 
-        # Candidate dates in window
-        days = (self.end_date.date() - self.start_date.date()).days + 1
-        date_candidates = [self.start_date.date() + timedelta(days=i) for i in range(days)]
-        dow_total = sum(weekday_weights)
-        dow_probs = [w / dow_total for w in weekday_weights]
+        # Candidate dates in window, indexed by weekday (weekdays absent from a short window get no weight)
+        date_pool = WeekdayDatePool(self.start_date.date(), self.end_date.date())
+        dow_sampler = WeightedSampler(range(7), [w if date_pool.count(d) else 0.0 for d, w in enumerate(weekday_weights)])
+        quantity_sampler = WeightedSampler([1, 2, 3, 4, 5, 6], [0.70, 0.18, 0.07, 0.03, 0.015, 0.005])
+        qualifying_qty_sampler = WeightedSampler([1, 2, 3], [0.72, 0.22, 0.06])
 
         def pick_date() -> datetime:
-            dow = random.choices(range(7), weights=dow_probs, k=1)[0]
-            matches = [d for d in date_candidates if d.weekday() == dow]
-            chosen = random.choice(matches)
+            chosen = date_pool.draw(dow_sampler.draw(self.rng), self.rng)
             return datetime(chosen.year, chosen.month, chosen.day, 0, 0, 0)
 
-        purchases: List[Dict] = []
-        purchase_id = 1
-
-        while len(purchases) < n:
-            user_id = random.choices(user_ids, weights=user_probs, k=1)[0]
-            user = self.users[user_id - 1]
-            utype = user.get("user_type", "parent")
+        for purchase_id in range(1, n + 1):
+            user_id = user_sampler.draw(self.rng)
+            utype = user_types[user_index[user_id]]
 
             base_day = pick_date()
-            hour = random.choices(range(24), weights=hour_probs, k=1)[0]
-            minute = random.randint(0, 59)
-            second = random.randint(0, 59)
+            hour = hour_sampler.draw(self.rng)
+            minute = self.rng.randint(0, 59)
+            second = self.rng.randint(0, 59)
             purchased_at = base_day.replace(hour=hour, minute=minute, second=second)
 
             category = pick_category(utype)
             if category not in products_by_category:
-                category = random.choice(list(products_by_category.keys()))
-            product_id = random.choice(products_by_category[category])
+                category = self.rng.choice(list(products_by_category.keys()))
+            product_id = self.rng.choice(products_by_category[category])
             product = product_by_id[product_id]
 
-            quantity = random.choices([1, 2, 3, 4, 5, 6], weights=[0.70, 0.18, 0.07, 0.03, 0.015, 0.005])[0]
+            quantity = quantity_sampler.draw(self.rng)
 
-            promo = random.random() < 0.12
-            discount = random.uniform(0.05, 0.35) if promo else 0.0
+            promo = self.rng.random() < 0.12
+            discount = self.rng.uniform(0.05, 0.35) if promo else 0.0
 
             line_total = product["price"] * quantity * (1 - discount)
-            noise = random.uniform(-0.03, 0.03)
+            noise = self.rng.uniform(-0.03, 0.03)
             price_paid = round(max(0.5, line_total * (1 + noise)), 2)
 
             points_earned = int(round(price_paid * product["points_per_dollar"]))
 
-            purchases.append(
-                {
-                    "purchase_id": purchase_id,
-                    "user_id": user_id,
-                    "product_id": product_id,
-                    "quantity": quantity,
-                    "price_paid": price_paid,
-                    "points_earned": points_earned,
-                    "purchased_at": purchased_at,
-                    "day_of_week": purchased_at.strftime("%A"),
-                    "hour_of_day": purchased_at.hour,
-                }
-            )
-            purchase_id += 1
+            yield {
+                "purchase_id": purchase_id,
+                "user_id": user_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price_paid": price_paid,
+                "points_earned": points_earned,
+                "purchased_at": purchased_at,
+                "day_of_week": purchased_at.strftime("%A"),
+                "hour_of_day": purchased_at.hour,
+            }
 
         # Inject a qualifying purchase for converted referred users shortly after conversion
         # (this creates realistic "qualifying action" timing for referral rules analytics)
         converted = [r for r in self.referrals if r.get("status") == "converted" and r.get("referred_user_id") and r.get("converted_at")]
         if converted:
-            extra_purchase_id = purchase_id
+            extra_purchase_id = n + 1
             for r in converted:
-                if random.random() < 0.85:
+                if self.rng.random() < 0.85:
                     referred_user_id = r["referred_user_id"]
                     base = r["converted_at"]
-                    qp_time = base + timedelta(days=random.randint(0, 6), hours=random.randint(8, 20))
+                    qp_time = base + timedelta(days=self.rng.randint(0, 6), hours=self.rng.randint(8, 20))
                     if qp_time > self.end_date:
                         continue
 
-                    product = random.choice(self.products)
-                    qty = random.choices([1, 2, 3], weights=[0.72, 0.22, 0.06])[0]
-                    price_paid = round(product["price"] * qty * (1 - random.uniform(0.0, 0.18)), 2)
+                    product = self.rng.choice(self.products)
+                    qty = qualifying_qty_sampler.draw(self.rng)
+                    price_paid = round(product["price"] * qty * (1 - self.rng.uniform(0.0, 0.18)), 2)
                     points_earned = int(round(price_paid * product["points_per_dollar"]))
 
-                    purchases.append(
-                        {
-                            "purchase_id": extra_purchase_id,
-                            "user_id": referred_user_id,
-                            "product_id": product["product_id"],
-                            "quantity": qty,
-                            "price_paid": price_paid,
-                            "points_earned": points_earned,
-                            "purchased_at": qp_time,
-                            "day_of_week": qp_time.strftime("%A"),
-                            "hour_of_day": qp_time.hour,
-                        }
-                    )
+                    yield {
+                        "purchase_id": extra_purchase_id,
+                        "user_id": referred_user_id,
+                        "product_id": product["product_id"],
+                        "quantity": qty,
+                        "price_paid": price_paid,
+                        "points_earned": points_earned,
+                        "purchased_at": qp_time,
+                        "day_of_week": qp_time.strftime("%A"),
+                        "hour_of_day": qp_time.hour,
+                    }
                     extra_purchase_id += 1
 
-        self.purchases = purchases
-        return purchases
-
     def generate_events(self) -> List[Dict]:
         """
         Generate product + referral lifecycle events.
@@ -500,223 +680,206 @@ class CartonCapsDataGenerator:
         if not self.purchases:
             raise ValueError("Purchases must exist before events")
 
-        events: List[Dict] = []
-        event_id = 1
+        self.pending_events = []
+        self.events = self._as_table(
+            "events", self._event_rows(self._purchases_by_time(self.purchases), pending=self.pending_events)
+        )
+        return self.events
+
+    def iter_events(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        purchases: Optional[Iterable[Dict]] = None,
+    ) -> Iterator[List[Dict]]:
+        """
+        Streaming variant of generate_events: yield events in chunks of
+        chunk_size without keeping them on self.events.
+
+        purchases may be any iterable (e.g. the rows of iter_purchases) so the
+        purchase-driven scan events can be produced without materializing
+        self.purchases; it defaults to self.purchases. Events come out in
+        event_at order, so a non-list purchase stream is first sorted by time
+        in runs of chunk_size rows spilled to disk.
+        """
+        if not self.users:
+            raise ValueError("Users must exist before events")
+        if not self.referrals:
+            raise ValueError("Referrals must exist before events")
+        if purchases is None:
+            if not self.purchases:
+                raise ValueError("Purchases must exist before events")
+            purchases = self.purchases
+
+        return _chunked(self._event_rows(self._purchases_by_time(purchases, chunk_size)), chunk_size)
+
+    def _event_rows(self, purchases: Iterable[Dict], pending: Optional[List[Dict]] = None) -> Iterator[Dict]:
+        """
+        Events of self.users, self.referrals and purchases in event_at order,
+        with event_id assigned in that order.
+
+        Events due after end_date are left out; when pending is given they
+        are appended to it (without event_id), so a later slice can emit them.
+
+        purchases must come in (purchased_at, purchase_id) order (see
+        _purchases_by_time). Each user, referral and purchase produces a short
+        list of events; these per-entity streams are k-way merged with a heap.
+        An entity is only drawn ("activated") once the merge reaches a lower
+        bound of its earliest event, so the heap holds the entities whose
+        events are still in flight rather than the whole table.
+        """
+        open_count_sampler = WeightedSampler([0, 1, 2, 3, 5, 8, 12], [0.10, 0.25, 0.22, 0.18, 0.15, 0.07, 0.03])
+        apply_delay_sampler = WeightedSampler([2, 6, 12, 24, 36, 48, 72], [0.20, 0.18, 0.16, 0.18, 0.14, 0.10, 0.04])
+
+        # Per-entity events as (event_at, user_id, event_type, referral_id, metadata_json)
 
         # USER BASELINE EVENTS
-        for user in self.users:
-            user_id = user["user_id"]
-            created_at = user["created_at"]
+        def user_events(user: Tuple[int, datetime]) -> List[Tuple]:
+            user_id, created_at = user
 
             # Treat install == account creation for baseline users
-            events.append(
-                {
-                    "event_id": event_id,
-                    "user_id": user_id,
-                    "event_type": "install",
-                    "event_at": created_at,
-                    "referral_id": None,
-                    "metadata_json": "{}",
-                }
-            )
-            event_id += 1
+            events = [(created_at, user_id, "install", None, "{}")]
 
             # App opens (heavy tail)
-            open_count = random.choices(
-                [0, 1, 2, 3, 5, 8, 12],
-                weights=[0.10, 0.25, 0.22, 0.18, 0.15, 0.07, 0.03],
-            )[0]
+            open_count = open_count_sampler.draw(self.rng)
             for _ in range(open_count):
                 open_time = created_at + timedelta(
-                    days=random.randint(0, 30),
-                    hours=random.randint(0, 23),
-                    minutes=random.randint(0, 59),
+                    days=self.rng.randint(0, 30),
+                    hours=self.rng.randint(0, 23),
+                    minutes=self.rng.randint(0, 59),
                 )
-                if self.start_date <= open_time <= self.end_date:
-                    events.append(
-                        {
-                            "event_id": event_id,
-                            "user_id": user_id,
-                            "event_type": "app_open",
-                            "event_at": open_time,
-                            "referral_id": None,
-                            "metadata_json": "{}",
-                        }
-                    )
-                    event_id += 1
+                if open_time >= self.start_date:
+                    events.append((open_time, user_id, "app_open", None, "{}"))
+            return events
 
         # REFERRAL LIFECYCLE EVENTS
-        for referral in self.referrals:
+        def referral_events(referral: Dict) -> List[Tuple]:
             ref_id = referral["referral_id"]
             referrer_id = referral["referrer_user_id"]
             referred_user_id = referral.get("referred_user_id")
 
             # invite_sent by referrer
-            events.append(
-                {
-                    "event_id": event_id,
-                    "user_id": referrer_id,
-                    "event_type": "invite_sent",
-                    "event_at": referral["sent_at"],
-                    "referral_id": ref_id,
-                    "metadata_json": "{}",
-                }
-            )
-            event_id += 1
+            events = [(referral["sent_at"], referrer_id, "invite_sent", ref_id, "{}")]
 
             # clicked implies some engagement by the referred party; only if we have a referred_user_id
             # (In this generator, referred_user_id exists for converted, but not for clicked-only.)
             if referral["status"] in ("clicked", "converted"):
                 if referred_user_id is not None:
                     # install for referred user slightly after sent
-                    install_at = referral["sent_at"] + timedelta(hours=random.randint(1, 24))
-                    events.append(
-                        {
-                            "event_id": event_id,
-                            "user_id": referred_user_id,
-                            "event_type": "install",
-                            "event_at": install_at,
-                            "referral_id": ref_id,
-                            "metadata_json": '{"source":"referral"}',
-                        }
-                    )
-                    event_id += 1
+                    install_at = referral["sent_at"] + timedelta(hours=self.rng.randint(1, 24))
+                    events.append((install_at, referred_user_id, "install", ref_id, '{"source":"referral"}'))
 
                     # referral_applied time — sometimes >48h to create ineligible examples
-                    apply_delay_hours = random.choices(
-                        [2, 6, 12, 24, 36, 48, 72],
-                        weights=[0.20, 0.18, 0.16, 0.18, 0.14, 0.10, 0.04],
-                    )[0]
+                    apply_delay_hours = apply_delay_sampler.draw(self.rng)
                     applied_at = install_at + timedelta(hours=apply_delay_hours)
-                    if applied_at <= self.end_date:
-                        events.append(
-                            {
-                                "event_id": event_id,
-                                "user_id": referred_user_id,
-                                "event_type": "referral_applied",
-                                "event_at": applied_at,
-                                "referral_id": ref_id,
-                                "metadata_json": "{}",
-                            }
-                        )
-                        event_id += 1
+                    events.append((applied_at, referred_user_id, "referral_applied", ref_id, "{}"))
 
             # converted events (onboarding, school_linked, reward award/redeem)
             if referral["status"] == "converted" and referral.get("converted_at") and referred_user_id is not None:
                 converted_at = referral["converted_at"]
 
-                onboarding_at = converted_at - timedelta(hours=random.randint(1, 12))
+                onboarding_at = converted_at - timedelta(hours=self.rng.randint(1, 12))
                 if onboarding_at >= self.start_date:
-                    events.append(
-                        {
-                            "event_id": event_id,
-                            "user_id": referred_user_id,
-                            "event_type": "onboarding_complete",
-                            "event_at": onboarding_at,
-                            "referral_id": ref_id,
-                            "metadata_json": "{}",
-                        }
-                    )
-                    event_id += 1
+                    events.append((onboarding_at, referred_user_id, "onboarding_complete", ref_id, "{}"))
 
-                school_linked_at = onboarding_at + timedelta(days=random.randint(0, 2))
-                if school_linked_at <= self.end_date:
-                    events.append(
-                        {
-                            "event_id": event_id,
-                            "user_id": referred_user_id,
-                            "event_type": "school_linked",
-                            "event_at": school_linked_at,
-                            "referral_id": ref_id,
-                            "metadata_json": "{}",
-                        }
-                    )
-                    event_id += 1
+                school_linked_at = onboarding_at + timedelta(days=self.rng.randint(0, 2))
+                events.append((school_linked_at, referred_user_id, "school_linked", ref_id, "{}"))
 
                 # reward awarded to both parties
                 for reward_user_id, reward_type in [
                     (referrer_id, "referrer_bonus"),
                     (referred_user_id, "referred_bonus"),
                 ]:
-                    events.append(
-                        {
-                            "event_id": event_id,
-                            "user_id": reward_user_id,
-                            "event_type": "reward_awarded",
-                            "event_at": converted_at,
-                            "referral_id": ref_id,
-                            "metadata_json": f'{{"reward_type":"{reward_type}"}}',
-                        }
-                    )
-                    event_id += 1
+                    metadata_json = f'{{"reward_type":"{reward_type}"}}'
+                    events.append((converted_at, reward_user_id, "reward_awarded", ref_id, metadata_json))
 
                     # reward redeemed later (not always)
-                    if random.random() < 0.75:
-                        redeemed_at = converted_at + timedelta(days=random.randint(1, 30))
-                        if redeemed_at <= self.end_date:
-                            events.append(
-                                {
-                                    "event_id": event_id,
-                                    "user_id": reward_user_id,
-                                    "event_type": "reward_redeemed",
-                                    "event_at": redeemed_at,
-                                    "referral_id": ref_id,
-                                    "metadata_json": f'{{"reward_type":"{reward_type}"}}',
-                                }
-                            )
-                            event_id += 1
+                    if self.rng.random() < 0.75:
+                        redeemed_at = converted_at + timedelta(days=self.rng.randint(1, 30))
+                        events.append((redeemed_at, reward_user_id, "reward_redeemed", ref_id, metadata_json))
+            return events
 
         # RECEIPT SCAN / INCENTIVE EVENTS (from purchases)
-        for purchase in self.purchases:
+        def purchase_events(purchase: Dict) -> List[Tuple]:
             user_id = purchase["user_id"]
             purchased_at = purchase["purchased_at"]
+            events = []
 
-            scan_start = purchased_at - timedelta(minutes=random.randint(1, 5))
+            scan_start = purchased_at - timedelta(minutes=self.rng.randint(1, 5))
             if scan_start >= self.start_date:
-                events.append(
-                    {
-                        "event_id": event_id,
-                        "user_id": user_id,
-                        "event_type": "receipt_scan_started",
-                        "event_at": scan_start,
-                        "referral_id": None,
-                        "metadata_json": "{}",
-                    }
-                )
-                event_id += 1
+                events.append((scan_start, user_id, "receipt_scan_started", None, "{}"))
 
             # completion (some fail)
-            if random.random() < 0.88:
-                events.append(
-                    {
-                        "event_id": event_id,
-                        "user_id": user_id,
-                        "event_type": "receipt_scan_completed",
-                        "event_at": purchased_at,
-                        "referral_id": None,
-                        "metadata_json": "{}",
-                    }
-                )
-                event_id += 1
+            if self.rng.random() < 0.88:
+                events.append((purchased_at, user_id, "receipt_scan_completed", None, "{}"))
 
             # incentive viewed (optional)
-            if random.random() < 0.35:
-                viewed_at = purchased_at - timedelta(minutes=random.randint(5, 60))
+            if self.rng.random() < 0.35:
+                viewed_at = purchased_at - timedelta(minutes=self.rng.randint(5, 60))
                 if viewed_at >= self.start_date:
-                    events.append(
-                        {
-                            "event_id": event_id,
-                            "user_id": user_id,
-                            "event_type": "incentive_viewed",
-                            "event_at": viewed_at,
-                            "referral_id": None,
-                            "metadata_json": "{}",
-                        }
-                    )
-                    event_id += 1
+                    events.append((viewed_at, user_id, "incentive_viewed", None, "{}"))
+            return events
+
+        # Entities as (lower bound of their earliest event, event function, entity),
+        # merged into one stream ordered by that bound. Users and referrals are
+        # ordered by index on their time column; users need only (user_id,
+        # created_at) and a referral row is decoded when it is activated
+        user_ids = table_column(self.users, "user_id")
+        user_created = table_column(self.users, "created_at")
+        referrals = self.referrals
+        entities = heapq.merge(
+            (
+                (user_created[i], user_events, (user_ids[i], user_created[i]))
+                for i in table_order(self.users, "created_at")
+            ),
+            (
+                (r["sent_at"] - REFERRAL_EVENT_LEAD, referral_events, r)
+                for r in (referrals[i] for i in table_order(referrals, "sent_at"))
+            ),
+            ((p["purchased_at"] - PURCHASE_EVENT_LEAD, purchase_events, p) for p in purchases),
+            key=itemgetter(0),
+        )
+
+        # Heap of active entities: (next event_at, activation seq, position, events)
+        heap: List[Tuple] = []
+        activation_seq = itertools.count()
+        next_event_id = itertools.count(1)
+        for bound, entity_events, entity in itertools.chain(entities, [(None, None, None)]):
+            # Every event before the next entity's bound is final
+            while heap and (bound is None or heap[0][0] < bound):
+                _, seq, pos, events = heap[0]
+                yield {"event_id": next(next_event_id), **_event_row(*events[pos])}
+                pos += 1
+                if pos < len(events):
+                    heapq.heapreplace(heap, (events[pos][0], seq, pos, events))
+                else:
+                    heapq.heappop(heap)
+
+            if entity_events is None:
+                break
+            events = sorted(entity_events(entity), key=itemgetter(0))
+            due = len(events)
+            while due and events[due - 1][0] > self.end_date:
+                due -= 1
+            if pending is not None:
+                pending.extend(_event_row(*e) for e in events[due:])
+            events = events[:due]
+            if events:
+                heapq.heappush(heap, (events[0][0], next(activation_seq), 0, events))
+
+    def _purchases_by_time(self, purchases: Iterable[Dict], run_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+        """
+        purchases in (purchased_at, purchase_id) order, as _event_rows needs them.
 
-        self.events = events
-        return events
+        A list is sorted in memory; any other iterable (a ColumnStore, a
+        purchase stream) is reduced to the fields events use and sorted in
+        runs of run_size rows that spill to disk (see sorted_runs.py).
+        """
+        if isinstance(purchases, list):
+            yield from sorted(purchases, key=_purchase_time_key)
+            return
+        with SortedRuns(_purchase_time_key, run_size) as runs:
+            runs.extend(map(_purchase_event_fields, purchases))
+            yield from runs.merged()
 
     # -------------------------
     # Persistence helpers
@@ -728,149 +891,416 @@ class CartonCapsDataGenerator:
             return
 
         filepath = os.path.join(self.output_dir, filename)
-        with open(filepath, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=list(data[0].keys()))
-            writer.writeheader()
-            writer.writerows(data)
+        if isinstance(data, ColumnStore):
+            data.to_csv(filepath)
+        else:
+            with open_csv(filepath) as f:
+                writer = csv.DictWriter(f, fieldnames=list(data[0].keys()))
+                writer.writeheader()
+                writer.writerows(data)
 
         print(f"Saved {len(data)} records to {filepath}")
 
-    def save_to_sqlite(self, db_path: Optional[str] = None) -> None:
-        if db_path is None:
-            db_path = os.path.join(self.output_dir, "carton_caps_generated.db")
-
-        # Recreate DB each run for cleanliness
-        if os.path.exists(db_path):
-            os.remove(db_path)
-
-        conn = sqlite3.connect(db_path)
-
-        def create_and_insert(table_name: str, data: List[Dict]):
-            if not data:
-                return
-
-            # Create table based on first record
-            columns = []
-            for key, value in data[0].items():
-                if isinstance(value, int):
-                    col_type = "INTEGER"
-                elif isinstance(value, float):
-                    col_type = "REAL"
-                elif isinstance(value, datetime):
-                    col_type = "TIMESTAMP"
-                elif value is None:
-                    col_type = "TEXT"
-                else:
-                    col_type = "TEXT"
-                columns.append(f"{key} {col_type}")
+    def save_to_parquet(self, data: List[Dict], table_name: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> None:
+        """Write a typed <table_name>.parquet (column types from writers.COLUMN_TYPES)."""
+        if not data:
+            print(f"Warning: No data to save for {table_name}.parquet")
+            return
 
-            create_sql = f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(columns)})"
-            conn.execute(create_sql)
+        path = os.path.join(self.output_dir, f"{table_name}.parquet")
+        if isinstance(data, ColumnStore):
+            data.to_parquet(path, row_group_size)
+            print(f"Saved {len(data)} records to {path}")
+            return
 
-            placeholders = ", ".join(["?" for _ in data[0].keys()])
-            insert_sql = f"INSERT INTO {table_name} VALUES ({placeholders})"
+        with ChunkedParquetWriter(path, table_name, row_group_size) as writer:
+            writer.write(data)
 
-            for record in data:
-                values = [record.get(key) for key in data[0].keys()]
-                conn.execute(insert_sql, values)
+    def save_table(
+        self,
+        data: List[Dict],
+        table_name: str,
+        output_format: str = "csv",
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    ) -> None:
+        """Write one table in the requested output format(s) and drop stale files of the other format."""
+        if output_format in ("csv", "both"):
+            self.save_to_csv(data, csv_filename(table_name, self.csv_compression))
+        if output_format in ("parquet", "both"):
+            self.save_to_parquet(data, table_name, row_group_size)
+        self._remove_stale_outputs(table_name, output_format)
+
+    def _table_writers(self, table_name: str, output_format: str, row_group_size: int, stack: contextlib.ExitStack) -> List:
+        """Open chunked writers for one table in the requested output format(s)."""
+        writers = []
+        if output_format in ("csv", "both"):
+            path = os.path.join(self.output_dir, csv_filename(table_name, self.csv_compression))
+            writers.append(stack.enter_context(ChunkedCsvWriter(path)))
+        if output_format in ("parquet", "both"):
+            path = os.path.join(self.output_dir, f"{table_name}.parquet")
+            writers.append(stack.enter_context(ChunkedParquetWriter(path, table_name, row_group_size)))
+        self._remove_stale_outputs(table_name, output_format)
+        return writers
+
+    def _remove_stale_outputs(self, table_name: str, output_format: str) -> None:
+        # The loader prefers <table>.parquet when present, so a Parquet file left
+        # over from an earlier run must not shadow a fresh CSV (and vice versa);
+        # likewise only the CSV of the current codec is kept.
+        keep = set()
+        if output_format in ("csv", "both"):
+            keep.add(csv_filename(table_name, self.csv_compression))
+        if output_format in ("parquet", "both"):
+            keep.add(f"{table_name}.parquet")
+        for filename in [csv_filename(table_name, c) for c in CSV_COMPRESSIONS] + [f"{table_name}.parquet"]:
+            path = os.path.join(self.output_dir, filename)
+            if filename not in keep and os.path.exists(path):
+                os.remove(path)
 
-        create_and_insert("schools", self.schools)
-        create_and_insert("users", self.users)
-        create_and_insert("products", self.products)
-        create_and_insert("referrals", self.referrals)
-        create_and_insert("purchases", self.purchases)
-        create_and_insert("events", self.events)
+    def save_to_sqlite(self, db_path: Optional[str] = None) -> None:
+        """Rebuild the SQLite copy of every table in one bulk transaction."""
+        if db_path is None:
+            db_path = os.path.join(self.output_dir, SQLITE_FILENAME)
 
-        conn.commit()
-        conn.close()
-        print(f"Saved all data to {db_path}")
+        with SqliteBulkLoader(db_path) as db:
+            for table_name in ("schools", "users", "products", "referrals", "purchases", "events"):
+                db.write(table_name, getattr(self, table_name))
 
     def generate_all(
         self,
-        n_schools: int = 50,
-        n_users: int = 1000,
-        n_products: int = 100,
-        n_referrals: int = 1000,
-        n_purchases: int = 10000,
+        n_schools: Optional[int] = None,
+        n_users: Optional[int] = None,
+        n_products: Optional[int] = None,
+        n_referrals: Optional[int] = None,
+        n_purchases: Optional[int] = None,
+        engine: str = "python",
+        streaming: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        shards: int = 1,
+        workers: Optional[int] = None,
+        output_format: str = "csv",
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        write_sqlite: bool = True,
     ) -> None:
+        """
+        Generate every dataset and write CSV + SQLite artifacts.
+
+        engine selects how referrals/purchases/events are drawn:
+        "python" (row-at-a-time, stdlib only) or "numpy" (vectorized).
+
+        streaming=True keeps only dimensions and referrals in memory; purchases
+        and events are generated and appended to their outputs chunk_size rows
+        at a time (python engine only). Output is identical to the in-memory
+        mode for the same seed.
+
+        shards > 1 splits the users into that many user_id ranges and draws
+        each range's referrals, purchases and events in a process pool of
+        `workers` processes (see sharding.py). Output is identical for a given
+        (seed, shards), whatever the worker count.
+
+        output_format is "csv", "parquet" (typed, row_group_size rows per row
+        group) or "both". write_sqlite=False skips the SQLite copy (the DuckDB
+        load only reads the CSV/Parquet files).
+
+        Counts left as None are the scale factor 1 counts (BASE_COUNTS).
+        """
+        n_schools, n_users, n_products, n_referrals, n_purchases = _counts_or_base(
+            n_schools, n_users, n_products, n_referrals, n_purchases
+        )
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output_format {output_format!r}; expected one of {OUTPUT_FORMATS}")
+        if streaming and engine != "python":
+            raise ValueError("streaming mode is only supported by the python engine")
+        if streaming and shards > 1:
+            raise ValueError("streaming and sharded modes cannot be combined")
+        facts = self._fact_engine(engine)
+
         print("Generating Carton Caps data...")
+        print(f"Engine: {engine}" + (f" (streaming, chunk_size={chunk_size})" if streaming else ""))
+        print(f"Output format: {output_format}")
         print("-" * 40)
 
+        def save(table_name: str) -> None:
+            self.save_table(getattr(self, table_name), table_name, output_format, row_group_size)
+
         print(f"Generating {n_schools} schools...")
         self.generate_schools(n_schools)
-        self.save_to_csv(self.schools, "schools.csv")
+        save("schools")
 
         print(f"Generating {n_users} users...")
         self.generate_users(n_users)
-        self.save_to_csv(self.users, "users.csv")
+        save("users")
 
         print(f"Generating {n_products} products...")
         self.generate_products(n_products)
-        self.save_to_csv(self.products, "products.csv")
+        save("products")
+
+        if shards > 1:
+            from sharding import generate_sharded
+
+            print(f"Generating {n_referrals} referrals, {n_purchases} purchases and events in {shards} shards...")
+            generate_sharded(self, n_referrals, n_purchases, shards, engine=engine, workers=workers)
+            save("referrals")
+            save("purchases")
+            save("events")
+
+            if write_sqlite:
+                print("\nSaving to SQLite database...")
+                self.save_to_sqlite()
+
+            print("-" * 40)
+            print("Data generation complete!")
+            return
 
         # IMPORTANT: referrals before purchases so referred users exist for purchase generation
         print(f"Generating {n_referrals} referrals (may add new users)...")
-        self.generate_referrals(n_referrals)
-        self.save_to_csv(self.referrals, "referrals.csv")
+        facts.generate_referrals(n_referrals)
+        save("referrals")
 
-        print(f"Generating {n_purchases} purchases...")
-        self.generate_purchases(n_purchases)
-        self.save_to_csv(self.purchases, "purchases.csv")
+        if streaming:
+            print(f"Streaming {n_purchases} purchases and their events...")
+            self._stream_facts(n_purchases, chunk_size, output_format, row_group_size, write_sqlite)
+        else:
+            print(f"Generating {n_purchases} purchases...")
+            facts.generate_purchases(n_purchases)
+            save("purchases")
 
-        print("Generating events (product + referral lifecycle)...")
-        self.generate_events()
-        self.save_to_csv(self.events, "events.csv")
+            print("Generating events (product + referral lifecycle)...")
+            facts.generate_events()
+            save("events")
 
-        print("\nSaving to SQLite database...")
-        self.save_to_sqlite()
+            if write_sqlite:
+                print("\nSaving to SQLite database...")
+                self.save_to_sqlite()
 
         print("-" * 40)
         print("Data generation complete!")
 
+    def _stream_facts(
+        self,
+        n_purchases: int,
+        chunk_size: int,
+        output_format: str = "csv",
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        write_sqlite: bool = True,
+    ) -> None:
+        """
+        Generate purchases and events chunk by chunk, appending each chunk to
+        the CSV/Parquet outputs and the SQLite copy as it is produced.
+
+        Purchases are written first; events then follow in event_at order
+        (see _stream_fact_chunks), so the output depends on the seed but not
+        on chunk_size.
+        """
+        with contextlib.ExitStack() as stack:
+            db = None
+            if write_sqlite:
+                db = stack.enter_context(SqliteBulkLoader(os.path.join(self.output_dir, SQLITE_FILENAME)))
+                for table_name in ("schools", "users", "products", "referrals"):
+                    db.write(table_name, getattr(self, table_name))
+
+            writers = {
+                table_name: self._table_writers(table_name, output_format, row_group_size, stack)
+                for table_name in ("purchases", "events")
+            }
+            if db is not None:
+                for table_name, table_writers in writers.items():
+                    table_writers.append(db.writer(table_name))
+
+            for table_name, chunk in self._stream_fact_chunks(n_purchases, chunk_size):
+                for writer in writers[table_name]:
+                    writer.write(chunk)
+
+    def _stream_fact_chunks(self, n_purchases: int, chunk_size: int) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Yield ("purchases" | "events", rows) chunks of the streaming mode.
+
+        All purchase chunks come first; only the fields events need are kept
+        back, as sorted runs spilled to disk every chunk_size rows. Events are
+        then merged in event_at order from those runs. Draws happen in the
+        same order as in the in-memory mode, so the rows are identical too.
+        """
+        with SortedRuns(_purchase_time_key, chunk_size) as runs:
+            for chunk in self.iter_purchases(n_purchases, chunk_size):
+                runs.extend(map(_purchase_event_fields, chunk))
+                yield "purchases", chunk
+            for chunk in _chunked(self._event_rows(runs.merged()), chunk_size):
+                yield "events", chunk
+
+    def iter_tables(
+        self,
+        n_schools: Optional[int] = None,
+        n_users: Optional[int] = None,
+        n_products: Optional[int] = None,
+        n_referrals: Optional[int] = None,
+        n_purchases: Optional[int] = None,
+        engine: str = "python",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Generate every table and yield (table_name, rows) chunks instead of
+        writing files, e.g. for loading straight into DuckDB.
+
+        Tables come out with the same contents as the files generate_all
+        writes (users before referrals add referred users). The python engine
+        draws purchases/events as in streaming mode; the numpy engine
+        generates them in memory and yields them chunk_size rows at a time.
+        Counts left as None are the scale factor 1 counts, as in generate_all.
+        """
+        n_schools, n_users, n_products, n_referrals, n_purchases = _counts_or_base(
+            n_schools, n_users, n_products, n_referrals, n_purchases
+        )
+        facts = self._fact_engine(engine)
+
+        yield "schools", self.generate_schools(n_schools)
+        yield "users", list(self.generate_users(n_users))
+        yield "products", self.generate_products(n_products)
+
+        facts.generate_referrals(n_referrals)
+        for chunk in _chunked(self.referrals, chunk_size):
+            yield "referrals", chunk
+
+        if engine == "python":
+            yield from self._stream_fact_chunks(n_purchases, chunk_size)
+            return
+
+        facts.generate_purchases(n_purchases)
+        for chunk in _chunked(self.purchases, chunk_size):
+            yield "purchases", chunk
+        facts.generate_events()
+        for chunk in _chunked(self.events, chunk_size):
+            yield "events", chunk
+
     # -------------------------
     # Internal utilities
     # -------------------------
 
-    @staticmethod
-    def _random_datetime(start: datetime, end: datetime) -> datetime:
+    def _new_table(self, table_name: str):
+        """Empty table to append rows to: a list of dicts, or a ColumnStore in columnar mode."""
+        return ColumnStore(table_name) if self.columnar else []
+
+    def _as_table(self, table_name: str, rows: Iterable[Dict]):
+        return ColumnStore.from_rows(table_name, rows) if self.columnar else list(rows)
+
+    def _fact_engine(self, engine: str):
+        """Return the object whose generate_referrals/purchases/events fill this generator."""
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}; expected one of {ENGINES}")
+        if engine == "numpy":
+            from numpy_engine import NumpyEngine
+
+            return NumpyEngine(self, seed=self.seed)
+        return self
+
+    def _random_datetime(self, start: datetime, end: datetime) -> datetime:
         """Uniform random datetime between start and end (inclusive)."""
         if end <= start:
             return start
         delta = end - start
-        seconds = random.randint(0, int(delta.total_seconds()))
+        seconds = self.rng.randint(0, int(delta.total_seconds()))
         return start + timedelta(seconds=seconds)
 
-    @staticmethod
-    def _random_device_id() -> str:
-        return "dev_" + "".join(random.choices(string.ascii_lowercase + string.digits, k=16))
+    def _random_device_id(self) -> str:
+        return "dev_" + "".join(self.rng.choices(string.ascii_lowercase + string.digits, k=16))
 
-    @staticmethod
-    def _make_referral_code(user_id: int) -> str:
-        suffix = "".join(random.choices(string.ascii_uppercase + string.digits, k=5))
+    def _make_referral_code(self, user_id: int) -> str:
+        suffix = "".join(self.rng.choices(string.ascii_uppercase + string.digits, k=5))
         return f"CC{user_id:05d}{suffix}"
 
-    @staticmethod
-    def _random_new_email(used: set[str]) -> str:
-        domains = ["gmail.com", "yahoo.com", "outlook.com", "icloud.com", "proton.me"]
-        while True:
-            handle = "".join(random.choices(string.ascii_lowercase, k=random.randint(5, 10)))
-            handle += str(random.randint(1, 9999))
-            email = f"{handle}@{random.choice(domains)}"
-            if email.lower() not in used:
-                return email
-
 
-if __name__ == "__main__":
-    generator = CartonCapsDataGenerator(seed=42, output_dir="./data")
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate synthetic Carton Caps data.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=None,
+                        help="Default ./data (--next-slice: data/slices/<slice end date>)")
+    parser.add_argument("--scale-factor", default="1",
+                        help="Multiply every entity count by this factor, e.g. 10 or SF10 (default 1)")
+    for table_name, n in BASE_COUNTS.items():
+        parser.add_argument(f"--{table_name}", type=int, default=None, metavar="N",
+                            help=f"Override the number of {table_name} ({n} at scale factor 1)")
+    parser.add_argument("--engine", choices=ENGINES, default="python")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Hold generated tables in compact typed column stores")
+    parser.add_argument("--format", dest="output_format", choices=OUTPUT_FORMATS, default="csv",
+                        help="csv (default), typed parquet, or both")
+    parser.add_argument("--csv-compression", choices=tuple(CSV_COMPRESSIONS), default="none",
+                        help="Write the CSVs compressed: gzip (.csv.gz) or zstd (.csv.zst, needs pyarrow)")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help="Rows per Parquet row group")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Write purchases/events in chunks instead of holding them in memory")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--shards", type=int, default=1, help="Generate facts in this many user shards")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for sharded generation")
+    parser.add_argument("--no-sqlite", dest="write_sqlite", action="store_false",
+                        help="Skip the SQLite copy (CSV/Parquet only)")
+    parser.add_argument("--save-state", metavar="PATH",
+                        help="After a full run, save generator state for --next-slice")
+    parser.add_argument("--next-slice", metavar="STATE",
+                        help="Generate only the delta for the next time slice from a saved state (advances STATE)")
+    parser.add_argument("--days", type=int, default=1, help="Length of the --next-slice slice in days")
+    args = parser.parse_args(argv)
+    if args.save_state and args.streaming:
+        parser.error("--save-state needs the in-memory mode (not --streaming)")
+    try:
+        args.scale_factor = parse_scale_factor(args.scale_factor)
+    except ValueError as e:
+        parser.error(str(e))
+    args.counts = scale_counts(args.scale_factor)
+    for table_name in BASE_COUNTS:
+        n = getattr(args, table_name)
+        if n is not None:
+            if n < 1:
+                parser.error(f"--{table_name} must be >= 1")
+            args.counts[f"n_{table_name}"] = n
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.next_slice:
+        from incremental import generate_slice_files
+
+        generate_slice_files(
+            args.next_slice,
+            output_dir=args.output_dir,
+            days=args.days,
+            output_format=args.output_format,
+            row_group_size=args.row_group_size,
+            csv_compression=args.csv_compression,
+        )
+        return 0
+
+    output_dir = args.output_dir or "./data"
+    generator = CartonCapsDataGenerator(
+        seed=args.seed, output_dir=output_dir, columnar=args.columnar, csv_compression=args.csv_compression
+    )
 
     generator.generate_all(
-        n_schools=50,
-        n_users=1000,
-        n_products=100,
-        n_referrals=1000,
-        n_purchases=10000,
+        **args.counts,
+        engine=args.engine,
+        streaming=args.streaming,
+        chunk_size=args.chunk_size,
+        shards=args.shards,
+        workers=args.workers,
+        output_format=args.output_format,
+        row_group_size=args.row_group_size,
+        write_sqlite=args.write_sqlite,
     )
 
-    print("\nArtifacts written to ./data/")
-    print(" - schools.csv, users.csv, products.csv, referrals.csv, purchases.csv, events.csv")
-    print(" - carton_caps_generated.db")
\ No newline at end of file
+    if args.save_state:
+        from incremental import save_state
+
+        save_state(generator, args.save_state)
+
+    print(f"\nArtifacts written to {output_dir}/")
+    csv_ext = CSV_COMPRESSIONS[args.csv_compression].lstrip(".")
+    ext = {"csv": csv_ext, "parquet": "parquet", "both": f"{csv_ext}/.parquet"}[args.output_format]
+    print(f" - schools, users, products, referrals, purchases, events (.{ext})")
+    if args.write_sqlite:
+        print(f" - {SQLITE_FILENAME}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
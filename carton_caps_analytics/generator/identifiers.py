@@ -0,0 +1,220 @@
+"""
+Collision-free identifier factories for the generator.
+
+Drawing a random identifier and retrying until it is unused gets slower as
+the set of used values grows, and never terminates once the space is
+exhausted. These factories instead walk a shuffled order of a known space,
+so every draw is O(1), needs no "used" set and is unique by construction:
+
+- FeistelPermutation: a keyed Feistel network over the smallest power of
+  four >= n, cycle-walked back into range(n): a shuffled order of the space
+  in O(1) memory, without the fixed stride of an affine map
+- UniqueNumbers: unique integers in growing blocks (1-999, 1000-9999, ...)
+  so numbers stay short while the counter is small
+- NameSpace: unique combinations from a cartesian product of word lists
+- EmailFactory: emails whose numeric part comes from UniqueNumbers (both
+  engines draw referral emails through it)
+- DevicePool: device ids indexed for O(1) uniform draws of an existing id
+
+Factories draw their permutations from the generator's RNG, so output is
+deterministic for a given seed. EmailFactory.get_state()/set_state() let
+incremental slices continue without reusing a number.
+
+Usage:
+    names = NameSpace([["North", "South"], ["Elementary", "High"]], rng)
+    names.draw()            # ("South", "High")
+    emails = EmailFactory(rng)
+    emails.user_email("Mary", "Smith")   # "mary.smith417@email.com"
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import string
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+REFERRAL_EMAIL_DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "icloud.com", "proton.me"]
+USER_EMAIL_DOMAIN = "email.com"
+
+
+class FeistelPermutation:
+    """
+    Shuffled order of range(n): position i maps to a keyed Feistel network of i.
+
+    The network permutes [0, 4**h), the smallest power of four >= n, as two
+    h-bit halves; a value that lands outside range(n) is fed through again
+    (cycle walking) until it is inside, fewer than four rounds on average.
+    """
+
+    __slots__ = ("n", "half_bits", "mask", "keys")
+
+    ROUNDS = 4
+
+    def __init__(self, n: int, rng=random, keys: Optional[Sequence[int]] = None):
+        if n < 1:
+            raise ValueError("n must be >= 1")
+        self.n = n
+        self.half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+        self.mask = (1 << self.half_bits) - 1
+        self.keys = list(keys) if keys is not None else [rng.getrandbits(32) for _ in range(self.ROUNDS)]
+        if len(self.keys) != self.ROUNDS:
+            raise ValueError(f"expected {self.ROUNDS} round keys")
+
+    def _round(self, half: int, key: int) -> int:
+        # 32-bit integer hash (multiply / xor-shift) of the half and the round key
+        x = ((half ^ key) * 0x9E3779B1) & 0xFFFFFFFF
+        x ^= x >> 16
+        x = (x * 0x85EBCA6B) & 0xFFFFFFFF
+        x ^= x >> 13
+        return x & self.mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half_bits) | right
+
+    def __call__(self, i: int) -> int:
+        if not 0 <= i < self.n:
+            raise IndexError(f"position {i} is outside range({self.n})")
+        value = self._encrypt(i)
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+
+class UniqueNumbers:
+    """
+    Unique positive integers in a shuffled order.
+
+    Numbers come from blocks [1, 1000), [1000, 10000), [10000, 100000), ...;
+    each block is walked in its own shuffled order before the next begins.
+    """
+
+    FIRST_BLOCK = 1000
+
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.block = 0
+        self.drawn = 0
+        self._perm: Optional[FeistelPermutation] = None
+
+    def _bounds(self) -> Tuple[int, int]:
+        hi = self.FIRST_BLOCK * 10 ** self.block
+        lo = 1 if self.block == 0 else hi // 10
+        return lo, hi
+
+    def next(self) -> int:
+        lo, hi = self._bounds()
+        if self.drawn >= hi - lo:
+            self.block += 1
+            self.drawn = 0
+            self._perm = None
+            lo, hi = self._bounds()
+        if self._perm is None:
+            self._perm = FeistelPermutation(hi - lo, self.rng)
+        value = lo + self._perm(self.drawn)
+        self.drawn += 1
+        return value
+
+    def take(self, k: int) -> List[int]:
+        """The next k numbers, e.g. for a column of emails drawn in bulk."""
+        return [self.next() for _ in range(k)]
+
+    def get_state(self) -> Dict:
+        perm = self._perm
+        return {"block": self.block, "drawn": self.drawn, "perm": perm.keys if perm else None}
+
+    def set_state(self, state: Dict) -> None:
+        self.block = state["block"]
+        self.drawn = state["drawn"]
+        self._perm = None
+        if state["perm"] is not None:
+            lo, hi = self._bounds()
+            self._perm = FeistelPermutation(hi - lo, self.rng, keys=state["perm"])
+
+
+class NameSpace:
+    """Unique draws from the cartesian product of `parts` (one value per part)."""
+
+    def __init__(self, parts: Sequence[Sequence[str]], rng=random):
+        self.parts: List[List[str]] = [list(p) for p in parts]
+        if not self.parts or not all(self.parts):
+            raise ValueError("parts must be non-empty lists")
+        self.size = math.prod(len(p) for p in self.parts)
+        self._perm = FeistelPermutation(self.size, rng)
+        self.drawn = 0
+
+    def draw(self) -> Tuple[str, ...]:
+        if self.drawn >= self.size:
+            raise ValueError(f"Name space of {self.size} combinations is exhausted")
+        index = self._perm(self.drawn)
+        self.drawn += 1
+        # Mixed-radix decode of the index into one choice per part
+        values = []
+        for part in reversed(self.parts):
+            index, i = divmod(index, len(part))
+            values.append(part[i])
+        return tuple(reversed(values))
+
+
+class EmailFactory:
+    """
+    Unique emails without a used-email set.
+
+    Each email carries a number from UniqueNumbers; the letters-only handle
+    before it keeps the number boundary unambiguous, so distinct numbers
+    mean distinct emails. User and referral emails use different domains
+    and number streams.
+    """
+
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.user_numbers = UniqueNumbers(rng)
+        self.referral_numbers = UniqueNumbers(rng)
+
+    def user_email(self, first: str, last: str) -> str:
+        return f"{first.lower()}.{last.lower()}{self.user_numbers.next()}@{USER_EMAIL_DOMAIN}"
+
+    def referral_email(self) -> str:
+        rng = self.rng
+        handle = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+        return f"{handle}{self.referral_numbers.next()}@{rng.choice(REFERRAL_EMAIL_DOMAINS)}"
+
+    def referral_emails(self, handles: Sequence[str], domains: Sequence[str]) -> List[str]:
+        """
+        Referral emails for handles/domains drawn elsewhere (e.g. as NumPy
+        columns); handles must be letters only. Numbers come from the same
+        stream as referral_email().
+        """
+        numbers = self.referral_numbers.take(len(handles))
+        return [f"{handle}{number}@{domain}" for handle, number, domain in zip(handles, numbers, domains)]
+
+    def get_state(self) -> Dict:
+        return {"user": self.user_numbers.get_state(), "referral": self.referral_numbers.get_state()}
+
+    def set_state(self, state: Dict) -> None:
+        self.user_numbers.set_state(state["user"])
+        self.referral_numbers.set_state(state["referral"])
+
+
+class DevicePool:
+    """Distinct device ids in insertion order, for O(1) uniform draws."""
+
+    def __init__(self, device_ids: Iterable[Optional[str]] = ()):
+        self._ids: List[str] = []
+        self._seen = set()
+        for device_id in device_ids:
+            self.add(device_id)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, device_id: Optional[str]) -> None:
+        if device_id and device_id not in self._seen:
+            self._seen.add(device_id)
+            self._ids.append(device_id)
+
+    def draw(self, rng=random) -> str:
+        return self._ids[rng.randrange(len(self._ids))]
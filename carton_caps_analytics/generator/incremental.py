@@ -0,0 +1,390 @@
+"""
+Incremental ("next slice") generation for CartonCapsDataGenerator.
+
+A full run draws the whole analytics window at once. save_state() records
+what is needed to continue it: the user population, the next id of every
+table, referrals that can still convert, events already drawn but due after
+the window (app opens, referral_applied, school_linked, reward_redeemed),
+the RNG state and the end of the generated window. generate_next_slice()
+restores that state and draws only the delta for the following slice of
+time:
+
+- users who sign up during the slice (organic and referred)
+- referrals sent during the slice
+- late conversions of earlier, still-open referrals; the referral row is
+  emitted again with its new status, so loads must upsert on referral_id.
+  The referred user installs around the conversion.
+- purchases during the slice, plus qualifying purchases of new conversions
+- the lifecycle, scan and reward events of all of the above that fall in
+  the slice, plus the pending events of earlier slices now due; events due
+  later stay pending in the state
+
+The state file is rewritten after every slice, so repeated calls produce
+consecutive slices, deterministically for a given base seed. check_event_mix()
+compares the event types of consecutive slices with those of a full run.
+
+Usage:
+    python generator/data_generator.py --save-state data/generator_state.json
+    python generator/data_generator.py --next-slice data/generator_state.json --days 1
+    python generator/incremental.py --check-days 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from identifiers import DevicePool
+from writers import COLUMN_TYPES, DEFAULT_ROW_GROUP_SIZE
+
+STATE_VERSION = 4
+
+# Daily volumes of a slice, matching the default full run (~182 days)
+USERS_PER_DAY = 2
+REFERRALS_PER_DAY = 6
+PURCHASES_PER_DAY = 55
+
+# Clicked referrals can still convert this long after they were sent
+OPEN_REFERRAL_DAYS = 14
+# Chance per open referral per day of a late conversion
+LATE_CONVERSION_RATE = 0.03
+
+SLICE_TABLES = ("users", "referrals", "purchases", "events")
+
+# Row lists kept in the state, and the table whose column types they use
+STATE_ROWS = {
+    "schools": "schools",
+    "products": "products",
+    "users": "users",
+    "open_referrals": "referrals",
+    "pending_events": "events",
+}
+
+# check_event_mix: largest allowed difference between an event type's share of
+# the slices and of the full run. The full run's first days are left out: its
+# app opens of users who signed up before the window are only partly in it
+EVENT_MIX_TOLERANCE = 0.02
+FULL_RUN_WARMUP_DAYS = 31
+
+
+def _encode_rows(rows, table_name: str) -> List[Dict]:
+    """Rows as JSON-safe dicts (timestamps as ISO strings)."""
+    ts_columns = [c for c, t in COLUMN_TYPES[table_name].items() if t == "TIMESTAMP"]
+    encoded = []
+    for row in rows:
+        row = dict(row)
+        for c in ts_columns:
+            if row.get(c) is not None:
+                row[c] = row[c].isoformat(sep=" ")
+        encoded.append(row)
+    return encoded
+
+
+def _decode_rows(rows: List[Dict], table_name: str) -> List[Dict]:
+    ts_columns = [c for c, t in COLUMN_TYPES[table_name].items() if t == "TIMESTAMP"]
+    for row in rows:
+        for c in ts_columns:
+            if row.get(c) is not None:
+                row[c] = datetime.fromisoformat(row[c])
+    return rows
+
+
+def _open_referrals(referrals, window_end: datetime) -> List[Dict]:
+    """Clicked, unconverted referrals recent enough to still convert after window_end."""
+    open_after = window_end - timedelta(days=OPEN_REFERRAL_DAYS)
+    return [
+        dict(r) for r in referrals
+        if r["status"] == "clicked" and r.get("referred_user_id") is None and r["sent_at"] >= open_after
+    ]
+
+
+def _next_id(rows, column: str) -> int:
+    return max((r[column] for r in rows), default=0) + 1
+
+
+def write_state(state: Dict, path: str) -> None:
+    """Write a state file atomically (a crash never leaves a half-written state)."""
+    encoded = dict(state)
+    for key, table_name in STATE_ROWS.items():
+        encoded[key] = _encode_rows(state[key], table_name)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(encoded, f)
+    os.replace(tmp_path, path)
+
+
+def save_state(gen, path: str) -> Dict:
+    """
+    Save everything generate_next_slice needs to continue gen's dataset.
+
+    gen must hold all generated tables in memory (not streaming mode).
+    """
+    if not gen.users or not gen.referrals:
+        raise ValueError("Users and referrals must be generated before saving generator state")
+    if not gen.purchases or not gen.events:
+        raise ValueError("Generator state needs purchases and events in memory (not available in streaming mode)")
+    if gen.pending_events is None:
+        raise ValueError("Generator state needs the events due after the window (generate_events not run)")
+
+    state = {
+        "version": STATE_VERSION,
+        "seed": gen.seed,
+        "window_end": gen.end_date.isoformat(sep=" "),
+        "next_ids": {
+            "user_id": _next_id(gen.users, "user_id"),
+            "referral_id": _next_id(gen.referrals, "referral_id"),
+            "purchase_id": _next_id(gen.purchases, "purchase_id"),
+            "event_id": _next_id(gen.events, "event_id"),
+        },
+        "rng_state": gen.rng.getstate(),
+        "emails": gen.emails.get_state(),
+        "schools": list(gen.schools),
+        "products": list(gen.products),
+        "users": list(gen.users),
+        "open_referrals": _open_referrals(gen.referrals, gen.end_date),
+        "pending_events": list(gen.pending_events),
+    }
+    write_state(state, path)
+    print(f"Saved generator state to {path} (window ends {state['window_end']})")
+    return state
+
+
+def load_state(path: str, output_dir: str = "./data") -> Tuple[object, Dict]:
+    """Restore a generator (dimensions, users, RNG, window end) from a state file."""
+    from data_generator import CartonCapsDataGenerator
+
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != STATE_VERSION:
+        raise ValueError(f"Unsupported generator state version {state.get('version')!r} in {path}")
+
+    for key, table_name in STATE_ROWS.items():
+        state[key] = _decode_rows(state[key], table_name)
+
+    gen = CartonCapsDataGenerator(seed=state["seed"], output_dir=output_dir)
+    version, internal, gauss_next = state["rng_state"]
+    gen.rng.setstate((version, tuple(internal), gauss_next))
+    gen.emails.set_state(state["emails"])
+    gen.end_date = datetime.fromisoformat(state["window_end"])
+    gen.schools = state["schools"]
+    gen.products = state["products"]
+    gen.users = state["users"]
+    return gen, state
+
+
+def generate_next_slice(
+    gen,
+    state: Dict,
+    days: int = 1,
+    n_users: Optional[int] = None,
+    n_referrals: Optional[int] = None,
+    n_purchases: Optional[int] = None,
+) -> Dict[str, List[Dict]]:
+    """
+    Draw the delta for the `days` following the state's window end.
+
+    Returns the slice's users, referrals, purchases and events (also stored
+    on gen) and advances state in place; persist it with write_state().
+    Volumes default to the per-day rates above.
+    """
+    if days < 1:
+        raise ValueError("days must be >= 1")
+    n_users = USERS_PER_DAY * days if n_users is None else n_users
+    n_referrals = REFERRALS_PER_DAY * days if n_referrals is None else n_referrals
+    n_purchases = PURCHASES_PER_DAY * days if n_purchases is None else n_purchases
+
+    next_ids = dict(state["next_ids"])
+    slice_start = gen.end_date + timedelta(seconds=1)
+    slice_end = gen.end_date + timedelta(days=days)
+    gen.start_date, gen.end_date = slice_start, slice_end
+
+    population = list(gen.users)
+
+    # Organic signups during the slice
+    gen.users = population + list(gen._user_rows(n_users, next_ids["user_id"], existing_fraction=0.0))
+
+    # New referrals; converted ones append their referred users to gen.users
+    referrals = list(gen.generate_referrals(n_referrals)) if n_referrals else []
+    for r in referrals:
+        r["referral_id"] += next_ids["referral_id"] - 1
+
+    # Late conversions of referrals left open by earlier slices
+    user_by_id = {u["user_id"]: u for u in gen.users}
+    device_pool = DevicePool(u.get("device_id") for u in gen.users)
+    next_user_id = max(u["user_id"] for u in gen.users) + 1
+    p_convert = 1 - (1 - LATE_CONVERSION_RATE) ** days
+    late: List[Dict] = []
+    # The referral as its events see it: the install (and referral_applied after
+    # it) follows the conversion in this slice, not the invite sent days ago
+    late_lifecycle: List[Dict] = []
+    for r in state["open_referrals"]:
+        if gen.rng.random() >= p_convert:
+            continue
+        referrer = user_by_id.get(r["referrer_user_id"])
+        if referrer is None:
+            continue
+        converted_at = gen._random_datetime(max(slice_start, r["sent_at"] + timedelta(hours=1)), slice_end)
+        gen.users.append(
+            gen._referred_user(next_user_id, referrer["school_id"], r["referred_email"], converted_at, device_pool)
+        )
+        late.append({**r, "referred_user_id": next_user_id, "converted_at": converted_at, "status": "converted"})
+        late_lifecycle.append({**late[-1], "sent_at": max(slice_start, converted_at - timedelta(hours=24))})
+        next_user_id += 1
+
+    # Purchases (qualifying purchases follow this slice's conversions)
+    gen.referrals = referrals + late
+    purchases = list(gen._purchase_rows(n_purchases))
+    for p in purchases:
+        p["purchase_id"] += next_ids["purchase_id"] - 1
+
+    # Events of the slice's users, referrals and purchases; those due after the
+    # slice become pending. Late conversions already had their invite_sent
+    slice_users = gen.users[len(population):]
+    all_users, gen.users = gen.users, slice_users
+    gen.referrals = referrals + late_lifecycle
+    late_ids = {r["referral_id"] for r in late}
+    pending: List[Dict] = []
+    drawn = (
+        e for e in gen._event_rows(gen._purchases_by_time(purchases), pending=pending)
+        if not (e["event_type"] == "invite_sent" and e["referral_id"] in late_ids)
+    )
+    # Pending events of earlier slices that fall in this one, merged in by time
+    carried = sorted(state.get("pending_events", []), key=itemgetter("event_at"))
+    n_due = sum(1 for e in carried if e["event_at"] <= slice_end)
+    events: List[Dict] = []
+    event_id = next_ids["event_id"]
+    for e in heapq.merge(carried[:n_due], drawn, key=itemgetter("event_at")):
+        events.append({"event_id": event_id, **{k: v for k, v in e.items() if k != "event_id"}})
+        event_id += 1
+    gen.users = all_users
+    gen.referrals = referrals + late
+
+    gen.purchases = purchases
+    gen.events = events
+    gen.pending_events = sorted(carried[n_due:] + pending, key=itemgetter("event_at"))
+
+    still_open = [r for r in _open_referrals(state["open_referrals"], slice_end) if r["referral_id"] not in late_ids]
+    state.update(
+        window_end=slice_end.isoformat(sep=" "),
+        next_ids={
+            "user_id": next_user_id,
+            "referral_id": next_ids["referral_id"] + len(referrals),
+            "purchase_id": next_ids["purchase_id"] + len(purchases),
+            "event_id": event_id,
+        },
+        rng_state=gen.rng.getstate(),
+        emails=gen.emails.get_state(),
+        users=gen.users,
+        open_referrals=still_open + _open_referrals(referrals, slice_end),
+        pending_events=gen.pending_events,
+    )
+
+    return {"users": slice_users, "referrals": gen.referrals, "purchases": purchases, "events": events}
+
+
+def generate_slice_files(
+    state_path: str,
+    output_dir: Optional[str] = None,
+    days: int = 1,
+    output_format: str = "csv",
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    csv_compression: str = "none",
+) -> Dict[str, List[Dict]]:
+    """
+    Generate the next slice from state_path, write its tables and advance
+    the state file. output_dir defaults to data/slices/<slice end date>.
+    """
+    gen, state = load_state(state_path)
+    gen.csv_compression = csv_compression
+    if output_dir is None:
+        slice_end = gen.end_date + timedelta(days=days)
+        output_dir = os.path.join(os.path.dirname(state_path) or ".", "slices", slice_end.date().isoformat())
+    os.makedirs(output_dir, exist_ok=True)
+    gen.output_dir = output_dir
+
+    print(f"Generating {days}-day slice after {state['window_end']}...")
+    delta = generate_next_slice(gen, state, days=days)
+    for table_name in SLICE_TABLES:
+        gen.save_table(delta[table_name], table_name, output_format, row_group_size)
+
+    write_state(state, state_path)
+    print(f"Advanced generator state to {state['window_end']}")
+    return delta
+
+
+def _event_mix(events) -> Dict[str, float]:
+    counts = Counter(e["event_type"] for e in events)
+    total = sum(counts.values())
+    return {t: counts[t] / total for t in sorted(counts)} if total else {}
+
+
+def check_event_mix(days: int = 30, seed: int = 42, tolerance: float = EVENT_MIX_TOLERANCE) -> Dict:
+    """
+    Generate a full run, continue it with `days` one-day slices and compare
+    each event type's share of the slices' events with its share of the full
+    run's events (after FULL_RUN_WARMUP_DAYS). Every type of the full run
+    must occur in the slices, within tolerance. Nothing is written to disk.
+    """
+    import tempfile
+
+    from data_generator import CartonCapsDataGenerator, scale_counts
+
+    counts = scale_counts(1)
+    with tempfile.TemporaryDirectory(prefix="slice_check_") as tmp:
+        gen = CartonCapsDataGenerator(seed=seed, output_dir=tmp)
+        gen.generate_schools(counts["n_schools"])
+        gen.generate_users(counts["n_users"])
+        gen.generate_products(counts["n_products"])
+        gen.generate_referrals(counts["n_referrals"])
+        gen.generate_purchases(counts["n_purchases"])
+        gen.generate_events()
+        steady_from = gen.start_date + timedelta(days=FULL_RUN_WARMUP_DAYS)
+        full_mix = _event_mix(e for e in gen.events if e["event_at"] >= steady_from)
+
+        state_path = os.path.join(tmp, "generator_state.json")
+        save_state(gen, state_path)
+        slice_events: List[Dict] = []
+        for _ in range(days):
+            slice_gen, state = load_state(state_path, output_dir=tmp)
+            slice_events.extend(generate_next_slice(slice_gen, state)["events"])
+            write_state(state, state_path)
+    slice_mix = _event_mix(slice_events)
+
+    diffs = {t: round(slice_mix.get(t, 0.0) - share, 4) for t, share in full_mix.items()}
+    failed = sorted(t for t, d in diffs.items() if t not in slice_mix or abs(d) > tolerance)
+    return {
+        "days": days,
+        "seed": seed,
+        "tolerance": tolerance,
+        "full_run_share": {t: round(v, 4) for t, v in full_mix.items()},
+        "slice_share": {t: round(v, 4) for t, v in slice_mix.items()},
+        "difference": diffs,
+        "failed_event_types": failed,
+        "ok": not failed,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check that consecutive slices match a full run's event-type mix.")
+    parser.add_argument("--check-days", type=int, default=30, help="Number of one-day slices to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=EVENT_MIX_TOLERANCE,
+                        help="Largest allowed difference of an event type's share")
+    args = parser.parse_args(argv)
+    if args.check_days < 1:
+        parser.error("--check-days must be >= 1")
+
+    report = check_event_mix(args.check_days, seed=args.seed, tolerance=args.tolerance)
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
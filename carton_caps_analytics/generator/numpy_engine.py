@@ -0,0 +1,500 @@
+"""
+Vectorized fact generation for CartonCapsDataGenerator.
+
+The pure-Python generator draws every row in a loop and calls
+``random.choices(..., weights=...)`` per row, which rebuilds the cumulative
+weights over the whole user population each time. This engine draws whole
+columns at once with ``numpy.random.Generator`` so referrals, purchases and
+events scale with ``rows * log(users)`` instead of ``rows * users``.
+
+The output schema (column names, order and Python value types) matches the
+pure-Python engine, so ``save_to_csv`` / ``save_to_sqlite`` work unchanged.
+Results are reproducible for a given seed but are not row-for-row identical
+to the pure-Python engine (the two consume randomness differently).
+
+Usage:
+    gen = CartonCapsDataGenerator(seed=42)
+    gen.generate_all(engine="numpy")
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from columnar import ColumnStore, table_column
+from identifiers import REFERRAL_EMAIL_DOMAINS
+from samplers import WeekdayDatePool
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+DAY_NAMES = np.array(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"], dtype=object)
+
+USER_TYPES = ["parent", "teacher", "supporter"]
+
+# Category preference per user_type (same weights as the pure-Python engine)
+CATEGORY_PREFS = {
+    "parent": (["Breakfast", "Dairy", "Pantry", "Snacks", "Beverages"], [0.28, 0.22, 0.20, 0.18, 0.12]),
+    "teacher": (["Snacks", "Beverages", "Breakfast", "Pantry", "Dairy"], [0.26, 0.22, 0.18, 0.18, 0.16]),
+    "supporter": (["Snacks", "Beverages", "Pantry", "Breakfast", "Dairy"], [0.30, 0.28, 0.18, 0.14, 0.10]),
+}
+
+REFERRED_FIRST_NAMES = np.array(["Alex", "Jordan", "Taylor", "Casey", "Riley", "Morgan", "Avery", "Sam"], dtype=object)
+REFERRED_LAST_NAMES = np.array(["Lee", "Nguyen", "Patel", "Kim", "Garcia", "Brown", "Davis", "Wilson"], dtype=object)
+EMAIL_DOMAINS = np.array(REFERRAL_EMAIL_DOMAINS, dtype=object)
+
+_LOWER = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz", dtype=np.uint8)
+_LOWER_DIGITS = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz0123456789", dtype=np.uint8)
+_UPPER_DIGITS = np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789", dtype=np.uint8)
+
+
+def _normalize(weights: Sequence[float]) -> np.ndarray:
+    w = np.asarray(weights, dtype=np.float64)
+    total = w.sum()
+    return w / total if total > 0 else np.full(len(w), 1.0 / len(w))
+
+
+def _to_epoch(values) -> np.ndarray:
+    """datetime (or list of datetimes) -> int64 seconds since epoch."""
+    return np.asarray(values, dtype="datetime64[s]").astype(np.int64)
+
+
+def _to_datetimes(epoch: np.ndarray) -> List[datetime]:
+    return epoch.astype("datetime64[s]").tolist()
+
+
+def build_timestamps(
+    day_start_epoch: int,
+    day_offset: np.ndarray,
+    hour: np.ndarray,
+    minute: np.ndarray,
+    second: np.ndarray,
+) -> np.ndarray:
+    """Combine sampled day offsets and clock components into epoch seconds, in bulk."""
+    return (
+        day_start_epoch
+        + day_offset.astype(np.int64) * SECONDS_PER_DAY
+        + hour.astype(np.int64) * SECONDS_PER_HOUR
+        + minute.astype(np.int64) * 60
+        + second.astype(np.int64)
+    )
+
+
+def _rows(columns: Dict[str, list]) -> List[Dict]:
+    keys = list(columns.keys())
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+class NumpyEngine:
+    """
+    Batched replacement for the fact generators of CartonCapsDataGenerator.
+
+    Dimensions (schools/users/products) are still produced by the generator
+    itself; this engine reads them from ``gen`` and writes referrals,
+    purchases and events back onto it, mirroring the pure-Python methods.
+    """
+
+    def __init__(self, gen, seed: int):
+        self.gen = gen
+        self.rng = np.random.default_rng(seed)
+        self.start_epoch = int(_to_epoch(gen.start_date))
+        self.end_epoch = int(_to_epoch(gen.end_date))
+
+    def _table(self, table_name: str, columns: Dict[str, list]):
+        """Generated columns as the generator's table type (row dicts, or a ColumnStore)."""
+        if getattr(self.gen, "columnar", False):
+            return ColumnStore.from_columns(table_name, columns)
+        return _rows(columns)
+
+    # -------------------------
+    # Random string helpers
+    # -------------------------
+
+    def _random_strings(self, n: int, alphabet: np.ndarray, lengths: np.ndarray) -> List[str]:
+        width = int(lengths.max()) if n else 0
+        codes = alphabet[self.rng.integers(0, len(alphabet), size=(n, width))]
+        return [row.tobytes()[:length].decode("ascii") for row, length in zip(codes, lengths.tolist())]
+
+    def _device_ids(self, n: int) -> List[str]:
+        suffixes = self._random_strings(n, _LOWER_DIGITS, np.full(n, 16))
+        return ["dev_" + s for s in suffixes]
+
+    def _referral_emails(self, n: int) -> List[str]:
+        """Handles and domains drawn as columns; the unique numbers come from the generator's EmailFactory."""
+        lengths = self.rng.integers(5, 11, size=n)
+        handles = self._random_strings(n, _LOWER, lengths)
+        domains = EMAIL_DOMAINS[self.rng.integers(0, len(EMAIL_DOMAINS), size=n)].tolist()
+        return self.gen.emails.referral_emails(handles, domains)
+
+    # -------------------------
+    # Fact generators
+    # -------------------------
+
+    def generate_referrals(self, n: int = 1000) -> List[Dict]:
+        gen = self.gen
+        if not gen.users:
+            raise ValueError("Users must be generated before referrals")
+        if not gen.products:
+            raise ValueError("Products must be generated before referrals")
+
+        rng = self.rng
+        users = gen.users
+        n_users = len(users)
+
+        user_ids = np.array(table_column(users, "user_id"), dtype=np.int64)
+        verified = np.array([bool(v) for v in table_column(users, "is_verified", 1)])
+        is_parent = np.array([t == "parent" for t in table_column(users, "user_type")])
+        boosted_channel = np.array([c in ("school_campaign", "partner") for c in table_column(users, "marketing_channel")])
+        school_ids = np.array(table_column(users, "school_id"), dtype=np.int64)
+        device_pool = np.array([d for d in table_column(users, "device_id") if d], dtype=object)
+
+        # Prefer verified users as referrers; pareto(a) + 1 == random.paretovariate(a)
+        weights = (rng.pareto(2.5, size=n_users) + 1.0) * np.where(is_parent, 1.15, 1.0) * np.where(boosted_channel, 1.2, 1.0)
+        weights = np.where(verified, weights, 0.05)
+        referrer_idx = rng.choice(n_users, size=n, p=_normalize(weights))
+        referrer_user_id = user_ids[referrer_idx]
+
+        sent_at = self.start_epoch + rng.integers(0, self.end_epoch - self.start_epoch + 1, size=n)
+
+        referred_email = self._referral_emails(n)
+        code_suffix = self._random_strings(n, _UPPER_DIGITS, np.full(n, 5))
+        referral_code = [f"CC{uid:05d}{s}" for uid, s in zip(referrer_user_id.tolist(), code_suffix)]
+
+        clicked = rng.random(n) < 0.55
+        converted = clicked & (rng.random(n) < 0.32)
+
+        delay_hours = rng.choice(
+            np.array([1, 2, 6, 12, 24, 36, 48, 72]),
+            size=n,
+            p=_normalize([0.10, 0.12, 0.18, 0.16, 0.18, 0.14, 0.10, 0.02]),
+        )
+        converted_at = sent_at + delay_hours * SECONDS_PER_HOUR
+        converted &= converted_at <= self.end_epoch
+
+        # Basic self-referral / abuse attempt injection (very small)
+        abuse = rng.random(n) < 0.01
+        converted &= ~abuse
+
+        status = np.where(converted, "converted", np.where(clicked, "clicked", "sent")).astype(object)
+
+        # Referred users for converted referrals, numbered in referral order
+        conv_idx = np.flatnonzero(converted)
+        n_new = len(conv_idx)
+        next_user_id = int(user_ids.max()) + 1
+        new_user_ids = np.arange(next_user_id, next_user_id + n_new, dtype=np.int64)
+
+        same_school = rng.random(n_new) < 0.75
+        random_school = np.array([s["school_id"] for s in gen.schools], dtype=np.int64)[
+            rng.integers(0, len(gen.schools), size=n_new)
+        ]
+        new_school = np.where(same_school, school_ids[referrer_idx[conv_idx]], random_school)
+
+        device_ids = np.array(self._device_ids(n_new), dtype=object)
+        shared = (rng.random(n_new) < 0.01) & (len(device_pool) > 0)
+        if shared.any():
+            device_ids[shared] = device_pool[rng.integers(0, len(device_pool), size=int(shared.sum()))]
+
+        new_user_type = np.array(USER_TYPES, dtype=object)[rng.choice(3, size=n_new, p=_normalize([0.72, 0.18, 0.10]))]
+        new_verified = (rng.random(n_new) < 0.92).astype(np.int64)
+        first = REFERRED_FIRST_NAMES[rng.integers(0, len(REFERRED_FIRST_NAMES), size=n_new)]
+        last = REFERRED_LAST_NAMES[rng.integers(0, len(REFERRED_LAST_NAMES), size=n_new)]
+
+        new_users = _rows(
+            {
+                "user_id": new_user_ids.tolist(),
+                "first_name": first.tolist(),
+                "last_name": last.tolist(),
+                "email": [referred_email[i] for i in conv_idx.tolist()],
+                "school_id": new_school.tolist(),
+                "created_at": _to_datetimes(converted_at[conv_idx]),
+                "user_type": new_user_type.tolist(),
+                "is_verified": new_verified.tolist(),
+                "device_id": device_ids.tolist(),
+                "marketing_channel": ["referral"] * n_new,
+            }
+        )
+        gen.users.extend(new_users)
+
+        referred_user_id: List[Optional[int]] = [None] * n
+        converted_at_out: List[Optional[datetime]] = [None] * n
+        for i, uid, ts in zip(conv_idx.tolist(), new_user_ids.tolist(), _to_datetimes(converted_at[conv_idx])):
+            referred_user_id[i] = uid
+            converted_at_out[i] = ts
+
+        referrals = self._table(
+            "referrals",
+            {
+                "referral_id": list(range(1, n + 1)),
+                "referrer_user_id": referrer_user_id.tolist(),
+                "referred_email": referred_email,
+                "referred_user_id": referred_user_id,
+                "referral_code": referral_code,
+                "sent_at": _to_datetimes(sent_at),
+                "converted_at": converted_at_out,
+                "status": status.tolist(),
+            }
+        )
+        gen.referrals = referrals
+        return referrals
+
+    def generate_purchases(self, n: int = 10000) -> List[Dict]:
+        gen = self.gen
+        if not gen.users or not gen.products:
+            raise ValueError("Users and products must be generated before purchases")
+
+        rng = self.rng
+        users = gen.users
+        n_users = len(users)
+
+        # Heavy-tailed user activity
+        user_ids = np.array(table_column(users, "user_id"), dtype=np.int64)
+        user_type = np.array(table_column(users, "user_type", "parent"), dtype=object)
+        verified = np.array([bool(v) for v in table_column(users, "is_verified", 1)])
+        school_campaign = np.array([c == "school_campaign" for c in table_column(users, "marketing_channel")])
+        weights = (
+            (rng.pareto(2.0, size=n_users) + 1.0)
+            * np.where(np.isin(user_type, ["parent", "teacher"]), 1.25, 0.9)
+            * np.where(verified, 1.15, 0.6)
+            * np.where(school_campaign, 1.15, 1.0)
+        )
+        user_idx = rng.choice(n_users, size=n, p=_normalize(weights))
+
+        # Temporal weighting: weekday, then a uniform date with that weekday, then hour/minute/second
+        weekday_weights = [1.0, 0.95, 0.95, 1.0, 1.05, 1.25, 1.20]  # Mon..Sun
+        hour_weights = np.full(24, 0.25)
+        hour_weights[6:10] = 1.2
+        hour_weights[10:16] = 1.0
+        hour_weights[16:21] = 1.35
+        hour_weights[21:23] = 0.9
+
+        start_day = gen.start_date.date()
+        date_pool = WeekdayDatePool(start_day, gen.end_date.date())
+        first_offset = np.array(date_pool.first_offset, dtype=np.int64)
+        counts = np.array(date_pool.counts, dtype=np.int64)
+
+        dow = rng.choice(7, size=n, p=_normalize(np.where(counts > 0, weekday_weights, 0.0)))
+        day_offset = first_offset[dow] + 7 * (rng.random(n) * counts[dow]).astype(np.int64)
+
+        hour = rng.choice(24, size=n, p=_normalize(hour_weights))
+        minute = rng.integers(0, 60, size=n)
+        second = rng.integers(0, 60, size=n)
+        day_start_epoch = int(_to_epoch(datetime(start_day.year, start_day.month, start_day.day)))
+        purchased_at = build_timestamps(day_start_epoch, day_offset, hour, minute, second)
+
+        # Category by user_type, then a uniform product within the category
+        product_ids = np.array([p["product_id"] for p in gen.products], dtype=np.int64)
+        prices = np.array([p["price"] for p in gen.products], dtype=np.float64)
+        points_per_dollar = np.array([p["points_per_dollar"] for p in gen.products], dtype=np.int64)
+        categories = sorted({p["category"] for p in gen.products})
+        product_category = np.array([p["category"] for p in gen.products], dtype=object)
+        products_in_category = {c: np.flatnonzero(product_category == c) for c in categories}
+
+        chosen_category = np.empty(n, dtype=object)
+        drawn_type = user_type[user_idx]
+        for utype in USER_TYPES:
+            mask = drawn_type == utype if utype != "supporter" else ~np.isin(drawn_type, ["parent", "teacher"])
+            cats, cat_weights = CATEGORY_PREFS[utype]
+            chosen_category[mask] = np.array(cats, dtype=object)[rng.choice(len(cats), size=int(mask.sum()), p=_normalize(cat_weights))]
+
+        missing = ~np.isin(chosen_category, categories)
+        if missing.any():
+            chosen_category[missing] = np.array(categories, dtype=object)[rng.integers(0, len(categories), size=int(missing.sum()))]
+
+        product_idx = np.empty(n, dtype=np.int64)
+        for c, pool in products_in_category.items():
+            mask = chosen_category == c
+            product_idx[mask] = pool[rng.integers(0, len(pool), size=int(mask.sum()))]
+
+        quantity = rng.choice(np.arange(1, 7), size=n, p=_normalize([0.70, 0.18, 0.07, 0.03, 0.015, 0.005]))
+        promo = rng.random(n) < 0.12
+        discount = np.where(promo, rng.uniform(0.05, 0.35, size=n), 0.0)
+        noise = rng.uniform(-0.03, 0.03, size=n)
+
+        line_total = prices[product_idx] * quantity * (1 - discount)
+        price_paid = np.round(np.maximum(0.5, line_total * (1 + noise)), 2)
+        points_earned = np.rint(price_paid * points_per_dollar[product_idx]).astype(np.int64)
+
+        # Qualifying purchase for converted referred users shortly after conversion
+        converted = [
+            r for r in gen.referrals
+            if r.get("status") == "converted" and r.get("referred_user_id") and r.get("converted_at")
+        ]
+        q_user = np.array([r["referred_user_id"] for r in converted], dtype=np.int64)
+        q_base = _to_epoch([r["converted_at"] for r in converted]) if converted else np.empty(0, dtype=np.int64)
+        m = len(converted)
+        q_time = q_base + rng.integers(0, 7, size=m) * SECONDS_PER_DAY + rng.integers(8, 21, size=m) * SECONDS_PER_HOUR
+        keep = (rng.random(m) < 0.85) & (q_time <= self.end_epoch)
+        q_user, q_time = q_user[keep], q_time[keep]
+        k = len(q_user)
+        q_product = rng.integers(0, len(product_ids), size=k)
+        q_qty = rng.choice(np.arange(1, 4), size=k, p=_normalize([0.72, 0.22, 0.06]))
+        q_price = np.round(prices[q_product] * q_qty * (1 - rng.uniform(0.0, 0.18, size=k)), 2)
+        q_points = np.rint(q_price * points_per_dollar[q_product]).astype(np.int64)
+
+        all_time = np.concatenate([purchased_at, q_time])
+        all_dow = (all_time // SECONDS_PER_DAY + 3) % 7  # 1970-01-01 was a Thursday
+        purchases = self._table(
+            "purchases",
+            {
+                "purchase_id": list(range(1, n + k + 1)),
+                "user_id": np.concatenate([user_ids[user_idx], q_user]).tolist(),
+                "product_id": np.concatenate([product_ids[product_idx], product_ids[q_product]]).tolist(),
+                "quantity": np.concatenate([quantity, q_qty]).tolist(),
+                "price_paid": np.concatenate([price_paid, q_price]).tolist(),
+                "points_earned": np.concatenate([points_earned, q_points]).tolist(),
+                "purchased_at": _to_datetimes(all_time),
+                "day_of_week": DAY_NAMES[all_dow].tolist(),
+                "hour_of_day": ((all_time % SECONDS_PER_DAY) // SECONDS_PER_HOUR).tolist(),
+            }
+        )
+        gen.purchases = purchases
+        return purchases
+
+    def generate_events(self) -> List[Dict]:
+        gen = self.gen
+        if not gen.users:
+            raise ValueError("Users must exist before events")
+        if not gen.referrals:
+            raise ValueError("Referrals must exist before events")
+        if not gen.purchases:
+            raise ValueError("Purchases must exist before events")
+
+        rng = self.rng
+        start, end = self.start_epoch, self.end_epoch
+        blocks: List[tuple] = []
+        # Events due after the window, kept on gen.pending_events for the next slice
+        pending_blocks: List[tuple] = []
+
+        def add(user_id, event_type: str, event_at, referral_id=None, metadata="{}"):
+            if len(user_id):
+                blocks.append((user_id, event_type, event_at, referral_id, metadata))
+
+        def add_until_end(user_id, event_type: str, event_at, referral_id=None, metadata="{}"):
+            due = event_at <= end
+            add(user_id[due], event_type, event_at[due], None if referral_id is None else referral_id[due], metadata)
+            later = ~due
+            if later.any():
+                pending_blocks.append((user_id[later], event_type, event_at[later],
+                                       None if referral_id is None else referral_id[later], metadata))
+
+        # USER BASELINE EVENTS
+        user_ids = np.array(table_column(gen.users, "user_id"), dtype=np.int64)
+        created_at = _to_epoch(table_column(gen.users, "created_at"))
+        add(user_ids, "install", created_at)
+
+        open_count = rng.choice(
+            np.array([0, 1, 2, 3, 5, 8, 12]),
+            size=len(user_ids),
+            p=_normalize([0.10, 0.25, 0.22, 0.18, 0.15, 0.07, 0.03]),
+        )
+        open_user = np.repeat(np.arange(len(user_ids)), open_count)
+        m = len(open_user)
+        open_time = (
+            created_at[open_user]
+            + rng.integers(0, 31, size=m) * SECONDS_PER_DAY
+            + rng.integers(0, 24, size=m) * SECONDS_PER_HOUR
+            + rng.integers(0, 60, size=m) * 60
+        )
+        started = open_time >= start
+        add_until_end(user_ids[open_user[started]], "app_open", open_time[started])
+
+        # REFERRAL LIFECYCLE EVENTS
+        refs = gen.referrals
+        ref_id = np.array([r["referral_id"] for r in refs], dtype=np.int64)
+        referrer_id = np.array([r["referrer_user_id"] for r in refs], dtype=np.int64)
+        sent_at = _to_epoch([r["sent_at"] for r in refs])
+        add(referrer_id, "invite_sent", sent_at, ref_id)
+
+        has_referred = np.array([r.get("referred_user_id") is not None for r in refs])
+        referred_id = np.array([r.get("referred_user_id") or 0 for r in refs], dtype=np.int64)
+        engaged = np.flatnonzero(np.isin([r["status"] for r in refs], ["clicked", "converted"]) & has_referred)
+
+        install_at = sent_at[engaged] + rng.integers(1, 25, size=len(engaged)) * SECONDS_PER_HOUR
+        add(referred_id[engaged], "install", install_at, ref_id[engaged], '{"source":"referral"}')
+
+        apply_delay = rng.choice(
+            np.array([2, 6, 12, 24, 36, 48, 72]),
+            size=len(engaged),
+            p=_normalize([0.20, 0.18, 0.16, 0.18, 0.14, 0.10, 0.04]),
+        )
+        applied_at = install_at + apply_delay * SECONDS_PER_HOUR
+        add_until_end(referred_id[engaged], "referral_applied", applied_at, ref_id[engaged])
+
+        conv = np.flatnonzero(
+            np.array([r["status"] == "converted" and r.get("converted_at") is not None for r in refs]) & has_referred
+        )
+        conv_at = _to_epoch([refs[i]["converted_at"] for i in conv.tolist()]) if len(conv) else np.empty(0, dtype=np.int64)
+        onboarding_at = conv_at - rng.integers(1, 13, size=len(conv)) * SECONDS_PER_HOUR
+        ok = onboarding_at >= start
+        add(referred_id[conv][ok], "onboarding_complete", onboarding_at[ok], ref_id[conv][ok])
+
+        school_linked_at = onboarding_at + rng.integers(0, 3, size=len(conv)) * SECONDS_PER_DAY
+        add_until_end(referred_id[conv], "school_linked", school_linked_at, ref_id[conv])
+
+        # reward awarded to both parties; redeemed later (not always)
+        for reward_user_id, reward_type in [(referrer_id[conv], "referrer_bonus"), (referred_id[conv], "referred_bonus")]:
+            metadata = f'{{"reward_type":"{reward_type}"}}'
+            add(reward_user_id, "reward_awarded", conv_at, ref_id[conv], metadata)
+            redeemed_at = conv_at + rng.integers(1, 31, size=len(conv)) * SECONDS_PER_DAY
+            ok = rng.random(len(conv)) < 0.75
+            add_until_end(reward_user_id[ok], "reward_redeemed", redeemed_at[ok], ref_id[conv][ok], metadata)
+
+        # RECEIPT SCAN / INCENTIVE EVENTS (from purchases)
+        p_user = np.array(table_column(gen.purchases, "user_id"), dtype=np.int64)
+        p_time = _to_epoch(table_column(gen.purchases, "purchased_at"))
+        n_p = len(p_user)
+
+        scan_start = p_time - rng.integers(1, 6, size=n_p) * 60
+        ok = scan_start >= start
+        add(p_user[ok], "receipt_scan_started", scan_start[ok])
+
+        ok = rng.random(n_p) < 0.88
+        add(p_user[ok], "receipt_scan_completed", p_time[ok])
+
+        viewed_at = p_time - rng.integers(5, 61, size=n_p) * 60
+        ok = (rng.random(n_p) < 0.35) & (viewed_at >= start)
+        add(p_user[ok], "incentive_viewed", viewed_at[ok])
+
+        # Assemble columns in event_at order; the sort is stable, so ties keep
+        # block order and event_id follows time like the python engine's merge
+        sizes = [len(block[0]) for block in blocks]
+        event_at = np.concatenate([block[2] for block in blocks]) if blocks else np.empty(0, dtype=np.int64)
+        order = np.argsort(event_at, kind="stable")
+        block_of = np.repeat(np.arange(len(blocks)), sizes)[order].tolist()
+
+        user_col: List[int] = np.concatenate([block[0] for block in blocks])[order].tolist() if blocks else []
+        type_col: List[str] = [blocks[i][1] for i in block_of]
+        at_col: List[datetime] = _to_datetimes(event_at[order])
+        referral_ids = [
+            block[3] if block[3] is not None else np.full(size, -1, dtype=np.int64)
+            for block, size in zip(blocks, sizes)
+        ]
+        ref_col: List[Optional[int]] = (
+            [r if r >= 0 else None for r in np.concatenate(referral_ids)[order].tolist()] if blocks else []
+        )
+        meta_col: List[str] = [blocks[i][4] for i in block_of]
+
+        events = self._table(
+            "events",
+            {
+                "event_id": list(range(1, len(user_col) + 1)),
+                "user_id": user_col,
+                "event_type": type_col,
+                "event_at": at_col,
+                "referral_id": ref_col,
+                "metadata_json": meta_col,
+            }
+        )
+        gen.events = events
+        pending: List[Dict] = []
+        for user_id, event_type, event_at, referral_id, metadata in pending_blocks:
+            rids = referral_id.tolist() if referral_id is not None else [None] * len(user_id)
+            for uid, at, rid in zip(user_id.tolist(), _to_datetimes(event_at), rids):
+                pending.append({"user_id": uid, "event_type": event_type, "event_at": at,
+                                "referral_id": rid, "metadata_json": metadata})
+        gen.pending_events = sorted(pending, key=itemgetter("event_at"))
+        return events
@@ -0,0 +1,144 @@
+"""
+Precomputed weighted samplers for the generator's skewed distributions.
+
+``random.choices(population, weights=...)`` rebuilds the cumulative weights on
+every call, which is O(n) per draw. The generator draws from the same
+distributions (referrer popularity, purchase activity, hour/weekday mix, ...)
+thousands to millions of times, so we build each distribution once as a
+Walker/Vose alias table and answer every draw in O(1).
+
+WeekdayDatePool indexes the analytics window by weekday so a purchase date
+for a given weekday is an O(1) draw, independent of the window length.
+
+Usage:
+    sampler = WeightedSampler(["a", "b", "c"], [0.7, 0.2, 0.1])
+    sampler.draw()          # one value
+    sampler.draws(1000)     # list of 1000 values
+
+    pool = WeekdayDatePool(date(2024, 1, 1), date(2024, 6, 30))
+    pool.draw(5)            # a uniformly chosen Saturday in the window
+"""
+
+from __future__ import annotations
+
+import random
+from datetime import date, timedelta
+from typing import Generic, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+class WeightedSampler(Generic[T]):
+    """
+    Alias-table sampler over a fixed population.
+
+    Construction is O(n); each draw costs one uniform random number (its
+    integer part picks a column, its fraction the coin flip) and one table
+    lookup. Weights need not be normalized. Draws use the ``rng`` passed
+    in (anything with ``random()``; defaults to the ``random`` module), so the
+    sampler itself holds no randomness state.
+    """
+
+    __slots__ = ("population", "_prob", "_alias", "_n")
+
+    def __init__(self, population: Sequence[T], weights: Sequence[float]):
+        if len(population) != len(weights):
+            raise ValueError("population and weights must be the same length")
+        if not population:
+            raise ValueError("population must not be empty")
+
+        n = len(population)
+        total = float(sum(weights))
+        if total <= 0:
+            weights = [1.0] * n
+            total = float(n)
+
+        self.population: List[T] = list(population)
+        self._n = n
+
+        # Vose's alias method: split scaled weights into small (<1) and large (>=1)
+        scaled = [w * n / total for w in weights]
+        prob = [0.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] = (scaled[g] + scaled[s]) - 1.0
+            if scaled[g] < 1.0:
+                small.append(g)
+            else:
+                large.append(g)
+
+        # Leftovers are 1.0 up to floating point error
+        for i in large:
+            prob[i] = 1.0
+        for i in small:
+            prob[i] = 1.0
+
+        self._prob = prob
+        self._alias = alias
+
+    def __len__(self) -> int:
+        return self._n
+
+    def draw_index(self, rng=random) -> int:
+        """Draw one index into the population."""
+        u = rng.random() * self._n
+        i = int(u)
+        if i >= self._n:  # guard against u == n from float rounding
+            i = self._n - 1
+        return i if (u - i) < self._prob[i] else self._alias[i]
+
+    def draw(self, rng=random) -> T:
+        """Draw one value from the population."""
+        return self.population[self.draw_index(rng)]
+
+    def draws(self, k: int, rng=random) -> List[T]:
+        """Draw k values (with replacement)."""
+        population = self.population
+        draw_index = self.draw_index
+        return [population[draw_index(rng)] for _ in range(k)]
+
+
+class WeekdayDatePool:
+    """
+    Dates in [start, end] (inclusive) indexed by weekday (Mon=0 .. Sun=6).
+
+    Dates sharing a weekday form an arithmetic progression (first + 7k), so
+    the index stores only the first date and the count per weekday. Memory
+    and draw cost are O(1) regardless of how many years the window spans.
+    """
+
+    __slots__ = ("start", "end", "first_offset", "counts")
+
+    def __init__(self, start: date, end: date):
+        if end < start:
+            raise ValueError("end must not be before start")
+        self.start = start
+        self.end = end
+
+        days = (end - start).days + 1
+        # Day offset (from start) of the first date with each weekday, and how many there are
+        self.first_offset: List[int] = [(d - start.weekday()) % 7 for d in range(7)]
+        self.counts: List[int] = [
+            (days - off + 6) // 7 if off < days else 0 for off in self.first_offset
+        ]
+
+    def count(self, weekday: int) -> int:
+        return self.counts[weekday]
+
+    def draw_offset(self, weekday: int, rng=random) -> int:
+        """Day offset (from start) of a uniformly chosen date with this weekday."""
+        n = self.counts[weekday]
+        if n == 0:
+            raise ValueError(f"No dates with weekday {weekday} between {self.start} and {self.end}")
+        return self.first_offset[weekday] + 7 * int(rng.random() * n)
+
+    def draw(self, weekday: int, rng=random) -> date:
+        """A uniformly chosen date with this weekday."""
+        return self.start + timedelta(days=self.draw_offset(weekday, rng))
@@ -0,0 +1,185 @@
+"""
+Multi-process sharded generation for CartonCapsDataGenerator.
+
+Dimensions (schools, users, products) are generated once in the parent. The
+baseline users are then split into contiguous user_id ranges, one per shard,
+and each shard generates its own referrals (and referred users), purchases
+and events in a worker process with a seed derived from the base seed.
+
+Shard results are merged in shard order (events in event_at order),
+renumbering referral/purchase/event ids and the ids of referred users so the
+merged tables look exactly like a single-process run. The output is identical for a given (seed, n_shards)
+regardless of worker count or scheduling.
+
+Usage:
+    gen = CartonCapsDataGenerator(seed=42)
+    gen.generate_all(n_purchases=5_000_000, shards=8)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+
+def shard_seed(base_seed: int, shard_index: int) -> int:
+    """Stable per-shard seed (independent of PYTHONHASHSEED and platform)."""
+    digest = hashlib.sha256(f"carton-caps:{base_seed}:{shard_index}".encode("ascii")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def split_evenly(total: int, n_shards: int) -> List[int]:
+    """Split total into n_shards counts that differ by at most one."""
+    base, extra = divmod(total, n_shards)
+    return [base + (1 if i < extra else 0) for i in range(n_shards)]
+
+
+def split_users(users: List[Dict], n_shards: int) -> List[List[Dict]]:
+    """Split users into n_shards contiguous user_id ranges of near-equal size."""
+    ordered = sorted(users, key=lambda u: u["user_id"])
+    shards: List[List[Dict]] = []
+    start = 0
+    for size in split_evenly(len(ordered), n_shards):
+        shards.append(ordered[start:start + size])
+        start += size
+    return shards
+
+
+def _generate_shard(task: Tuple) -> Dict[str, List[Dict]]:
+    """Worker entry point: generate one shard's facts and return them."""
+    (seed, output_dir, start_date, end_date, engine,
+     schools, products, users, n_referrals, n_purchases) = task
+
+    from data_generator import CartonCapsDataGenerator
+
+    gen = CartonCapsDataGenerator(seed=seed, output_dir=output_dir)
+    gen.start_date = start_date
+    gen.end_date = end_date
+    gen.schools = schools
+    gen.products = products
+    gen.users = list(users)
+    n_base_users = len(gen.users)
+
+    facts = gen._fact_engine(engine)
+    facts.generate_referrals(n_referrals)
+    facts.generate_purchases(n_purchases)
+    facts.generate_events()
+
+    return {
+        "new_users": gen.users[n_base_users:],
+        "referrals": gen.referrals,
+        "purchases": gen.purchases,
+        "events": gen.events,
+        "pending_events": gen.pending_events or [],
+    }
+
+
+def merge_shards(results: List[Dict[str, List[Dict]]], next_user_id: int) -> Dict[str, List[Dict]]:
+    """
+    Concatenate shard results in shard order, renumbering ids.
+
+    referral_id / purchase_id restart at 1 in every shard and are offset
+    here; events are merged across shards in event_at order and get a new
+    event_id sequence in that order. Referred users get shard-local ids
+    above their shard's highest baseline user_id, so they are remapped to a
+    global sequence starting at next_user_id (every other user_id is left
+    untouched).
+    """
+    merged: Dict[str, List[Dict]] = {"new_users": [], "referrals": [], "purchases": [], "events": []}
+    shard_events: List[List[Dict]] = []
+    shard_pending: List[List[Dict]] = []
+    referral_offset = purchase_offset = 0
+
+    for result in results:
+        user_map: Dict[int, int] = {}
+        for u in result["new_users"]:
+            user_map[u["user_id"]] = next_user_id
+            merged["new_users"].append({**u, "user_id": next_user_id})
+            next_user_id += 1
+
+        for r in result["referrals"]:
+            referred = r["referred_user_id"]
+            merged["referrals"].append({
+                **r,
+                "referral_id": r["referral_id"] + referral_offset,
+                "referred_user_id": user_map.get(referred, referred),
+            })
+
+        for p in result["purchases"]:
+            merged["purchases"].append({
+                **p,
+                "purchase_id": p["purchase_id"] + purchase_offset,
+                "user_id": user_map.get(p["user_id"], p["user_id"]),
+            })
+
+        def remap(e: Dict) -> Dict:
+            return {
+                **e,
+                "user_id": user_map.get(e["user_id"], e["user_id"]),
+                "referral_id": e["referral_id"] + referral_offset if e["referral_id"] is not None else None,
+            }
+
+        shard_events.append([remap(e) for e in result["events"]])
+        shard_pending.append([remap(e) for e in result.get("pending_events", [])])
+
+        referral_offset += len(result["referrals"])
+        purchase_offset += len(result["purchases"])
+
+    # Every shard's events are in event_at order; merge them and renumber in time order
+    for event_id, e in enumerate(heapq.merge(*shard_events, key=itemgetter("event_at")), start=1):
+        e["event_id"] = event_id
+        merged["events"].append(e)
+    merged["pending_events"] = list(heapq.merge(*shard_pending, key=itemgetter("event_at")))
+
+    return merged
+
+
+def generate_sharded(
+    gen,
+    n_referrals: int,
+    n_purchases: int,
+    n_shards: int,
+    engine: str = "python",
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Generate referrals, purchases and events for gen's users in n_shards
+    worker processes and store the merged tables on gen.
+
+    gen must already hold schools, users and products. workers defaults to
+    one process per shard, capped at the CPU count.
+    """
+    if not gen.users or not gen.products or not gen.schools:
+        raise ValueError("Schools, users and products must be generated before sharded facts")
+    if n_shards < 1:
+        raise ValueError("n_shards must be >= 1")
+    if n_shards > min(len(gen.users), n_referrals):
+        raise ValueError("n_shards must not exceed the number of users or referrals")
+
+    user_shards = split_users(gen.users, n_shards)
+    referral_counts = split_evenly(n_referrals, n_shards)
+    purchase_counts = split_evenly(n_purchases, n_shards)
+
+    tasks = [
+        (
+            shard_seed(gen.seed, i), gen.output_dir, gen.start_date, gen.end_date, engine,
+            gen.schools, gen.products, user_shards[i], referral_counts[i], purchase_counts[i],
+        )
+        for i in range(n_shards)
+    ]
+
+    with ProcessPoolExecutor(max_workers=workers or min(n_shards, os.cpu_count() or 1)) as pool:
+        results = list(pool.map(_generate_shard, tasks))
+
+    next_user_id = max(u["user_id"] for u in gen.users) + 1
+    merged = merge_shards(results, next_user_id)
+
+    gen.users.extend(merged["new_users"])
+    gen.referrals = gen._as_table("referrals", merged["referrals"])
+    gen.purchases = gen._as_table("purchases", merged["purchases"])
+    gen.events = gen._as_table("events", merged["events"])
+    gen.pending_events = merged["pending_events"]
@@ -0,0 +1,104 @@
+"""
+External sort for row streams that do not fit in memory.
+
+Rows are buffered into runs of run_size, each run is sorted in memory and,
+once there is more than one, spilled to a temporary file as pickled blocks.
+merged() then k-way merges the runs with a heap, reading one block per run
+at a time, so memory stays at one run while adding and one block per run
+while merging. A stream that fits in a single run never touches disk.
+
+The generator uses it to feed purchases to the time-ordered event merge in
+streaming mode, where purchases arrive in purchase_id (not time) order.
+
+Usage:
+    with SortedRuns(key=lambda p: (p["purchased_at"], p["purchase_id"])) as runs:
+        runs.extend(purchase_rows)
+        for row in runs.merged():
+            ...
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Callable, Iterable, Iterator, List, Optional
+
+DEFAULT_RUN_SIZE = 50_000
+BLOCK_SIZE = 4096
+
+
+class SortedRuns:
+    def __init__(
+        self,
+        key: Callable,
+        run_size: int = DEFAULT_RUN_SIZE,
+        tmp_dir: Optional[str] = None,
+    ):
+        if run_size < 1:
+            raise ValueError("run_size must be >= 1")
+        self.key = key
+        self.run_size = run_size
+        self._tmp_parent = tmp_dir
+        self._tmp_dir: Optional[str] = None
+        self._buffer: List = []
+        self._run_paths: List[str] = []
+        self.rows = 0
+
+    def add(self, row) -> None:
+        # Spill a full run only once another row arrives, so a stream of
+        # exactly run_size rows stays in memory
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+        self._buffer.append(row)
+        self.rows += 1
+
+    def extend(self, rows: Iterable) -> None:
+        for row in rows:
+            self.add(row)
+
+    def _spill(self) -> None:
+        if not self._buffer:
+            return
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix="sorted_runs_", dir=self._tmp_parent)
+        self._buffer.sort(key=self.key)
+        path = os.path.join(self._tmp_dir, f"run_{len(self._run_paths):05d}.pkl")
+        with open(path, "wb") as f:
+            for start in range(0, len(self._buffer), BLOCK_SIZE):
+                pickle.dump(self._buffer[start:start + BLOCK_SIZE], f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._run_paths.append(path)
+        self._buffer = []
+
+    @staticmethod
+    def _read_run(path: str) -> Iterator:
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    return
+                yield from block
+
+    def merged(self) -> Iterator:
+        """All added rows in key order (ties keep insertion order within a run)."""
+        if not self._run_paths:
+            self._buffer.sort(key=self.key)
+            return iter(self._buffer)
+        self._spill()
+        return heapq.merge(*(self._read_run(p) for p in self._run_paths), key=self.key)
+
+    def close(self) -> None:
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        self._run_paths = []
+        self._buffer = []
+
+    def __enter__(self) -> "SortedRuns":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,358 @@
+"""
+Table writers for the generator (CSV, typed Parquet, SQLite).
+
+Each writer accepts rows (dicts) in chunks, appends them to its output and
+keeps at most one chunk / row group in memory, so the same writers serve
+both the in-memory and the streaming generation modes.
+
+Parquet output uses the explicit column types in COLUMN_TYPES (ids as
+INTEGER, timestamps as TIMESTAMP, ...), read from the raw schema registry
+contracts/raw_schemas.json, so DuckDB can read it without type sniffing.
+The same typed Arrow tables (to_arrow) feed DuckDB directly when load_raw
+ingests from the generator. Both require pyarrow.
+
+CSVs can be written compressed, chosen by file suffix (see open_csv):
+<table>.csv.gz (gzip, stdlib) or <table>.csv.zst (zstd, through pyarrow).
+Rows are compressed as they are written, never buffered whole. A .csv.zst
+is a series of zstd frames that each declare their uncompressed size, so a
+reader can size the file from its frame headers.
+
+Usage:
+    with ChunkedCsvWriter("./data/events.csv") as writer:
+        for chunk in gen.iter_events(chunk_size=50_000):
+            writer.write(chunk)
+
+    with ChunkedParquetWriter("./data/events.parquet", "events") as writer:
+        writer.write(gen.events)
+
+    with SqliteBulkLoader("./data/carton_caps_generated.db") as db:
+        db.write("events", gen.events)
+"""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, Optional
+
+OUTPUT_FORMATS = ("csv", "parquet", "both")
+
+# Matches DuckDB's row group size so Parquet row groups line up with its zone maps
+DEFAULT_ROW_GROUP_SIZE = 122_880
+
+# CSV codec -> file suffix; readers (and load_raw.py) detect the codec from the suffix
+CSV_COMPRESSIONS = {"none": ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}
+
+# Uncompressed bytes per frame of a .csv.zst (each frame records its content size)
+ZSTD_FRAME_SIZE = 4 << 20
+
+# Larger pages mean fewer B-tree pages/splits for the bulk build (must be set before any table exists)
+SQLITE_PAGE_SIZE = 16_384
+
+# Declared schemas of the raw tables, shared with duckdb/load_raw.py
+RAW_SCHEMAS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "contracts", "raw_schemas.json")
+
+
+def load_raw_schemas(path: str = RAW_SCHEMAS_PATH) -> Dict[str, Dict]:
+    """Table name -> {"primary_key", "columns": [{"name", "type", "nullable"}, ...]}."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["tables"]
+
+
+RAW_SCHEMAS = load_raw_schemas()
+
+# Declared column types of every generated table (DuckDB type names)
+COLUMN_TYPES: Dict[str, Dict[str, str]] = {
+    table_name: {c["name"]: c["type"] for c in schema["columns"]} for table_name, schema in RAW_SCHEMAS.items()
+}
+
+# Indexed after the bulk load (building an index once is cheaper than maintaining it per insert)
+SQLITE_PRIMARY_KEYS: Dict[str, str] = {table_name: schema["primary_key"] for table_name, schema in RAW_SCHEMAS.items()}
+
+
+@lru_cache(maxsize=None)
+def arrow_schema(table_name: str):
+    """pyarrow schema for a generated table, from COLUMN_TYPES."""
+    import pyarrow as pa
+
+    arrow_types = {
+        "INTEGER": pa.int32(),
+        "BIGINT": pa.int64(),
+        "DOUBLE": pa.float64(),
+        "VARCHAR": pa.string(),
+        "TIMESTAMP": pa.timestamp("us"),
+    }
+    return pa.schema([(col, arrow_types[t]) for col, t in COLUMN_TYPES[table_name].items()])
+
+
+def to_arrow(rows: List[Dict], table_name: str):
+    """Rows of a generated table as a typed pyarrow Table (empty rows keep the schema)."""
+    import pyarrow as pa
+
+    return pa.Table.from_pylist(rows, schema=arrow_schema(table_name))
+
+
+def csv_filename(table_name: str, compression: str = "none") -> str:
+    if compression not in CSV_COMPRESSIONS:
+        raise ValueError(f"Unknown CSV compression {compression!r}; expected one of {tuple(CSV_COMPRESSIONS)}")
+    return f"{table_name}{CSV_COMPRESSIONS[compression]}"
+
+
+def open_csv(path: str, mode: str = "w"):
+    """
+    Text-mode file object for a CSV ("w" or "r"), streaming through gzip
+    for .csv.gz and zstd for .csv.zst.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", newline="", encoding="utf-8", compresslevel=6)
+    if path.endswith(".zst"):
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("zstd CSV compression requires pyarrow (pip install pyarrow)") from e
+        if mode == "w":
+            stream = io.BufferedWriter(_ZstdFrameWriter(path, pa.Codec("zstd")))
+        else:
+            stream = pa.input_stream(path, compression="zstd")
+        return io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    return open(path, mode, newline="")
+
+
+class _ZstdFrameWriter(io.RawIOBase):
+    """
+    Binary sink compressing into zstd frames of ZSTD_FRAME_SIZE uncompressed
+    bytes. Unlike a streaming compressor's single frame, each one-shot
+    frame declares its content size in its header.
+    """
+
+    def __init__(self, path: str, codec):
+        super().__init__()
+        self._fp = open(path, "wb")
+        self._codec = codec
+        self._pending = bytearray()
+        self._frames = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._pending += data
+        while len(self._pending) >= ZSTD_FRAME_SIZE:
+            self._write_frame(self._pending[:ZSTD_FRAME_SIZE])
+            del self._pending[:ZSTD_FRAME_SIZE]
+        return len(data)
+
+    def _write_frame(self, data) -> None:
+        self._fp.write(self._codec.compress(bytes(data), asbytes=True))
+        self._frames += 1
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            # An empty file is still one (empty) frame, as a streaming compressor writes
+            if self._pending or not self._frames:
+                self._write_frame(self._pending)
+            self._pending = bytearray()
+        finally:
+            self._fp.close()
+            super().close()
+
+
+class ChunkedCsvWriter:
+    """Append row chunks to a CSV file (compressed by suffix, see open_csv); the header comes from the first row."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = 0
+        self._fp = open_csv(path)
+        self._writer: Optional[csv.DictWriter] = None
+
+    def write(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._fp, fieldnames=list(rows[0].keys()))
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+        self.rows_written += len(rows)
+
+    def close(self) -> None:
+        if not self._fp.closed:
+            self._fp.close()
+            print(f"Saved {self.rows_written} records to {self.path}")
+
+    def __enter__(self) -> "ChunkedCsvWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ChunkedParquetWriter:
+    """
+    Append row chunks to a typed Parquet file.
+
+    Rows are buffered until a full row group (row_group_size rows) is
+    available, so row groups have a fixed size regardless of chunk size.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table_name: str,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        compression: str = "zstd",
+    ):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)") from e
+
+        self.path = path
+        self.table_name = table_name
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self._schema = arrow_schema(table_name)
+        self._writer = pq.ParquetWriter(path, self._schema, compression=compression)
+        self._buffer: List[Dict] = []
+        self._closed = False
+
+    def write(self, rows: List[Dict]) -> None:
+        self._buffer.extend(rows)
+        while len(self._buffer) >= self.row_group_size:
+            self._flush(self._buffer[: self.row_group_size])
+            del self._buffer[: self.row_group_size]
+
+    def _flush(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        self._writer.write_table(to_arrow(rows, self.table_name), row_group_size=self.row_group_size)
+        self.rows_written += len(rows)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._flush(self._buffer)
+        self._buffer = []
+        self._writer.close()
+        self._closed = True
+        print(f"Saved {self.rows_written} records to {self.path}")
+
+    def __enter__(self) -> "ChunkedParquetWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SqliteChunkWriter:
+    """
+    Append row chunks to one SQLite table, creating it from the first row.
+
+    The caller owns the connection (and therefore the transaction/commit).
+    """
+
+    def __init__(self, conn: sqlite3.Connection, table_name: str):
+        self.conn = conn
+        self.table_name = table_name
+        self.rows_written = 0
+        self._columns: Optional[List[str]] = None
+        self._insert_sql: Optional[str] = None
+        self._row_values = None
+
+    def write(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        if self._columns is None:
+            self._create(rows[0])
+        self.conn.executemany(self._insert_sql, map(self._row_values, rows))
+        self.rows_written += len(rows)
+
+    def _create(self, first: Dict) -> None:
+        columns = []
+        for key, value in first.items():
+            if isinstance(value, int):
+                col_type = "INTEGER"
+            elif isinstance(value, float):
+                col_type = "REAL"
+            elif isinstance(value, datetime):
+                col_type = "TIMESTAMP"
+            else:
+                col_type = "TEXT"
+            columns.append(f"{key} {col_type}")
+
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table_name} ({', '.join(columns)})")
+        self._columns = list(first.keys())
+        # Column order is fixed once; every row becomes a tuple without per-row key lookups
+        getter = itemgetter(*self._columns)
+        self._row_values = getter if len(self._columns) > 1 else (lambda r: (getter(r),))
+        placeholders = ", ".join("?" for _ in self._columns)
+        self._insert_sql = f"INSERT INTO {self.table_name} VALUES ({placeholders})"
+
+
+class SqliteBulkLoader:
+    """
+    Build a fresh SQLite database in one transaction.
+
+    The file is recreated, durability is traded for speed while it is built
+    (no rollback journal, no fsync: a crashed build is simply regenerated),
+    rows go in through executemany, and primary-key indexes are created once
+    all rows are loaded. Nothing is visible until close() commits.
+    """
+
+    def __init__(self, db_path: str, page_size: int = SQLITE_PAGE_SIZE):
+        self.db_path = db_path
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+        # Autocommit mode: the transaction is managed explicitly below
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.conn.execute(f"PRAGMA page_size={int(page_size)}")
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+        self.conn.execute("BEGIN")
+        self._writers: Dict[str, SqliteChunkWriter] = {}
+        self._closed = False
+
+    def writer(self, table_name: str) -> SqliteChunkWriter:
+        """Chunk writer for table_name (one per table, created on first use)."""
+        if table_name not in self._writers:
+            self._writers[table_name] = SqliteChunkWriter(self.conn, table_name)
+        return self._writers[table_name]
+
+    def write(self, table_name: str, rows: List[Dict]) -> None:
+        self.writer(table_name).write(rows)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        for table_name, writer in self._writers.items():
+            pk = SQLITE_PRIMARY_KEYS.get(table_name)
+            if pk and writer.rows_written:
+                self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table_name}_{pk} ON {table_name} ({pk})")
+        self.conn.execute("COMMIT")
+        self.conn.close()
+        self._closed = True
+        print(f"Saved all data to {self.db_path}")
+
+    def __enter__(self) -> "SqliteBulkLoader":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        elif not self._closed:
+            # Leave no half-built database behind
+            self.conn.close()
+            self._closed = True
+            os.remove(self.db_path)
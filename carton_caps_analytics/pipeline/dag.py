@@ -0,0 +1,381 @@
+"""
+Small DAG executor with content-hash step caching for run_pipeline.py.
+
+Each Step declares what it depends on and what it reads and writes:
+
+- deps: steps that must succeed first
+- inputs: files/directories whose contents go into its fingerprint
+  (source code, dbt models, ...); params: any other settings (seed, flags)
+- outputs: files it writes (e.g. the generated CSVs); their hashes are
+  recorded and go into the fingerprint of downstream steps, so a step
+  re-run that produces identical files does not invalidate its consumers
+- artifacts: other per-run files (e.g. the run's DuckDB file); when the
+  step is cached they are frozen: copied into the artifact store right
+  after the step, because later steps (dbt) keep writing the run's files
+- resources: names of things only one step may use at a time (a DuckDB
+  file allows a single writer process)
+
+A step whose fingerprint matches an earlier successful run - and whose
+recorded outputs and frozen artifacts are still there, unchanged - is
+skipped and that run's outputs and artifacts are copied to this run's
+paths. Paths are compared with the run id normalized, so runs writing to
+their own directories share cache entries. Steps whose dependencies are done and
+whose resources are free run concurrently. The cache is a JSON file
+mapping step name -> fingerprint -> {run_id, outputs, artifacts}; frozen
+artifacts live in <artifact_dir>/<step>/<fingerprint>/ and are removed
+with their entry.
+
+Usage:
+    dag = Dag([Step("a", cmd_a), Step("b", cmd_b, deps=["a"])], run_id, root, cache_path)
+    results = dag.run(execute)   # execute(step) -> return code
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from locking import atomic_write_text, file_lock
+
+# Fingerprint entries kept per step (older ones are dropped)
+CACHE_ENTRIES_PER_STEP = 20
+
+# Files next to an artifact that belong to it (DuckDB's write-ahead log)
+ARTIFACT_SIDECARS = (".wal",)
+
+
+class Step:
+    def __init__(
+        self,
+        name: str,
+        cmd: List,
+        deps: Iterable[str] = (),
+        inputs: Iterable[Path] = (),
+        params: Optional[Dict] = None,
+        outputs: Iterable[Path] = (),
+        artifacts: Optional[Dict[str, Path]] = None,
+        resources: Iterable[str] = (),
+        cacheable: bool = True,
+        required: bool = True,
+        after: Optional[Callable[["Step", bool], Optional[str]]] = None,
+    ):
+        self.name = name
+        self.cmd = list(cmd)
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.params = params or {}
+        self.outputs = list(outputs)
+        self.artifacts = dict(artifacts or {})
+        self.resources = set(resources)
+        self.cacheable = cacheable
+        # A failed optional step is recorded but does not fail the run
+        self.required = required
+        # after(step, cache_hit) runs once the step succeeded; returns an error message to fail it
+        self.after = after
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _files(paths: Iterable[Path]) -> List[Path]:
+    """The files named by paths, with directories expanded."""
+    files = []
+    for path in paths:
+        listed = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        files.extend(f for f in listed if "__pycache__" not in f.parts)
+    return files
+
+
+def tree_digest(paths: Iterable[Path], root: Path) -> Dict[str, Optional[str]]:
+    """Content hash of every file under paths (files or directories), keyed by path relative to root."""
+    return {_rel(f, root): file_digest(f) if f.exists() else None for f in _files(paths)}
+
+
+def _rel(path: Path, root: Path) -> str:
+    try:
+        return path.resolve().relative_to(root.resolve()).as_posix()
+    except ValueError:
+        return path.resolve().as_posix()
+
+
+class StepCache:
+    """
+    Fingerprints of successful step runs, persisted as JSON. Pipeline runs
+    may share the file: each put re-reads it under a file lock, merges its
+    entry and replaces the file atomically.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_lock = path.with_name(path.name + ".lock")
+        self._entries = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Dict]]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, step: str, fingerprint: str) -> Optional[Dict]:
+        return self._entries.get(step, {}).get(fingerprint)
+
+    def put(self, step: str, fingerprint: str, entry: Dict) -> List[str]:
+        """Add an entry; returns the fingerprints dropped to keep CACHE_ENTRIES_PER_STEP."""
+        with self._lock, file_lock(self._file_lock):
+            # Entries other runs added since this one started are kept
+            self._entries = self._read()
+            entries = self._entries.setdefault(step, {})
+            entries.pop(fingerprint, None)
+            entries[fingerprint] = entry
+            evicted = list(entries)[:-CACHE_ENTRIES_PER_STEP]
+            for old in evicted:
+                del entries[old]
+            atomic_write_text(self.path, json.dumps(self._entries, indent=2))
+        return evicted
+
+
+def _copy_atomic(src: Path, dst: Path) -> None:
+    """Copy src to dst through a temporary file, so dst is never seen half-written."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _with_sidecars(path: Path) -> List[Path]:
+    return [path] + [path.with_name(path.name + suffix) for suffix in ARTIFACT_SIDECARS]
+
+
+class Dag:
+    def __init__(
+        self,
+        steps: List[Step],
+        run_id: str,
+        root: Path,
+        cache_path: Path,
+        use_cache: bool = True,
+        artifact_dir: Optional[Path] = None,
+    ):
+        self.steps = {s.name: s for s in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("Step names must be unique")
+        for s in steps:
+            unknown = [d for d in s.deps if d not in self.steps]
+            if unknown:
+                raise ValueError(f"Step {s.name!r} depends on unknown steps {unknown}")
+        self._check_acyclic()
+        self.run_id = run_id
+        self.root = root
+        self.cache = StepCache(cache_path)
+        self.use_cache = use_cache
+        # Frozen copies of cached steps' artifacts (default: next to the cache file)
+        self.artifact_dir = artifact_dir or cache_path.with_suffix("")
+        # Fingerprint of each step that succeeded in this run (None: not cacheable)
+        self.fingerprints: Dict[str, Optional[str]] = {}
+        self._output_digests: Dict[str, Dict[str, Optional[str]]] = {}
+
+    def _check_acyclic(self) -> None:
+        state: Dict[str, int] = {}
+
+        def visit(name: str, path: List[str]) -> None:
+            if state.get(name) == 1:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            if state.get(name) == 2:
+                return
+            state[name] = 1
+            for d in self.steps[name].deps:
+                visit(d, path + [name])
+            state[name] = 2
+
+        for name in self.steps:
+            visit(name, [])
+
+    # -------------------------
+    # Fingerprints
+    # -------------------------
+
+    def _normalize(self, value) -> str:
+        # Run-specific values must not change the fingerprint
+        return str(value).replace(self.run_id, "<run_id>")
+
+    def fingerprint(self, step: Step) -> Optional[str]:
+        """Hash of the step's command, params, input contents and its dependencies' results (None: not cacheable)."""
+        if not step.cacheable or any(self.fingerprints.get(d) is None for d in step.deps):
+            return None
+        upstream = {
+            # Content of a dependency's outputs where it declares them, else its fingerprint
+            d: self._output_digests[d] if self.steps[d].outputs else self.fingerprints[d]
+            for d in step.deps
+        }
+        payload = {
+            "step": step.name,
+            "cmd": [self._normalize(c) for c in step.cmd],
+            "params": {k: self._normalize(v) for k, v in sorted(step.params.items())},
+            "inputs": tree_digest(step.inputs, self.root),
+            "upstream": upstream,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+
+    def _output_files(self, step: Step) -> Dict[str, Path]:
+        """The step's output files keyed by path relative to root, run id normalized (equal across runs)."""
+        return {self._normalize(_rel(f, self.root)): f for f in _files(step.outputs)}
+
+    def _output_digests_of(self, step: Step) -> Dict[str, Optional[str]]:
+        return {key: file_digest(f) if f.exists() else None for key, f in self._output_files(step).items()}
+
+    def _reusable(self, step: Step, entry: Dict) -> bool:
+        """The cached run's outputs are still there, unchanged, and so are its artifacts."""
+        if set(entry["outputs"]) != set(self._output_files(step)) or set(entry["artifacts"]) != set(step.artifacts):
+            return False
+        for key, digest in entry["outputs"].items():
+            src = entry.get("output_paths", {}).get(key)
+            if src is None:
+                return False
+            if digest is not None and (not Path(src).exists() or file_digest(Path(src)) != digest):
+                return False
+        # Only frozen artifacts: an entry pointing at another run's live files is not reused
+        store = self.artifact_dir.resolve()
+        return all(Path(p).exists() and Path(p).resolve().is_relative_to(store) for p in entry["artifacts"].values())
+
+    def _restore(self, step: Step, entry: Dict) -> None:
+        """Copy the cached run's outputs and frozen artifacts to this run's paths."""
+        outputs = self._output_files(step)
+        pairs = [(entry["output_paths"][k], outputs[k]) for k, digest in entry["outputs"].items() if digest is not None]
+        for name, src in entry["artifacts"].items():
+            pairs += [(s, d) for s, d in zip(_with_sidecars(Path(src)), _with_sidecars(step.artifacts[name]))
+                      if s.exists()]
+        for src, dst in pairs:
+            if Path(src).resolve() != dst.resolve():
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(src, dst)
+
+    def _freeze(self, step: Step, fingerprint: str) -> Dict[str, str]:
+        """
+        Copy the step's artifacts into the artifact store as they are now.
+        Later steps of this run may keep writing the originals (dbt writes
+        the DuckDB file), so another run must not copy those.
+        """
+        frozen = {}
+        for name, path in step.artifacts.items():
+            dst = self.artifact_dir / step.name / fingerprint / f"{name}{''.join(path.suffixes)}"
+            for src, target in zip(_with_sidecars(path), _with_sidecars(dst)):
+                if src.exists():
+                    _copy_atomic(src, target)
+                elif src != path and target.exists():
+                    target.unlink()
+            frozen[name] = str(dst)
+        return frozen
+
+    # -------------------------
+    # Execution
+    # -------------------------
+
+    def _run_step(self, step: Step, execute: Callable[[Step], int]) -> Dict:
+        result = {"name": step.name, "cmd": [str(c) for c in step.cmd], "deps": step.deps}
+        s0 = time.time()
+        fingerprint = self.fingerprint(step)
+        result["fingerprint"] = fingerprint
+        entry = self.cache.get(step.name, fingerprint) if fingerprint and self.use_cache else None
+
+        if entry is not None and self._reusable(step, entry) and self._try_restore(step, entry):
+            result.update(cache="hit", reused_from=entry["run_id"], return_code=None)
+        else:
+            result["cache"] = "uncacheable" if fingerprint is None else "miss" if self.use_cache else "disabled"
+            try:
+                result["return_code"] = execute(step)
+            except Exception as e:  # e.g. the command is not installed
+                result.update(return_code=None, error=f"{type(e).__name__}: {e}")
+
+        ok = result["return_code"] == 0 or result["cache"] == "hit"
+        if ok and step.after is not None:
+            error = step.after(step, result["cache"] == "hit")
+            if error:
+                ok = False
+                result["error"] = error
+        self._output_digests[step.name] = self._output_digests_of(step) if ok else {}
+        self.fingerprints[step.name] = fingerprint if ok else None
+        if ok and fingerprint and result["cache"] != "hit":
+            self._cache_put(step, fingerprint, result)
+        result["status"] = "success" if ok else "failed"
+        result["duration_seconds"] = round(time.time() - s0, 3)
+        return result
+
+    def _try_restore(self, step: Step, entry: Dict) -> bool:
+        # The entry may be evicted (and its frozen files removed) by another run meanwhile
+        try:
+            self._restore(step, entry)
+        except OSError:
+            # The step runs instead; it must not start from a partly copied file
+            for path in step.artifacts.values():
+                for f in _with_sidecars(path):
+                    f.unlink(missing_ok=True)
+            return False
+        return True
+
+    def _cache_put(self, step: Step, fingerprint: str, result: Dict) -> None:
+        try:
+            artifacts = self._freeze(step, fingerprint)
+        except OSError as e:  # e.g. disk full: the step stays done, just not cached
+            result["cache_error"] = f"{type(e).__name__}: {e}"
+            return
+        evicted = self.cache.put(step.name, fingerprint, {
+            "run_id": self.run_id,
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "outputs": self._output_digests[step.name],
+            "output_paths": {k: str(f.resolve()) for k, f in self._output_files(step).items()},
+            "artifacts": artifacts,
+        })
+        for old in evicted:
+            shutil.rmtree(self.artifact_dir / step.name / old, ignore_errors=True)
+
+    def run(self, execute: Callable[[Step], int], max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Run every step once its dependencies succeeded and its resources are
+        free. After a required step fails no new steps start; steps that
+        never ran are reported with status "not_run". Results are in
+        completion order.
+        """
+        pending = dict(self.steps)
+        done: Dict[str, str] = {}
+        busy: set = set()
+        results: List[Dict] = []
+        failed = False
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.steps)) as pool:
+            running = {}
+            while pending or running:
+                if not failed:
+                    for name, step in list(pending.items()):
+                        if any(done.get(d) is None for d in step.deps) or step.resources & busy:
+                            continue
+                        if any(done[d] != "success" for d in step.deps):
+                            continue
+                        del pending[name]
+                        busy |= step.resources
+                        running[pool.submit(self._run_step, step, execute)] = step
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    busy -= step.resources
+                    result = future.result()
+                    results.append(result)
+                    done[step.name] = result["status"]
+                    if result["status"] != "success" and step.required:
+                        failed = True
+        for name, step in pending.items():
+            results.append({"name": name, "cmd": [str(c) for c in step.cmd], "deps": step.deps, "status": "not_run"})
+        return results
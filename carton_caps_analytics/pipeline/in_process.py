@@ -0,0 +1,215 @@
+"""
+In-process execution of pipeline steps (run_pipeline.py --execution in-process).
+
+A subprocess step pays for a fresh interpreter, its imports and, for dbt, a
+project parse and manifest load every time. Here the generator, loader and
+schema snapshot modules are imported once and their main(argv) called as
+functions, and dbt runs through its programmatic runner (dbtRunner). The
+project is parsed once per pipeline run (into the run's own target path)
+and every dbt invocation reuses that manifest.
+
+Output is streamed into the pipeline log with the step's prefix: print()
+from a step is routed per thread, and dbt's events arrive through a
+callback (dbt's own console logging is switched off).
+
+Each call reports startup (imports, dbt parse) separately from the step's
+work, so the two execution modes can be compared in the run manifest.
+
+Usage:
+    runner = InProcessRunner(root, log_fp, log_lock, dbt_args=["--profiles-dir", ..., "--project-dir", ...])
+    with runner.routing_output():
+        rc, timing = runner.run([python, "duckdb/load_raw.py", run_id], prefix="[load] ")
+"""
+
+from __future__ import annotations
+
+import contextlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Scripts that can run in-process (path relative to the repo root -> module name)
+SCRIPT_MODULES = {
+    "generator/data_generator.py": "data_generator",
+    "duckdb/load_raw.py": "load_raw",
+    "pipeline/schema_snapshot.py": "schema_snapshot",
+}
+
+# dbt event levels written to the pipeline log
+DBT_LOG_LEVELS = ("info", "warn", "error")
+
+
+class _LineWriter:
+    """File-like object writing complete lines to the log, each with the step's prefix."""
+
+    def __init__(self, log_fp, prefix: str, lock: threading.Lock):
+        self.log_fp = log_fp
+        self.prefix = prefix
+        self.lock = lock
+        self._partial = ""
+
+    def write(self, text: str) -> int:
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        if lines:
+            with self.lock:
+                for line in lines:
+                    self.log_fp.write(f"{self.prefix}{line}\n")
+                self.log_fp.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self._partial:
+            self.write("\n")
+
+
+class _ThreadRouter:
+    """Stand-in for sys.stdout/sys.stderr sending each thread's output to that thread's step."""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def to(self, writer: _LineWriter):
+        self._local.writer = writer
+        try:
+            yield
+        finally:
+            writer.flush()
+            self._local.writer = None
+
+    def _target(self):
+        return getattr(self._local, "writer", None) or self.fallback
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def isatty(self) -> bool:
+        return False
+
+
+class InProcessRunner:
+    def __init__(self, root: Path, log_fp, log_lock: threading.Lock, dbt_args: List[str]):
+        self.root = root
+        self.log_fp = log_fp
+        self.log_lock = log_lock
+        # Project, profiles, target and log paths of this run, used for the one parse
+        self.dbt_args = [str(a) for a in dbt_args]
+        self._modules: Dict[str, object] = {}
+        self._import_lock = threading.Lock()
+        self._dbt_runner = None
+        self._dbt_writer: Optional[_LineWriter] = None
+        self._stdout: Optional[_ThreadRouter] = None
+        self._stderr: Optional[_ThreadRouter] = None
+        # Steps take paths relative to the repo root, as they do when run with cwd=ROOT
+        os.chdir(root)
+
+    @contextlib.contextmanager
+    def routing_output(self):
+        """Route print() of in-process steps into the log for the duration of the pipeline run."""
+        self._stdout, self._stderr = _ThreadRouter(sys.stdout), _ThreadRouter(sys.stderr)
+        with contextlib.redirect_stdout(self._stdout), contextlib.redirect_stderr(self._stderr):
+            yield
+
+    def run(self, cmd: List, prefix: str = "") -> Tuple[int, Dict[str, float]]:
+        """
+        Run one step command in this process. Returns its return code and
+        {"startup_seconds", "work_seconds"}; startup is the import (and dbt
+        parse) this call had to do first, zero once they are cached.
+        """
+        cmd = [str(c) for c in cmd]
+        writer = _LineWriter(self.log_fp, prefix, self.log_lock)
+        with self.log_lock:
+            self.log_fp.write(f"\n{prefix}$ (in-process) {' '.join(cmd)}\n")
+            self.log_fp.flush()
+        if cmd[0] == "dbt":
+            return self._run_dbt(cmd[1:], writer)
+        return self._run_script(cmd[1], cmd[2:], writer)
+
+    # -------------------------
+    # Python scripts
+    # -------------------------
+
+    def _script_name(self, script: str) -> str:
+        path = Path(script)
+        rel = (path if path.is_absolute() else self.root / path).resolve().relative_to(self.root.resolve())
+        if rel.as_posix() not in SCRIPT_MODULES:
+            raise ValueError(f"{rel.as_posix()} cannot run in-process; expected one of {sorted(SCRIPT_MODULES)}")
+        return rel.as_posix()
+
+    def _module(self, script: str):
+        with self._import_lock:
+            if script not in self._modules:
+                name, path = SCRIPT_MODULES[script], (self.root / script).resolve()
+                module = sys.modules.get(name)
+                if module is None or Path(getattr(module, "__file__", "")).resolve() != path:
+                    spec = importlib.util.spec_from_file_location(name, path)
+                    module = importlib.util.module_from_spec(spec)
+                    # Registered so sibling imports (e.g. incremental -> data_generator) share it
+                    sys.modules[name] = module
+                    spec.loader.exec_module(module)
+                self._modules[script] = module
+            return self._modules[script]
+
+    def _run_script(self, script: str, argv: List[str], writer: _LineWriter) -> Tuple[int, Dict[str, float]]:
+        t0 = time.perf_counter()
+        with self._stdout.to(writer), self._stderr.to(writer):
+            module = self._module(self._script_name(script))
+            t1 = time.perf_counter()
+            try:
+                rc = module.main(argv) or 0
+            except SystemExit as e:  # argparse errors, explicit exits
+                rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                traceback.print_exc()
+                rc = 1
+        t2 = time.perf_counter()
+        return rc, {"startup_seconds": round(t1 - t0, 3), "work_seconds": round(t2 - t1, 3)}
+
+    # -------------------------
+    # dbt
+    # -------------------------
+
+    def _dbt_event(self, event) -> None:
+        if event.info.level in DBT_LOG_LEVELS and self._dbt_writer is not None and event.info.msg:
+            self._dbt_writer.write(f"{event.info.msg}\n")
+
+    def _dbt_parse(self) -> None:
+        """Import dbt and parse the project once; later invocations reuse the manifest."""
+        try:
+            from dbt.cli.main import dbtRunner
+        except ImportError as e:
+            raise ImportError("--execution in-process requires dbt-core (pip install dbt-duckdb)") from e
+        parse = dbtRunner(callbacks=[self._dbt_event]).invoke(
+            ["parse"] + self.dbt_args + ["--log-level", "none"]
+        )
+        if not parse.success:
+            raise RuntimeError(f"dbt parse failed: {parse.exception}")
+        self._dbt_runner = dbtRunner(manifest=parse.result, callbacks=[self._dbt_event])
+
+    def _run_dbt(self, args: List[str], writer: _LineWriter) -> Tuple[int, Dict[str, float]]:
+        t0 = time.perf_counter()
+        self._dbt_writer = writer
+        try:
+            if self._dbt_runner is None:
+                self._dbt_parse()
+            t1 = time.perf_counter()
+            result = self._dbt_runner.invoke(args + ["--log-level", "none"])
+        finally:
+            writer.flush()
+            self._dbt_writer = None
+        t2 = time.perf_counter()
+        if result.exception is not None:
+            writer.write(f"{type(result.exception).__name__}: {result.exception}\n")
+            writer.flush()
+        rc = 0 if result.success else 2 if result.exception is not None else 1
+        return rc, {"startup_seconds": round(t1 - t0, 3), "work_seconds": round(t2 - t1, 3)}
@@ -0,0 +1,75 @@
+"""
+Cross-process locks and atomic writes for state shared by concurrent pipeline runs
+(LATEST_DB.txt, the step cache).
+
+file_lock holds an exclusive lock on a lock file: fcntl.flock on POSIX,
+msvcrt.locking on Windows, both taken without blocking and retried until
+a timeout. atomic_write_text writes a temporary file next to
+the target and renames it over the target, so readers see either the old or
+the new content, never a partial file.
+
+Usage:
+    with file_lock(DUCK_DIR / "LATEST_DB.lock"):
+        atomic_write_text(DUCK_DIR / "LATEST_DB.txt", db_filename)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# How long to wait for a lock before giving up, and how often to retry meanwhile
+LOCK_TIMEOUT_SECONDS = 600
+LOCK_RETRY_SECONDS = 0.1
+
+
+def _try_lock(f) -> bool:
+    """Take an exclusive lock on f without blocking; False if another process holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def file_lock(path: Path, timeout: float = LOCK_TIMEOUT_SECONDS):
+    """Hold an exclusive lock on path; TimeoutError if it is not free within timeout seconds."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        deadline = time.monotonic() + timeout
+        while not _try_lock(f):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for lock {path}")
+            time.sleep(LOCK_RETRY_SECONDS)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
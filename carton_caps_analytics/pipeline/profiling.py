@@ -0,0 +1,241 @@
+"""
+Per-step resource profiling for run_pipeline.py.
+
+A ResourceMonitor samples one step while it runs: a background thread reads
+the step's process tree (the step's process and every descendant) every
+SAMPLE_INTERVAL_SECONDS and records, relative to the step's start:
+
+- cpu_seconds: user + system CPU time of the tree
+- rss_bytes: resident memory of the tree at that moment
+- read_bytes / write_bytes: storage I/O of the tree
+- duckdb_bytes: size of the watched DuckDB file (+ its .wal)
+
+Counters of a process that exits between samples keep their last seen
+value. A subprocess step is reaped with os.wait4, whose rusage gives its
+exact CPU time, peak RSS and block I/O (children included), so a step
+shorter than one sample interval is still measured. An in-process step is
+sampled on the pipeline's own process, so steps running at the same time
+are attributed to each other.
+
+psutil is used when installed; otherwise /proc is read directly (Linux).
+Without either, only the DuckDB file size and the wait4 totals are
+recorded.
+
+Usage:
+    monitor = ResourceMonitor(files=[db_path])
+    monitor.start(popen.pid)
+    rc = monitor.reap(popen)
+    monitor.stop()
+    monitor.summary(wall_seconds), monitor.samples
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import psutil
+except ImportError:  # optional: fall back to /proc
+    psutil = None
+
+SAMPLE_INTERVAL_SECONDS = 0.5
+
+# bound classification of a step (see classify)
+CPU_BOUND_SHARE = 0.7          # CPU seconds per wall second at or above which a step is CPU-bound
+MEMORY_BOUND_FRACTION = 0.5    # peak RSS as a share of physical RAM at or above which it is memory-bound
+
+PROC = Path("/proc")
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# Where process counters come from (None: only file sizes and wait4 totals)
+BACKEND = "psutil" if psutil is not None else "proc" if PROC.exists() else None
+
+
+def physical_memory_bytes() -> Optional[int]:
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _proc_stat(pid: int) -> Optional[Dict]:
+    """ppid, CPU seconds and RSS of pid from /proc (None if it is gone)."""
+    try:
+        stat = (PROC / str(pid) / "stat").read_text()
+        # The command name is in parentheses and may contain spaces
+        fields = stat[stat.rindex(")") + 2:].split()
+        rss_pages = int(fields[21])
+        io = {}
+        try:
+            for line in (PROC / str(pid) / "io").read_text().splitlines():
+                key, _, value = line.partition(":")
+                io[key] = int(value)
+        except OSError:  # another user's process
+            pass
+    except (OSError, ValueError, IndexError):
+        return None
+    return {
+        "ppid": int(fields[1]),
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS,
+        "rss_bytes": rss_pages * os.sysconf("SC_PAGE_SIZE"),
+        "read_bytes": io.get("read_bytes", 0),
+        "write_bytes": io.get("write_bytes", 0),
+    }
+
+
+def _tree_stats(pid: int) -> Dict[int, Dict]:
+    """Per-process counters of pid and all its descendants."""
+    if psutil is not None:
+        stats = {}
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return stats
+        for p in procs:
+            try:
+                with p.oneshot():
+                    cpu = p.cpu_times()
+                    io = p.io_counters() if hasattr(p, "io_counters") else None
+                    stats[p.pid] = {
+                        "cpu_seconds": cpu.user + cpu.system,
+                        "rss_bytes": p.memory_info().rss,
+                        "read_bytes": io.read_bytes if io else 0,
+                        "write_bytes": io.write_bytes if io else 0,
+                    }
+            except psutil.Error:
+                continue
+        return stats
+
+    if not PROC.exists():
+        return {}
+    all_stats = {}
+    for entry in PROC.iterdir():
+        if entry.name.isdigit():
+            s = _proc_stat(int(entry.name))
+            if s is not None:
+                all_stats[int(entry.name)] = s
+    tree, frontier = {}, [pid]
+    while frontier:
+        p = frontier.pop()
+        if p in all_stats and p not in tree:
+            tree[p] = all_stats[p]
+            frontier.extend(c for c, s in all_stats.items() if s["ppid"] == p)
+    return tree
+
+
+def _file_bytes(paths: Iterable[Path]) -> int:
+    total = 0
+    for path in paths:
+        for f in (path, path.with_name(path.name + ".wal")):
+            try:
+                total += f.stat().st_size
+            except OSError:
+                pass
+    return total
+
+
+def classify(summary: Dict) -> Optional[str]:
+    """
+    What limited a step: "memory" when its peak RSS reached
+    MEMORY_BOUND_FRACTION of RAM, "cpu" when it kept at least
+    CPU_BOUND_SHARE of a core busy, else "io" (it mostly waited, on disk,
+    network or another process). None without CPU figures.
+    """
+    ram = physical_memory_bytes()
+    if ram and summary.get("peak_rss_bytes") and summary["peak_rss_bytes"] >= MEMORY_BOUND_FRACTION * ram:
+        return "memory"
+    if summary.get("cpu_seconds") is None or not summary.get("wall_seconds"):
+        return None
+    return "cpu" if summary["cpu_seconds"] >= CPU_BOUND_SHARE * summary["wall_seconds"] else "io"
+
+
+class ResourceMonitor:
+    def __init__(self, files: Iterable[Path] = (), interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.files = [Path(f) for f in files]
+        self.interval = interval
+        self.samples: List[Dict] = []
+        self._pid: Optional[int] = None
+        self._last: Dict[int, Dict] = {}
+        self._baseline: Dict[str, float] = {}
+        self._rusage = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._t0 = 0.0
+        self._files_before = 0
+
+    def start(self, pid: int) -> None:
+        """Sample pid's process tree until stop(); counters start from their current values."""
+        self._pid = pid
+        self._t0 = time.perf_counter()
+        self._files_before = _file_bytes(self.files)
+        tree = _tree_stats(pid)
+        # An in-process step starts on a process that has already used CPU and done I/O
+        self._baseline = {k: sum(s[k] for s in tree.values()) for k in ("cpu_seconds", "read_bytes", "write_bytes")}
+        self._last = dict(tree)
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name=f"resource-monitor-{pid}", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        tree = _tree_stats(self._pid)
+        self._last.update(tree)
+        sample = {"t": round(time.perf_counter() - self._t0, 3)}
+        if self._last:
+            for key in ("cpu_seconds", "read_bytes", "write_bytes"):
+                total = sum(s[key] for s in self._last.values()) - self._baseline.get(key, 0)
+                sample[key] = round(max(total, 0), 3) if key == "cpu_seconds" else max(int(total), 0)
+            sample["rss_bytes"] = sum(s["rss_bytes"] for s in tree.values())
+        sample["duckdb_bytes"] = _file_bytes(self.files)
+        self.samples.append(sample)
+
+    def reap(self, popen) -> int:
+        """Wait for a subprocess and keep its rusage (its own and its waited-for children's)."""
+        if not hasattr(os, "wait4"):
+            return popen.wait()
+        _pid, status, self._rusage = os.wait4(popen.pid, 0)
+        popen.returncode = os.waitstatus_to_exitcode(status)
+        return popen.returncode
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+
+    def summary(self, wall_seconds: float) -> Dict:
+        """Totals of the step: CPU, peak RSS, bytes read/written, DuckDB growth and what bound it."""
+        measured = [s for s in self.samples if "cpu_seconds" in s]
+        last = measured[-1] if measured else {}
+        out = {
+            "wall_seconds": round(wall_seconds, 3),
+            "cpu_seconds": last.get("cpu_seconds"),
+            "peak_rss_bytes": max((s["rss_bytes"] for s in measured), default=None),
+            "read_bytes": last.get("read_bytes"),
+            "write_bytes": last.get("write_bytes"),
+            "duckdb_growth_bytes": _file_bytes(self.files) - self._files_before if self.files else None,
+        }
+        if self._rusage is not None:
+            r = self._rusage
+            # Linux reports ru_maxrss in KiB, macOS in bytes; blocks are 512 bytes
+            maxrss = r.ru_maxrss if sys.platform == "darwin" else r.ru_maxrss * 1024
+            out["cpu_seconds"] = round(max(r.ru_utime + r.ru_stime, out["cpu_seconds"] or 0), 3)
+            out["peak_rss_bytes"] = max(maxrss, out["peak_rss_bytes"] or 0)
+            out["read_bytes"] = max(r.ru_inblock * 512, out["read_bytes"] or 0)
+            out["write_bytes"] = max(r.ru_oublock * 512, out["write_bytes"] or 0)
+        out["cpu_utilization"] = (
+            round(out["cpu_seconds"] / wall_seconds, 2) if out["cpu_seconds"] is not None and wall_seconds > 0 else None
+        )
+        out["bound"] = classify(out)
+        return out
@@ -1,30 +1,99 @@
+import argparse
+import contextlib
 import json
+import os
 import subprocess
 import sys
+import tempfile
+import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 import shutil
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "pipeline"))
+
+from dag import Dag, Step
+from in_process import InProcessRunner
+from locking import atomic_write_text, file_lock
+from profiling import BACKEND as PROFILING_BACKEND, SAMPLE_INTERVAL_SECONDS, ResourceMonitor
+
 LOG_DIR = ROOT / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 
 DUCK_DIR = ROOT / "duckdb"
 DUCK_DIR.mkdir(exist_ok=True)
 LATEST_PTR = DUCK_DIR / "LATEST_DB.txt"
+# Run id and start time of the run LATEST_DB.txt points at; both change together under LATEST_LOCK
+LATEST_RUN = DUCK_DIR / "LATEST_RUN.json"
+LATEST_LOCK = DUCK_DIR / "LATEST_DB.lock"
 
 DBT_PROJECT_DIR = ROOT / "dbt_carton_caps"
-DBT_PROFILES_DIR = DBT_PROJECT_DIR          # profiles.yml is stored here
-DBT_PROFILES_YML = DBT_PROFILES_DIR / "profiles.yml"
-DBT_TARGET = DBT_PROJECT_DIR / "target"
-DBT_RUN_RESULTS = DBT_TARGET / "run_results.json"
-DBT_MANIFEST = DBT_TARGET / "manifest.json"
+# The project's profiles.yml points at the published (latest) DuckDB file, for running dbt by hand;
+# pipeline runs use their own profiles dir
+DBT_PROFILES_DIR = DBT_PROJECT_DIR
+
+# Every run works in its own directory, so runs can overlap:
+#   runs/<run_id>/data/          generated files (and generator_state.json)
+#   runs/<run_id>/dbt/           profiles.yml for this run's DuckDB file
+#   runs/<run_id>/dbt/target/    dbt artifacts; runs/<run_id>/dbt/logs/ dbt.log
+RUNS_DIR = ROOT / "runs"
 
 SCHEMA_SNAPSHOT_SCRIPT = ROOT / "pipeline" / "schema_snapshot.py"
 
 PYTHON = sys.executable or "python"
 
+# files: generate CSV/Parquet/SQLite, then load_raw parses the files
+# arrow: load_raw runs the generator in-process and ingests Arrow batches (no files)
+# sqlite: generate, then load_raw extracts from the generated SQLite database
+INGEST_MODES = ("files", "arrow", "sqlite")
+
+# snapshot: raw.* of a full files run are views over shared Parquet snapshots in
+# duckdb/store, so runs with unchanged source files store and rebuild nothing
+# tables: every run copies raw.* into its own DuckDB file
+RAW_LAYOUTS = ("snapshot", "tables")
+# Snapshots written hive-partitioned (events by event_date/event_type), so the
+# dashboards' date-range queries only read the partitions in range
+DEFAULT_RAW_PARTITION = "events"
+
+# Codec of the generated CSVs (generator --csv-compression) -> file suffix; load_raw reads any of them
+CSV_COMPRESSIONS = {"none": ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}
+
+# Written by every full files run into its data dir; --incremental generates the next slice
+# from the published run's state (older runs kept it in data/)
+GENERATOR_STATE = "generator_state.json"
+LEGACY_GENERATOR_STATE = ROOT / "data" / GENERATOR_STATE
+
+# Fingerprints of successful steps; a step whose inputs are unchanged reuses the earlier result
+STEP_CACHE = LOG_DIR / "step_cache.json"
+# Frozen copies of cached steps' artifacts (the DuckDB file as the step left it), per step and fingerprint
+STEP_CACHE_ARTIFACTS = LOG_DIR / "step_cache"
+
+CONTRACTS = ROOT / "contracts" / "raw_schemas.json"
+GENERATOR_CODE = sorted((ROOT / "generator").glob("*.py"))
+LOADER_CODE = [ROOT / "duckdb" / "load_raw.py", CONTRACTS]
+# Files that change what dbt builds (not target/, logs/ or the per-run profiles.yml)
+DBT_SOURCES = [DBT_PROJECT_DIR / "dbt_project.yml"] + [
+    DBT_PROJECT_DIR / d for d in ("models", "tests", "macros", "seeds", "snapshots")
+    if (DBT_PROJECT_DIR / d).exists()
+]
+RAW_TABLES = list(json.loads(CONTRACTS.read_text(encoding="utf-8"))["tables"])
+SQLITE_SOURCE = "carton_caps_generated.db"
+
+# One process at a time may open a DuckDB file read-write
+DUCKDB_RESOURCE = "duckdb"
+
+# full: dbt build, then dbt test
+# state: dbt build --select state:modified+ against the last successful run's manifest,
+# deferring unchanged models to that run's DuckDB; tests run once, inside the build
+DBT_SELECT_MODES = ("full", "state")
+DBT_STATE_SELECTOR = "state:modified+"
+
+# subprocess: every step is its own process (interpreter start, imports, dbt parse each time)
+# in-process: steps are called as functions and dbt runs via dbtRunner on a manifest parsed once
+EXECUTION_MODES = ("subprocess", "in-process")
+
 
 def utc_run_id() -> str:
     return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
@@ -34,9 +103,15 @@ def utc_iso() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
-def run(cmd, log_fp):
-    log_fp.write(f"\n$ {' '.join(map(str, cmd))}\n")
-    log_fp.flush()
+def run(cmd, log_fp, prefix="", log_lock=None, monitor=None):
+    """
+    Run cmd, streaming its output into log_fp (each line prefixed, so concurrent steps can be told apart).
+    A ResourceMonitor samples the process tree while it runs.
+    """
+    log_lock = log_lock or threading.Lock()
+    with log_lock:
+        log_fp.write(f"\n{prefix}$ {' '.join(map(str, cmd))}\n")
+        log_fp.flush()
     p = subprocess.Popen(
         list(map(str, cmd)),
         cwd=str(ROOT),
@@ -44,12 +119,19 @@ def run(cmd, log_fp):
         stderr=subprocess.STDOUT,
         text=True,
     )
+    if monitor is not None:
+        monitor.start(p.pid)
     lines = []
-    for line in p.stdout:
-        lines.append(line)
-        log_fp.write(line)
-        log_fp.flush()
-    rc = p.wait()
+    try:
+        for line in p.stdout:
+            lines.append(line)
+            with log_lock:
+                log_fp.write(prefix + line)
+                log_fp.flush()
+        rc = monitor.reap(p) if monitor is not None else p.wait()
+    finally:
+        if monitor is not None:
+            monitor.stop()
     return rc, "".join(lines)
 
 
@@ -63,9 +145,17 @@ def safe_copy(src: Path, dst: Path):
     return False
 
 
-def write_profiles_for_db(db_path_abs: Path):
+def _archive(cache_hit: bool, src: Path, dst: Path):
+    """Copy a dbt target/ artifact into logs/ after the step ran (a cache hit restored it already)."""
+    if not cache_hit and not safe_copy(src, dst):
+        return f"dbt did not write {src}"
+    return None
+
+
+def write_profiles_for_db(db_path_abs: Path, profiles_dir: Path, attach_db: Path = None):
     """
-    Write dbt profiles.yml using an ABSOLUTE path (prevents Windows path resolution issues).
+    Write dbt profiles.yml into profiles_dir using an ABSOLUTE path (prevents Windows path resolution issues).
+    attach_db is attached read-only under its own name, so relations deferred to that run resolve.
     """
     db_path = db_path_abs.as_posix()
     content = f"""dbt_carton_caps:
@@ -76,11 +166,119 @@ def write_profiles_for_db(db_path_abs: Path):
       path: {db_path}
       threads: 4
 """
-    DBT_PROFILES_YML.write_text(content, encoding="utf-8")
+    if attach_db is not None:
+        content += f"""      attach:
+        - path: {attach_db.as_posix()}
+          alias: {attach_db.stem}
+          read_only: true
+"""
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(profiles_dir / "profiles.yml", content)
+
+
+def latest_run_dir():
+    """runs/<run_id> of the DuckDB file LATEST_DB.txt points at (None if there is none)."""
+    name = LATEST_PTR.read_text(encoding="utf-8").strip() if LATEST_PTR.exists() else ""
+    if not name.startswith("carton_caps_") or not name.endswith(".duckdb"):
+        return None
+    return RUNS_DIR / name[len("carton_caps_"):-len(".duckdb")]
+
+
+def publish_latest(manifest: dict) -> dict:
+    """
+    Point LATEST_DB.txt (and the project's profiles.yml) at this run's DuckDB
+    file, unless a run that started later has already been published: with
+    overlapping runs the newest successful one wins, whatever order they finish in.
+    """
+    with file_lock(LATEST_LOCK):
+        try:
+            current = json.loads(LATEST_RUN.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            current = {}
+        if current.get("started_at_utc", "") > manifest["started_at_utc"]:
+            return {"published": False, "superseded_by": current.get("run_id")}
+        atomic_write_text(LATEST_RUN, json.dumps(
+            {"run_id": manifest["run_id"], "started_at_utc": manifest["started_at_utc"],
+             "duckdb_file": manifest["duckdb_file"]}, indent=2))
+        atomic_write_text(LATEST_PTR, manifest["duckdb_file"])
+        write_profiles_for_db(DUCK_DIR / manifest["duckdb_file"], DBT_PROFILES_DIR)
+    return {"published": True}
+
+
+def last_successful_run(exclude_run_id: str):
+    """
+    Manifest of the most recently finished successful run whose saved dbt
+    manifest and DuckDB file are still on disk (None if there is none).
+    """
+    runs = []
+    for path in LOG_DIR.glob("pipeline_*.json"):
+        try:
+            m = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            continue
+        if m.get("status") != "success" or m.get("run_id") == exclude_run_id:
+            continue
+        if not m.get("duckdb_file") or not (DUCK_DIR / m["duckdb_file"]).exists():
+            continue
+        if not (LOG_DIR / f"dbt_manifest_{m['run_id']}.json").exists():
+            continue
+        runs.append(m)
+    return max(runs, key=lambda m: m.get("ended_at_utc", ""), default=None)
+
+
+def _mtime(path: Path):
+    return path.stat().st_mtime_ns if path.exists() else None
+
+
+def reported_work(step_name: str, load_report: Path, dbt_run_results: Path):
+    """(report file, key) where a step records the seconds of work it did itself, else (None, None)."""
+    return {
+        "load_duckdb_raw": (load_report, "wall_seconds"),
+        "dbt_build": (dbt_run_results, "elapsed_time"),
+        "dbt_test": (dbt_run_results, "elapsed_time"),
+    }.get(step_name, (None, None))
+
+
+def _step_fingerprint(manifest: dict, name: str):
+    return next((s.get("fingerprint") for s in manifest.get("steps", []) if s["name"] == name), None)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run generate -> load -> dbt for one pipeline run.")
+    parser.add_argument("run_id", nargs="?", default="")
+    parser.add_argument("--ingest", choices=INGEST_MODES, default="files",
+                        help="files (default), arrow: load straight from the generator, skipping data files, "
+                             "or sqlite: extract from the generated SQLite database")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Generate only the next time slice and merge it into a copy of the latest run's DuckDB")
+    parser.add_argument("--scale-factor", default="1",
+                        help="Generator scale factor for a full run, e.g. 10 or SF10 (default 1)")
+    parser.add_argument("--raw-layout", choices=RAW_LAYOUTS, default="snapshot",
+                        help="How a full files run stores raw.* (default: shared snapshots)")
+    parser.add_argument("--csv-compression", choices=tuple(CSV_COMPRESSIONS), default="none",
+                        help="Write the generated CSVs as .csv.gz or .csv.zst (files ingest)")
+    parser.add_argument("--raw-partition", default=DEFAULT_RAW_PARTITION,
+                        help="Comma-separated tables whose snapshot is hive-partitioned, e.g. events,purchases; "
+                             f"'' for none (--raw-layout snapshot; default {DEFAULT_RAW_PARTITION})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Run every step even when an earlier run had the same inputs")
+    parser.add_argument("--execution", choices=EXECUTION_MODES, default="subprocess",
+                        help="in-process: call the generator/loader as functions and run dbt via dbtRunner, "
+                             "parsing the project once")
+    parser.add_argument("--dbt-select", choices=DBT_SELECT_MODES, default="full",
+                        help="full: dbt build + dbt test; state: build only models changed since the last "
+                             f"successful run ({DBT_STATE_SELECTOR}), deferring the rest to its DuckDB")
+    args = parser.parse_args(argv)
+    if args.incremental and args.ingest != "files":
+        parser.error("--incremental needs --ingest files")
+    if args.incremental and args.scale_factor != "1":
+        parser.error("--scale-factor sizes a full run; --incremental continues the published run's data")
+    return args
 
 
 def main():
-    run_id = sys.argv[1].strip() if len(sys.argv) >= 2 and sys.argv[1].strip() else utc_run_id()
+    args = parse_args()
+    run_id = args.run_id.strip() or utc_run_id()
 
     log_path = LOG_DIR / f"pipeline_{run_id}.log"
     manifest_path = LOG_DIR / f"pipeline_{run_id}.json"
@@ -88,81 +286,259 @@ def main():
     db_filename = f"carton_caps_{run_id}.duckdb"
     db_path_abs = DUCK_DIR / db_filename
 
-    steps = [
-        {"name": "generate_data", "cmd": [PYTHON, "generator/data_generator.py"]},
-        {"name": "load_duckdb_raw", "cmd": [PYTHON, "duckdb/load_raw.py", run_id]},
-        {
-            "name": "dbt_build",
-            "cmd": ["dbt", "build", "--profiles-dir", str(DBT_PROFILES_DIR), "--project-dir", str(DBT_PROJECT_DIR)],
-        },
-        {
-            "name": "dbt_test",
-            "cmd": ["dbt", "test", "--profiles-dir", str(DBT_PROFILES_DIR), "--project-dir", str(DBT_PROJECT_DIR)],
-        },
-    ]
+    load_report = LOG_DIR / f"load_raw_{run_id}.json"
+    run_results_copy = LOG_DIR / f"run_results_{run_id}.json"
+    dbt_manifest_copy = LOG_DIR / f"dbt_manifest_{run_id}.json"
+    schema_snapshot_path = LOG_DIR / f"schema_{run_id}.json"
+
+    # This run's own workspace (see RUNS_DIR): nothing in it is shared with overlapping runs
+    run_dir = RUNS_DIR / run_id
+    run_data = run_dir / "data"
+    dbt_dir = run_dir / "dbt"
+    dbt_target = dbt_dir / "target"
+    dbt_run_results, dbt_manifest = dbt_target / "run_results.json", dbt_target / "manifest.json"
+    run_state = run_data / GENERATOR_STATE
+    run_data.mkdir(parents=True, exist_ok=True)
+
+    def rel(path: Path) -> str:
+        return path.relative_to(ROOT).as_posix()
 
     manifest = {
         "run_id": run_id,
         "python_executable": PYTHON,
         "duckdb_file": db_filename,
         "duckdb_path": str(db_path_abs),
+        "ingest_mode": args.ingest,
+        "load_mode": "incremental" if args.incremental else "full",
+        "scale_factor": None if args.incremental else args.scale_factor,
+        "csv_compression": args.csv_compression if args.ingest == "files" else None,
+        "raw_layout": args.raw_layout if args.ingest == "files" and not args.incremental else "tables",
+        "dbt_select": args.dbt_select,
+        "execution": args.execution,
+        "run_dir": str(run_dir),
         "started_at_utc": utc_iso(),
         "steps": [],
         "status": "running",
     }
 
+    def loaded(step, cache_hit):
+        if not db_path_abs.exists():
+            return f"expected DuckDB file not found at {db_path_abs}"
+        # Per-table load timings written by load_raw.py (the earlier run's on a cache hit)
+        if load_report.exists():
+            manifest["load_raw"] = json.loads(load_report.read_text(encoding="utf-8"))
+        return None
+
+    # generate_data writes these into the run's data dir; load and dbt re-run only when their content changes
+    generated = [run_data / f"{t}{CSV_COMPRESSIONS[args.csv_compression]}" for t in RAW_TABLES]
+    generated += [run_data / SQLITE_SOURCE, run_state]
+
+    load_artifacts = {"duckdb": db_path_abs, "load_report": load_report}
+    # Part of the generating step's command, so a different scale factor is a cache miss
+    scale = ["--scale-factor", args.scale_factor]
+    if args.ingest == "arrow":
+        ingest_steps = [
+            Step("load_duckdb_raw", [PYTHON, "duckdb/load_raw.py", run_id, "--source", "generator"] + scale,
+                 inputs=GENERATOR_CODE + LOADER_CODE, artifacts=load_artifacts,
+                 resources=[DUCKDB_RESOURCE], after=loaded),
+        ]
+    elif args.ingest == "sqlite":
+        ingest_steps = [
+            Step("generate_data", [PYTHON, "generator/data_generator.py", "--output-dir", rel(run_data),
+                                   "--save-state", rel(run_state)] + scale,
+                 inputs=GENERATOR_CODE + [CONTRACTS], outputs=generated),
+            Step("load_duckdb_raw", [PYTHON, "duckdb/load_raw.py", run_id, "--source", "sqlite",
+                                     "--sqlite-db", rel(run_data / SQLITE_SOURCE), "--data-dir", rel(run_data),
+                                     "--compare-sources"],
+                 deps=["generate_data"], inputs=LOADER_CODE, artifacts=load_artifacts,
+                 resources=[DUCKDB_RESOURCE], after=loaded),
+        ]
+    elif args.incremental:
+        # Starts from the published run: its DuckDB file and a copy of its generator state, which
+        # this run advances. Reads the pointer once, so a run published meanwhile does not change it
+        base_dir = latest_run_dir()
+        base_state = base_dir / "data" / GENERATOR_STATE if base_dir is not None else None
+        if base_state is None or not base_state.exists():
+            base_state = LEGACY_GENERATOR_STATE
+        if base_dir is None or not base_state.exists():
+            raise SystemExit("--incremental needs a published full files run (its generator_state.json)")
+        shutil.copyfile(base_state, run_state)
+        base_db = DUCK_DIR / f"carton_caps_{base_dir.name}.duckdb"
+        manifest["base_db"] = str(base_db)
+        slice_dir = rel(run_data / "slice")
+        ingest_steps = [
+            Step("generate_data", [PYTHON, "generator/data_generator.py", "--next-slice", rel(run_state),
+                                   "--output-dir", slice_dir, "--csv-compression", args.csv_compression],
+                 cacheable=False),
+            Step("load_duckdb_raw", [PYTHON, "duckdb/load_raw.py", run_id, "--incremental", "--data-dir", slice_dir,
+                                     "--base-db", str(base_db)],
+                 deps=["generate_data"], artifacts=load_artifacts, resources=[DUCKDB_RESOURCE], after=loaded),
+        ]
+    else:
+        load_cmd = [PYTHON, "duckdb/load_raw.py", run_id, "--data-dir", rel(run_data), "--layout", args.raw_layout]
+        if args.raw_layout == "snapshot" and args.raw_partition:
+            load_cmd += ["--partition", args.raw_partition]
+        ingest_steps = [
+            Step("generate_data", [PYTHON, "generator/data_generator.py", "--output-dir", rel(run_data),
+                                   "--save-state", rel(run_state), "--csv-compression", args.csv_compression]
+                 + scale,
+                 inputs=GENERATOR_CODE + [CONTRACTS], outputs=generated),
+            Step("load_duckdb_raw", load_cmd, deps=["generate_data"], inputs=LOADER_CODE,
+                 artifacts=load_artifacts, resources=[DUCKDB_RESOURCE], after=loaded),
+        ]
+
+    dbt_args = ["--profiles-dir", str(dbt_dir), "--project-dir", str(DBT_PROJECT_DIR),
+                "--target-path", str(dbt_target), "--log-path", str(dbt_dir / "logs")]
+    if args.dbt_select == "state":
+        # dbt build runs the tests of every model it builds, so there is no separate dbt test
+        steps = ingest_steps + [
+            Step("dbt_build", ["dbt", "build"] + dbt_args, deps=["load_duckdb_raw"], inputs=DBT_SOURCES,
+                 params={"dbt_select": args.dbt_select},
+                 artifacts={"duckdb": db_path_abs, "dbt_manifest": dbt_manifest_copy, "run_results": run_results_copy},
+                 resources=[DUCKDB_RESOURCE],
+                 after=lambda step, hit: (_archive(hit, dbt_manifest, dbt_manifest_copy)
+                                          or _archive(hit, dbt_run_results, run_results_copy))),
+        ]
+    else:
+        steps = ingest_steps + [
+            Step("dbt_build", ["dbt", "build"] + dbt_args, deps=["load_duckdb_raw"], inputs=DBT_SOURCES,
+                 artifacts={"duckdb": db_path_abs, "dbt_manifest": dbt_manifest_copy},
+                 resources=[DUCKDB_RESOURCE], after=lambda step, hit: _archive(hit, dbt_manifest, dbt_manifest_copy)),
+            Step("dbt_test", ["dbt", "test"] + dbt_args, deps=["dbt_build"],
+                 artifacts={"run_results": run_results_copy},
+                 resources=[DUCKDB_RESOURCE], after=lambda step, hit: _archive(hit, dbt_run_results, run_results_copy)),
+        ]
+    if SCHEMA_SNAPSHOT_SCRIPT.exists():
+        # Read-only and not on this run's DuckDB file, so it runs alongside dbt_test; best effort
+        steps.append(Step("schema_snapshot", [PYTHON, str(SCHEMA_SNAPSHOT_SCRIPT), run_id], deps=["dbt_build"],
+                          artifacts={"schema_snapshot": schema_snapshot_path}, cacheable=False, required=False))
+
+    dag = Dag(steps, run_id, ROOT, STEP_CACHE, use_cache=not args.no_cache, artifact_dir=STEP_CACHE_ARTIFACTS)
+    base = last_successful_run(run_id) if args.dbt_select == "state" else None
+
+    def dbt_state_args(state_dir: str):
+        """--select/--defer arguments of a state build; empty (full build) when there is no usable base run."""
+        if base is None:
+            manifest["dbt_state"] = {"selector": None, "reason": "no earlier successful run with a saved dbt manifest"}
+            return []
+        base_id, base_db = base["run_id"], DUCK_DIR / base["duckdb_file"]
+        raw = dag.fingerprints.get("load_duckdb_raw")
+        if args.no_cache or raw is None or raw != _step_fingerprint(base, "load_duckdb_raw"):
+            # Unchanged models would be deferred to a warehouse built from other raw data
+            reason = "--no-cache" if args.no_cache else f"raw data differs from run {base_id}"
+            manifest["dbt_state"] = {"base_run_id": base_id, "selector": None, "reason": reason}
+            return []
+        # Start from the base run's warehouse, so this run's DuckDB file also holds the models not rebuilt
+        shutil.copyfile(base_db, db_path_abs)
+        shutil.copyfile(LOG_DIR / f"dbt_manifest_{base_id}.json", Path(state_dir) / "manifest.json")
+        write_profiles_for_db(db_path_abs, dbt_dir, attach_db=base_db)
+        manifest["dbt_state"] = {"base_run_id": base_id, "selector": DBT_STATE_SELECTOR, "deferred_to": str(base_db)}
+        return ["--select", DBT_STATE_SELECTOR, "--defer", "--state", state_dir]
+
+    # The run's DuckDB path is known up front, so dbt can be pointed at it before anything runs
+    write_profiles_for_db(db_path_abs, dbt_dir)
+
     t0 = time.time()
 
-    with open(log_path, "w", encoding="utf-8") as log_fp:
+    with open(log_path, "w", encoding="utf-8") as log_fp, tempfile.TemporaryDirectory(prefix="dbt_state_") as state_dir:
         log_fp.write(f"Pipeline run_id={run_id}\n")
         log_fp.write(f"Using PYTHON={PYTHON}\n")
         log_fp.write(f"Target DuckDB file={db_path_abs}\n")
+        log_fp.write(f"Run dir={run_dir}\n")
+        log_fp.write(f"Ingest mode={args.ingest}\n")
+        log_fp.write(f"Load mode={'incremental' if args.incremental else 'full'}\n")
+        if not args.incremental:
+            log_fp.write(f"Scale factor={args.scale_factor}\n")
+        log_fp.write(f"dbt select={args.dbt_select}" + (f" (base run {base['run_id']})" if base else "") + "\n")
+        log_fp.write(f"\nWrote {dbt_dir / 'profiles.yml'}:\n")
+        log_fp.write((dbt_dir / "profiles.yml").read_text(encoding="utf-8") + "\n")
+        log_fp.flush()
+        log_lock = threading.Lock()
+        runner = None
+        if args.execution == "in-process":
+            runner = InProcessRunner(ROOT, log_fp, log_lock, dbt_args=dbt_args)
+        timings = {}
+        profiles = {}
+
+        def execute(step):
+            cmd = step.cmd
+            if step.name == "dbt_build" and args.dbt_select == "state":
+                cmd = cmd + dbt_state_args(state_dir)
+            report, key = reported_work(step.name, load_report, dbt_run_results)
+            before, s0 = _mtime(report) if report else None, time.perf_counter()
+            monitor = ResourceMonitor(files=[db_path_abs])
+            if runner is not None:
+                monitor.start(os.getpid())
+                try:
+                    rc, timing = runner.run(cmd, prefix=f"[{step.name}] ")
+                finally:
+                    monitor.stop()
+            else:
+                rc, _out = run(cmd, log_fp, prefix=f"[{step.name}] ", log_lock=log_lock, monitor=monitor)
+                timing = {}
+            wall = time.perf_counter() - s0
+            profiles[step.name] = (monitor.summary(wall), monitor.samples)
+            # Startup: whatever the step spent before (and around) its own work
+            work = timing.get("work_seconds")
+            # An unchanged report means the step failed before writing its own
+            if report is not None and _mtime(report) not in (None, before):
+                work = json.loads(report.read_text(encoding="utf-8")).get(key, work)
+            timings[step.name] = {
+                "work_seconds": work,
+                "startup_seconds": round(max(wall - work, 0.0), 3) if work is not None else None,
+            }
+            return rc
+
+        with runner.routing_output() if runner is not None else contextlib.nullcontext():
+            manifest["steps"] = dag.run(execute)
+        manifest["profiling"] = {"backend": PROFILING_BACKEND, "interval_seconds": SAMPLE_INTERVAL_SECONDS}
+        manifest["resource_samples"] = {}
+        for step in manifest["steps"]:
+            step.update(timings.get(step["name"], {}))
+            if step["name"] in profiles:
+                summary, samples = profiles[step["name"]]
+                summary.pop("wall_seconds")
+                step.update(summary)
+                manifest["resource_samples"][step["name"]] = samples
+
+        for step in manifest["steps"]:
+            if step["status"] == "success":
+                continue
+            with log_lock:
+                log_fp.write(f"\n[{step['name']}] {step['status'].upper()}"
+                             + (f": {step['error']}" if step.get("error") else "") + "\n")
+            if step["status"] == "failed" and dag.steps[step["name"]].required and "failed_step" not in manifest:
+                manifest["failed_step"] = step["name"]
 
-        for step in steps:
-            s0 = time.time()
-            rc, _out = run(step["cmd"], log_fp)
-            dur = round(time.time() - s0, 3)
-
-            manifest["steps"].append({
-                "name": step["name"],
-                "cmd": list(map(str, step["cmd"])),
-                "return_code": rc,
-                "duration_seconds": dur,
-            })
+        manifest["status"] = "failed" if "failed_step" in manifest else "success"
 
-            if rc != 0:
-                manifest["status"] = "failed"
-                manifest["failed_step"] = step["name"]
-                break
-
-            # After load completes, rewrite dbt profiles to THIS run's DB
-            if step["name"] == "load_duckdb_raw":
-                if not db_path_abs.exists():
-                    manifest["status"] = "failed"
-                    manifest["failed_step"] = "load_duckdb_raw"
-                    log_fp.write(f"\nERROR: expected DuckDB file not found at {db_path_abs}\n")
-                    log_fp.flush()
-                    break
-
-                write_profiles_for_db(db_path_abs)
-                log_fp.write("\nWrote dbt profiles.yml:\n")
-                log_fp.write(DBT_PROFILES_YML.read_text(encoding="utf-8") + "\n")
-                log_fp.flush()
+    cached = [s for s in manifest["steps"] if "cache" in s]
+    manifest["cache"] = {
+        "enabled": not args.no_cache,
+        "hits": sum(s["cache"] == "hit" for s in cached),
+        "misses": sum(s["cache"] == "miss" for s in cached),
+        "path": str(STEP_CACHE),
+        "artifact_dir": str(STEP_CACHE_ARTIFACTS),
+    }
 
-        if manifest["status"] != "failed":
-            manifest["status"] = "success"
+    measured = [s for s in manifest["steps"] if s.get("work_seconds") is not None]
+    manifest["overhead"] = {
+        "execution": args.execution,
+        "startup_seconds": round(sum(s["startup_seconds"] for s in measured), 3),
+        "work_seconds": round(sum(s["work_seconds"] for s in measured), 3),
+        "steps_measured": [s["name"] for s in measured],
+    }
 
-    # Post-run artifacts (best effort)
-    if SCHEMA_SNAPSHOT_SCRIPT.exists():
-        try:
-            subprocess.check_call([PYTHON, str(SCHEMA_SNAPSHOT_SCRIPT), run_id], cwd=str(ROOT))
-            manifest["schema_snapshot"] = str(LOG_DIR / f"schema_{run_id}.json")
-        except Exception as e:
-            manifest["schema_snapshot_error"] = str(e)
+    if schema_snapshot_path.exists():
+        manifest["schema_snapshot"] = str(schema_snapshot_path)
+    elif SCHEMA_SNAPSHOT_SCRIPT.exists():
+        snapshot_step = next(s for s in manifest["steps"] if s["name"] == "schema_snapshot")
+        manifest["schema_snapshot_error"] = f"schema_snapshot {snapshot_step['status']}"
 
+    # Keep dbt's artifacts of a failed run too (best effort)
     copied = {}
-    copied["run_results"] = safe_copy(DBT_RUN_RESULTS, LOG_DIR / f"run_results_{run_id}.json")
-    copied["dbt_manifest"] = safe_copy(DBT_MANIFEST, LOG_DIR / f"dbt_manifest_{run_id}.json")
+    copied["run_results"] = run_results_copy.exists() or safe_copy(dbt_run_results, run_results_copy)
+    copied["dbt_manifest"] = dbt_manifest_copy.exists() or safe_copy(dbt_manifest, dbt_manifest_copy)
     manifest["copied_artifacts"] = copied
 
     manifest["duration_seconds"] = round(time.time() - t0, 3)
@@ -171,7 +547,7 @@ def main():
 
     # Publish pointer ONLY on success
     if manifest["status"] == "success":
-        LATEST_PTR.write_text(db_filename, encoding="utf-8")
+        manifest["publish"] = publish_latest(manifest)
 
     with open(manifest_path, "w", encoding="utf-8") as f:
         json.dump(manifest, f, indent=2)
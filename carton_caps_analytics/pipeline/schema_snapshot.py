@@ -49,8 +49,9 @@ def snapshot():
     con.close()
     return snap
 
-def main():
-    run_id = sys.argv[1] if len(sys.argv) > 1 else datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    run_id = argv[0] if argv else datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
     out_path = LOG_DIR / f"schema_{run_id}.json"
     snap = snapshot()
     out_path.write_text(json.dumps(snap, indent=2), encoding="utf-8")
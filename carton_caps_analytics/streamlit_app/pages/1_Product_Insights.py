@@ -37,7 +37,7 @@ funnel_df, _ = q(f"""
 with e as (
   select *
   from stg_events
-  where event_at::date between '{start}' and '{end}'
+  where event_date between '{start}' and '{end}'
 )
 select
   sum(case when event_type='app_open' then 1 else 0 end) as app_opens,
@@ -73,9 +73,9 @@ st.divider()
 # Daily trend
 daily, _ = q(f"""
 with e as (
-  select event_at::date as d, event_type
+  select event_date as d, event_type
   from stg_events
-  where event_at::date between '{start}' and '{end}'
+  where event_date between '{start}' and '{end}'
 )
 select
   d,
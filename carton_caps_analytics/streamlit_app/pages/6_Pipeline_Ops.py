@@ -45,7 +45,7 @@ st.divider()
 # Run pipeline now
 # -----------------------------
 st.subheader("Run Pipeline Now (Local)")
-st.caption("Runs the full pipeline and writes logs/manifests to ./logs. Snapshot mode: overwrites data/*.csv each run.")
+st.caption("Runs the full pipeline and writes logs/manifests to ./logs. Each run generates into its own runs/<run_id>/ directory.")
 
 run_col1, run_col2 = st.columns([1, 2])
 with run_col1:
@@ -120,10 +120,34 @@ c2.metric("Status", status)
 c3.metric("Duration (s)", manifest.get("duration_seconds", None))
 c4.metric("Failed step", manifest.get("failed_step", "-") if status != "success" else "-")
 
+cache = manifest.get("cache")
+if cache:
+    st.caption(f"Step cache: {cache['hits']} hit(s), {cache['misses']} miss(es)"
+               + ("" if cache.get("enabled", True) else " (disabled with --no-cache)"))
+
+overhead = manifest.get("overhead")
+if overhead:
+    st.caption(f"Execution: {overhead['execution']} - startup {overhead['startup_seconds']}s, "
+               f"work {overhead['work_seconds']}s (steps that report their work)")
+
 st.write("Step breakdown:")
 steps_df = pd.DataFrame(manifest.get("steps", []))
 st.dataframe(steps_df, use_container_width=True)
 
+# Per-step resource profile: CPU vs wall time says whether a step is CPU-bound; see the bound column
+resource_samples = {k: v for k, v in (manifest.get("resource_samples") or {}).items() if v}
+if resource_samples and "cpu_seconds" in steps_df.columns:
+    st.write("Step resources (wall vs CPU seconds):")
+    st.bar_chart(steps_df.set_index("name")[["duration_seconds", "cpu_seconds"]].fillna(0))
+
+    metric = st.selectbox(
+        "Resource over time (seconds since the step started)",
+        ["cpu_seconds", "rss_bytes", "read_bytes", "write_bytes", "duckdb_bytes"],
+    )
+    samples_df = pd.concat(pd.DataFrame(v).assign(step=k) for k, v in resource_samples.items())
+    if metric in samples_df.columns:
+        st.line_chart(samples_df.pivot_table(index="t", columns="step", values=metric))
+
 log_path = manifest.get("log_path")
 if log_path:
     st.caption(f"Log file: {log_path}")